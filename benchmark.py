@@ -0,0 +1,1216 @@
+"""
+Benchmarks do AI Teleportation
+
+Uso:
+    python benchmark.py filter    # Custo por frame do filtro de landmarks (< 0.2 ms)
+    python benchmark.py replay [gravacao.npz] [labels.json]
+                                  # Replay offline; sem arquivo usa um gesto sintético
+    python benchmark.py transfer [tamanho_mb] [conexoes]
+                                  # Requisição única vs. envio em partes paralelo (servidor local)
+    python benchmark.py load [backends] [concorrencia] [uploads] [tamanho_kb]
+                                  # Uploads concorrentes por backend do servidor (vazão, p50/p95/p99)
+    python benchmark.py small [envios]
+                                  # Latência de textos pequenos: conexão nova vs. sessão keep-alive
+    python benchmark.py compression [tamanho_mb] [mbps,...]
+                                  # Matriz tipo de arquivo x velocidade do link: sem compressão vs. codecs
+    python benchmark.py dedup [tamanho_mb]
+                                  # Reenvio idêntico e de arquivo editado: envio completo vs. dedup/diferença
+    python benchmark.py devices [dispositivos]
+                                  # Custo de get_devices/find_device_by_position por frame
+    python benchmark.py speculative [tamanho_mb] [segura_ms] [rodadas]
+                                  # Tempo entre abrir a mão e o arquivo chegar: envio normal vs. antecipado
+    python benchmark.py clipboard [largura] [altura]
+                                  # Captura de imagem do clipboard: codificação PNG vs. cache por conteúdo
+    python benchmark.py encode [resolucoes] [mbps]
+                                  # Formato das capturas de tela (png/webp/bmp): tempo de codificação x bytes enviados
+    python benchmark.py bundle [arquivos] [tamanho_kb]
+                                  # Pasta com muitos arquivos pequenos: um envio por arquivo vs. pacote único
+    python benchmark.py metrics [operacoes]
+                                  # Custo das métricas por operação (< 5 us) e da coleta de /metrics
+    python benchmark.py startup [rodadas]
+                                  # Início do receptor: imports por módulo e tempo até o primeiro /ping (< 1 s)
+    python benchmark.py inference [segundos] [tamanho_mb]
+                                  # FPS da inferência parada vs. durante um envio grande: thread vs. processo
+    python benchmark.py broadcast [dispositivos] [tamanho_mb] [mbps]
+                                  # Envio para um grupo: envios diretos vs. cadeia de retransmissão (uplink limitado)
+    python benchmark.py qos [mbps] [tamanho_mb] [textos]
+                                  # Link limitado: latência de textos durante um envio grande e divisão entre dispositivos
+
+O código de saída é 1 quando um limite de desempenho não é atendido,
+para uso em CI.
+"""
+
+import sys
+import threading
+import time
+
+
+def bench_filter(frames=5000):
+    """Mede o custo do filtro One-Euro + histerese por frame de uma mão"""
+    import numpy as np
+    from landmark_filter import make_filter, Hysteresis
+    
+    limit_ms = 0.2
+    rng = np.random.default_rng(0)
+    base = rng.random((21, 3), dtype=np.float32)
+    noise = rng.normal(0, 0.005, (frames, 21, 3)).astype(np.float32)
+    
+    landmark_filter = make_filter('one_euro')
+    gate = Hysteresis(0.6, 0.7)
+    
+    # Aquecimento
+    for i in range(100):
+        landmark_filter(base + noise[i], i / 30)
+    
+    start = time.perf_counter()
+    for i in range(frames):
+        smoothed = landmark_filter(base + noise[i], (i + 100) / 30)
+        gate.update(float(smoothed[8, 1]))
+    per_frame_ms = (time.perf_counter() - start) / frames * 1000
+    
+    ok = per_frame_ms < limit_ms
+    print(f"Filtro one_euro: {per_frame_ms:.4f} ms/frame (limite {limit_ms} ms)")
+    print("✅ OK" if ok else "❌ Acima do limite")
+    return ok
+
+
+def _synthetic_recording(path, fps=30):
+    """Gera uma gravação de agarrar -> segurar -> soltar com labels"""
+    import numpy as np
+    from gesture_replay import GestureRecorder
+    
+    def hand(extension):
+        points = np.zeros((21, 3), dtype=np.float32)
+        points[:, 0] = 0.5
+        points[0, 1] = 0.8   # punho
+        points[9, 1] = 0.6   # base da palma (escala = 0.2)
+        points[[4, 8, 12, 16, 20], 1] = 0.6 - 0.2 * extension
+        return points[None]
+    
+    # (duração em segundos, extensão dos dedos)
+    script = [(0.5, 1.0), (1.0, 0.3), (0.5, 1.0), (0.3, 0.3), (0.4, 1.0)]
+    recorder = GestureRecorder(path)
+    t = 0.0
+    for duration, extension in script:
+        for _ in range(int(duration * fps)):
+            recorder.add_hands(t, hand(extension), ['Right'], (480, 640, 3))
+            t += 1.0 / fps
+    recorder.save()
+    
+    # Só o primeiro agarre dura o bastante para virar HOLDING
+    return [
+        {'t': 0.5, 'state': 'grabbing'},
+        {'t': 1.0, 'state': 'holding'},
+        {'t': 1.5, 'state': 'releasing'},
+        {'t': 2.0, 'state': 'grabbing'},
+    ]
+
+
+def bench_replay(path=None, labels_path=None):
+    """Replay offline mais rápido que tempo real, com checagem de acurácia"""
+    import json
+    import tempfile
+    from pathlib import Path
+    from gesture_replay import Recording, replay_landmarks
+    
+    labels = None
+    if path is None:
+        path = Path(tempfile.gettempdir()) / 'ai_teleportation_replay.npz'
+        labels = _synthetic_recording(path)
+    elif labels_path:
+        with open(labels_path, 'r') as f:
+            labels = json.load(f)
+    
+    report = replay_landmarks(Recording(path))
+    if labels is not None:
+        report.match_labels(labels)
+    report.print_summary()
+    
+    return report.accuracy is None or report.accuracy['recall'] == 1.0
+
+
+def _free_port():
+    import socket
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def _start_local_server(upload_dir, **options):
+    """Sobe um FileTransferServer local e espera ele responder ao ping"""
+    import logging
+    from file_transfer_server import FileTransferServer
+    from file_transfer_client import FileTransferClient
+    
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    port = _free_port()
+    server = FileTransferServer(port=port, upload_dir=upload_dir, **options)
+    server.start()
+    
+    client = FileTransferClient()
+    deadline = time.time() + 10
+    while not client.ping_device('127.0.0.1', port):
+        if time.time() > deadline:
+            raise RuntimeError("Servidor local não respondeu")
+        time.sleep(0.05)
+    return server, port
+
+
+def _timed_send(client, path, port):
+    start = time.perf_counter()
+    ok, message = client.send_file(path, '127.0.0.1', port)
+    elapsed = time.perf_counter() - start
+    if not ok:
+        raise RuntimeError(message)
+    return elapsed
+
+
+def bench_transfer(size_mb='64', streams='4'):
+    """Compara a vazão da requisição única com o envio em partes paralelo"""
+    import os
+    import tempfile
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    
+    size = int(size_mb) * 1024 * 1024
+    with tempfile.TemporaryDirectory() as tmp:
+        _, port = _start_local_server(Path(tmp) / 'received')
+        
+        path = Path(tmp) / 'payload.bin'
+        with open(path, 'wb') as f:
+            f.write(os.urandom(size))
+        
+        single = FileTransferClient(chunked_threshold=float('inf'))
+        chunked = FileTransferClient(streams=int(streams), chunked_threshold=0)
+        
+        results = [
+            ('Requisição única', _timed_send(single, path, port)),
+            (f'Em partes ({streams} conexões)', _timed_send(chunked, path, port)),
+        ]
+    
+    for name, elapsed in results:
+        print(f"{name:28s} {elapsed:7.2f}s  {size / elapsed / 1e6:8.1f} MB/s")
+    return True
+
+
+def _percentile(values, p):
+    import numpy as np
+    return float(np.percentile(values, p)) if values else 0.0
+
+
+def bench_load(backends='pooled,werkzeug', concurrency='32', uploads='512', size_kb='256'):
+    """Muitos uploads simultâneos contra cada backend do servidor"""
+    import contextlib
+    import io
+    import os
+    import tempfile
+    from concurrent.futures import ThreadPoolExecutor
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    
+    concurrency, uploads, size = int(concurrency), int(uploads), int(size_kb) * 1024
+    results = []
+    
+    for backend in backends.split(','):
+        with tempfile.TemporaryDirectory() as tmp:
+            server, port = _start_local_server(Path(tmp) / 'received', backend=backend,
+                                               workers=concurrency)
+            
+            # Mesmo nome em todos os uploads: o receptor gera payload_N.bin
+            path = Path(tmp) / 'payload.bin'
+            with open(path, 'wb') as f:
+                f.write(os.urandom(size))
+            
+            client = FileTransferClient(chunked_threshold=float('inf'), compression=False,
+                                        dedup_min_size=float('inf'), delta_min_size=float('inf'))
+            latencies = []
+            failures = 0
+            
+            def upload(_):
+                try:
+                    return _timed_send(client, path, port)
+                except RuntimeError:
+                    return None
+            
+            # Silencia o log "Arquivo recebido" de cada upload
+            with contextlib.redirect_stdout(io.StringIO()):
+                start = time.perf_counter()
+                with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                    for elapsed in pool.map(upload, range(uploads)):
+                        if elapsed is None:
+                            failures += 1
+                        else:
+                            latencies.append(elapsed * 1000)
+                total = time.perf_counter() - start
+                server.stop()
+        
+        results.append((backend, len(latencies) * size / total / 1e6,
+                        len(latencies) / total, latencies, failures))
+    
+    print(f"{uploads} uploads de {size_kb} KB, {concurrency} simultâneos")
+    print(f"{'Backend':10s} {'MB/s':>8s} {'req/s':>8s} {'p50 ms':>8s} "
+          f"{'p95 ms':>8s} {'p99 ms':>8s} {'falhas':>7s}")
+    for backend, throughput, rate, latencies, failures in results:
+        print(f"{backend:10s} {throughput:8.1f} {rate:8.1f} "
+              f"{_percentile(latencies, 50):8.1f} {_percentile(latencies, 95):8.1f} "
+              f"{_percentile(latencies, 99):8.1f} {failures:7d}")
+    return all(failures == 0 for *_, failures in results)
+
+
+def bench_small(count='200'):
+    """
+    Latência de envio de um texto pequeno do clipboard: uma conexão nova
+    por envio (requests.put) contra a sessão keep-alive por dispositivo,
+    com um arquivo grande na fila de envios ao mesmo tempo.
+    """
+    import contextlib
+    import io
+    import os
+    import tempfile
+    from pathlib import Path
+    import requests
+    from file_transfer_client import FileTransferClient
+    from transfer_queue import TransferQueue
+    
+    count = int(count)
+    with tempfile.TemporaryDirectory() as tmp:
+        server, port = _start_local_server(Path(tmp) / 'received')
+        text = Path(tmp) / 'clip.txt'
+        text.write_text('texto copiado ' * 20)
+        bulk = Path(tmp) / 'video.bin'
+        with open(bulk, 'wb') as f:
+            f.write(os.urandom(64 * 1024 * 1024))
+        url = f"http://127.0.0.1:{port}/upload/stream"
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            client = FileTransferClient(chunked_threshold=float('inf'))
+            client.ping_device('127.0.0.1', port)  # conexão já aberta, como após a descoberta
+            fresh, pooled = [], []
+            # Alternados, para os dois modos verem o mesmo estado do receptor
+            for i in range(count):
+                start = time.perf_counter()
+                with open(text, 'rb') as f:
+                    requests.put(url, data=f, headers={'X-Filename': f'fresh_{i}.txt'})
+                fresh.append((time.perf_counter() - start) * 1000)
+                
+                clip = Path(tmp) / f'pooled_{i}.txt'
+                os.link(text, clip)
+                start = time.perf_counter()
+                client.send_file(clip, '127.0.0.1', port)
+                pooled.append((time.perf_counter() - start) * 1000)
+            
+            # Fila com um worker ocupado: o texto deve passar na frente do 2º arquivo grande
+            transfers = TransferQueue(lambda path: (path, time.perf_counter()), workers=1)
+            gate = transfers.submit(bulk, priority=0)
+            transfers.submit(bulk)
+            small = transfers.submit(text)
+            order = [gate.result()[1], small.result()[1]]
+            transfers.stop(wait=True)
+            server.stop()
+    
+    print(f"{'Envio de texto':22s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s}")
+    for name, values in (('Conexão nova', fresh), ('Sessão keep-alive', pooled)):
+        print(f"{name:22s} {_percentile(values, 50):8.2f} {_percentile(values, 95):8.2f} "
+              f"{_percentile(values, 99):8.2f}")
+    ok = _percentile(pooled, 50) < _percentile(fresh, 50) and order[0] <= order[1]
+    print("✅ OK" if ok else "❌ Sessão keep-alive não reduziu a latência")
+    return ok
+
+
+def _throttled(chunks, mbps):
+    """Limita o envio de `chunks` à velocidade de um link de `mbps`"""
+    rate = mbps * 1e6 / 8
+    start = time.perf_counter()
+    sent = 0
+    for chunk in chunks:
+        yield chunk
+        sent += len(chunk)
+        delay = start + sent / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+
+def _compression_samples(directory, size):
+    """Arquivos de teste: texto, JSON, binário aleatório e PNG"""
+    import json
+    import os
+    import random
+    import numpy as np
+    import cv2
+    
+    rng = random.Random(0)
+    words = ('arquivo gesto mão clipboard dispositivo enviar receber rede '
+             'servidor cliente texto imagem vídeo pasta').split()
+    
+    text = directory / 'notas.txt'
+    with open(text, 'w') as f:
+        while f.tell() < size:
+            f.write(' '.join(rng.choice(words) for _ in range(12)) + '.\n')
+    
+    records = directory / 'eventos.json'
+    with open(records, 'w') as f:
+        while f.tell() < size:
+            f.write(json.dumps({'id': rng.randrange(10 ** 6), 'tipo': rng.choice(words),
+                                'x': rng.random(), 'y': rng.random()}) + '\n')
+    
+    binary = directory / 'dados.bin'
+    with open(binary, 'wb') as f:
+        f.write(os.urandom(size))
+    
+    side = int((size / 3) ** 0.5)
+    image = np.random.default_rng(0).integers(0, 256, (side, side, 3), dtype=np.uint8)
+    png = directory / 'captura.png'
+    cv2.imwrite(str(png), image)
+    
+    return [text, records, binary, png]
+
+
+def bench_compression(size_mb='2', speeds='10,100,1000'):
+    """
+    Tempo de envio real (servidor local, link simulado) de cada tipo de
+    arquivo, sem compressão e com cada codec, e o codec que a sondagem
+    escolheria. Mostra a partir de que velocidade comprimir deixa de
+    compensar.
+    """
+    import contextlib
+    import io
+    import tempfile
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    from transfer_codec import CODECS, choose_codec, encode_file
+    
+    size = int(float(size_mb) * 1024 * 1024)
+    speeds = [float(mbps) for mbps in speeds.split(',')]
+    rows = []
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        server, port = _start_local_server(Path(tmp) / 'received')
+        samples = Path(tmp) / 'samples'
+        samples.mkdir()
+        paths = _compression_samples(samples, size)
+        client = FileTransferClient()
+        session = client._session('127.0.0.1', port)
+        url = f"http://127.0.0.1:{port}/upload/stream"
+        
+        def raw(path):
+            with open(path, 'rb') as f:
+                while True:
+                    data = f.read(256 * 1024)
+                    if not data:
+                        return
+                    yield data
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            for path in paths:
+                chosen = choose_codec(path, CODECS) or 'nenhum'
+                for mbps in speeds:
+                    times = {}
+                    for codec in ['identity'] + CODECS:
+                        body = raw(path) if codec == 'identity' else encode_file(path, codec)
+                        headers = {'X-Filename': path.name, 'Content-Encoding': codec,
+                                   'X-File-Size': str(path.stat().st_size)}
+                        start = time.perf_counter()
+                        response = session.put(url, data=_throttled(body, mbps), headers=headers)
+                        times[codec] = time.perf_counter() - start
+                        if response.status_code != 200:
+                            raise RuntimeError(response.text)
+                    rows.append((path.name, mbps, chosen, times))
+        server.stop()
+    
+    print(f"Arquivos de {size_mb} MB; tempo de envio em segundos")
+    print(f"{'Arquivo':14s} {'Mbps':>6s} {'sem':>7s} " +
+          ' '.join(f"{codec:>7s}" for codec in CODECS) + "  escolha  melhor")
+    ok = True
+    for name, mbps, chosen, times in rows:
+        best = min(times, key=times.get)
+        print(f"{name:14s} {mbps:6.0f} {times['identity']:7.2f} " +
+              ' '.join(f"{times[codec]:7.2f}" for codec in CODECS) +
+              f"  {chosen:7s}  {'nenhum' if best == 'identity' else best}")
+        # A escolha não pode ser muito pior que enviar sem compressão
+        picked = times.get(chosen, times['identity'])
+        ok = ok and picked <= times['identity'] * 1.5 + 0.05
+    print("✅ OK" if ok else "❌ Compressão escolhida piorou o tempo de envio")
+    return ok
+
+
+def bench_dedup(size_mb='32'):
+    """
+    Reenvio do mesmo arquivo (materializado no receptor) e de uma versão
+    editada (só os blocos alterados), comparados ao envio completo.
+    """
+    import contextlib
+    import io
+    import os
+    import tempfile
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    
+    size = int(float(size_mb) * 1024 * 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        server, port = _start_local_server(Path(tmp) / 'received')
+        sources = Path(tmp) / 'sources'
+        sources.mkdir()
+        
+        original = sources / 'projeto.bin'
+        data = os.urandom(size)
+        original.write_bytes(data)
+        
+        # Edição com deslocamento: bytes inseridos no meio e um trecho alterado
+        edited = sources / 'edited' / 'projeto.bin'
+        edited.parent.mkdir()
+        middle = size // 2
+        edited.write_bytes(data[:middle] + b'novo trecho' * 100 + data[middle:size - 4096]
+                           + os.urandom(4096))
+        
+        full = FileTransferClient(compression=False, dedup_min_size=float('inf'),
+                                  delta_min_size=float('inf'), chunked_threshold=float('inf'))
+        smart = FileTransferClient(compression=False, chunked_threshold=float('inf'))
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            results = [
+                ('Primeiro envio', _timed_send(smart, original, port)),
+                ('Reenvio completo', _timed_send(full, original, port)),
+                ('Reenvio (dedup)', _timed_send(smart, original, port)),
+                ('Editado completo', _timed_send(full, edited, port)),
+                ('Editado (diferença)', _timed_send(smart, edited, port)),
+            ]
+            server.stop()
+        
+        received = Path(tmp) / 'received'
+        ok = all((received / name).read_bytes() == edited.read_bytes()
+                 for name in ('projeto_3.bin', 'projeto_4.bin'))
+    
+    for name, elapsed in results:
+        print(f"{name:22s} {elapsed:7.3f}s")
+    ok = ok and results[2][1] < results[1][1] and results[4][1] < results[3][1]
+    print("✅ OK" if ok else "❌ Dedup/diferença não reduziu o tempo de reenvio")
+    return ok
+
+
+def bench_devices(count='48', lookups=100000):
+    """Leitura do registro e busca espacial do alvo com muitos dispositivos"""
+    import threading
+    from device_registry import DeviceRegistry
+    
+    limit_us = 20.0
+    count = int(count)
+    registry = DeviceRegistry(directions={'Dispositivo-00': 'right', 'Dispositivo-01': 'left'})
+    for i in range(count):
+        registry.add(f'svc{i}', {'name': f'Dispositivo-{i:02d}', 'ip': f'10.0.0.{i}', 'port': 5000})
+    
+    # Escritas concorrentes (como a thread do Zeroconf) durante as leituras
+    stop = threading.Event()
+    
+    def churn():
+        i = 0
+        while not stop.is_set():
+            registry.update(f'svc{i % count}', port=5000 + i % 7)
+            i += 1
+            time.sleep(0.001)
+    
+    writer = threading.Thread(target=churn, daemon=True)
+    writer.start()
+    
+    start = time.perf_counter()
+    hits = 0
+    for i in range(lookups):
+        registry.snapshot()
+        if registry.find((i * 37) % 640, (i * 91) % 480, 640, 480) is not None:
+            hits += 1
+    per_lookup_us = (time.perf_counter() - start) / lookups * 1e6
+    stop.set()
+    writer.join()
+    
+    right = registry.find(639, 240, 640, 480)
+    left = registry.find(0, 240, 640, 480)
+    ok = (per_lookup_us < limit_us and right['name'] == 'Dispositivo-00'
+          and left['name'] == 'Dispositivo-01' and registry.find(320, 240, 640, 480) is None)
+    print(f"{count} dispositivos: {per_lookup_us:.2f} µs por frame (limite {limit_us} µs), "
+          f"{hits} alvos em {lookups} posições, versão {registry.version}")
+    print("✅ OK" if ok else "❌ Acima do limite ou alvo incorreto")
+    return ok
+
+
+def bench_speculative(size_mb='4', hold_ms='500', rounds='10'):
+    """
+    Latência percebida (abrir a mão -> arquivo publicado no receptor):
+    envio normal a partir do RELEASING vs. envio antecipado no HOLDING
+    com só o commit no RELEASING.
+    """
+    import contextlib
+    import io
+    import os
+    import tempfile
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    from speculative_transfer import SpeculativeTransfer
+    
+    size = int(float(size_mb) * 1024 * 1024)
+    hold = float(hold_ms) / 1000
+    normal, speculative = [], []
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        server, port = _start_local_server(Path(tmp) / 'received')
+        device = {'name': 'local', 'service_name': 'local._aiteleport._tcp.local.',
+                  'ip': '127.0.0.1', 'port': port}
+        # Conteúdo novo a cada rodada: sem dedup nos dois modos
+        client = FileTransferClient(dedup_min_size=float('inf'), delta_min_size=float('inf'))
+        speculation = SpeculativeTransfer(client, max_size=size)
+        
+        with contextlib.redirect_stdout(io.StringIO()):
+            for i in range(int(rounds)):
+                path = Path(tmp) / f'captura_{i}.bin'
+                path.write_bytes(os.urandom(size))
+                normal.append(_timed_send(client, path, port))
+                
+                prepared = speculation.prepare(path, [device])
+                time.sleep(hold)
+                start = time.perf_counter()
+                ok, message = speculation.commit(prepared, device)
+                speculative.append(time.perf_counter() - start)
+                if not ok:
+                    raise RuntimeError(message)
+            server.stop()
+        speculation.stop()
+        received = len(list((Path(tmp) / 'received').glob('captura_*.bin')))
+    
+    print(f"Arquivos de {size_mb} MB, mão fechada por {hold_ms} ms; latência após soltar (ms)")
+    print(f"{'Modo':12s} {'p50':>8s} {'p95':>8s}")
+    for name, values in (('Normal', normal), ('Antecipado', speculative)):
+        values = [v * 1000 for v in values]
+        print(f"{name:12s} {_percentile(values, 50):8.2f} {_percentile(values, 95):8.2f}")
+    ok = received == 2 * int(rounds) and _percentile(speculative, 50) < _percentile(normal, 50)
+    print("✅ OK" if ok else "❌ Envio antecipado não reduziu a latência")
+    return ok
+
+
+def _screenshot(width, height):
+    """Captura de tela sintética: barras, texto e uma região de foto"""
+    import numpy as np
+    import cv2
+    from PIL import Image
+    
+    img = np.full((height, width, 3), 245, dtype=np.uint8)
+    cv2.rectangle(img, (0, 0), (width, 40), (60, 60, 70), -1)
+    cv2.rectangle(img, (0, 40), (width // 6, height), (230, 232, 236), -1)
+    line = 'def capture(self): return arquivo gesto 12345 ' * (width // 1200 + 1)
+    for y in range(70, height - 20, 22):
+        cv2.putText(img, line, (width // 6 + 20, y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (30, 30, 30), 1)
+    
+    photo = img[height // 3:2 * height // 3, width // 2:width // 2 + width // 3]
+    yy, xx = np.mgrid[0:photo.shape[0], 0:photo.shape[1]]
+    photo[..., 0] = xx * 255 // photo.shape[1]
+    photo[..., 1] = yy * 255 // photo.shape[0]
+    photo[..., 2] = 128
+    noise = np.random.default_rng(0).integers(-12, 12, photo.shape)
+    photo[:] = np.clip(photo.astype(int) + noise, 0, 255)
+    return Image.fromarray(img)
+
+
+def bench_encode(resolutions='1920x1080,2560x1440,3840x2160', mbps='100'):
+    """
+    Formato das capturas de tela do clipboard: tempo de codificação,
+    bytes enviados (bmp vai comprimido pelo envio) e o tempo estimado
+    até o destino em um link de `mbps`.
+    """
+    import os
+    import tempfile
+    from pathlib import Path
+    from clipboard_manager import ClipboardManager
+    from transfer_codec import CODECS, choose_codec, encode_file
+    
+    rate = float(mbps) * 1e6 / 8
+    options = [('png 1', 'png', 1), ('png 6', 'png', 6), ('webp', 'webp', 1), ('bmp', 'bmp', 1)]
+    ok = True
+    
+    print(f"{'Resolução':>10s} {'Formato':8s} {'codif. ms':>10s} {'arquivo MB':>11s} "
+          f"{'enviado MB':>11s} {f'total ms @{mbps}Mbps':>20s}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for resolution in resolutions.split(','):
+            width, height = (int(v) for v in resolution.split('x'))
+            image = _screenshot(width, height)
+            totals = {}
+            for name, image_format, level in options:
+                manager = ClipboardManager(image_format=image_format, png_level=level)
+                path = Path(tmp) / f"captura.{image_format}"
+                start = time.perf_counter()
+                manager.encode_image(image, path)
+                encode = time.perf_counter() - start
+                manager.stop()
+                
+                size = os.path.getsize(path)
+                sent = size
+                codec = choose_codec(path, CODECS)
+                if codec:
+                    # A compressão do envio acontece durante a transferência
+                    start = time.perf_counter()
+                    sent = sum(len(chunk) for chunk in encode_file(path, codec))
+                    encode += max(0.0, time.perf_counter() - start - sent / rate)
+                totals[name] = encode + sent / rate
+                print(f"{resolution:>10s} {name:8s} {encode * 1000:10.1f} {size / 1e6:11.2f} "
+                      f"{sent / 1e6:11.2f} {totals[name] * 1000:20.1f}")
+                path.unlink()
+            ok = ok and min(totals.values()) <= totals['png 6']
+    
+    print("✅ OK" if ok else "❌ Nenhum formato superou o PNG padrão")
+    return ok
+
+
+def bench_clipboard(width='3840', height='2160'):
+    """
+    Custo de gravar uma captura de tela do clipboard: primeira vez
+    (codifica o PNG) vs. o mesmo conteúdo de novo (hash + cache) e um
+    texto repetido. Com número de sequência do sistema (Windows/macOS)
+    o clipboard inalterado nem chega a ser lido.
+    """
+    import tempfile
+    from pathlib import Path
+    from clipboard_manager import ClipboardManager, clipboard_sequence
+    
+    image = _screenshot(int(width), int(height))
+    text = 'texto copiado ' * 1000
+    
+    with tempfile.TemporaryDirectory() as tmp:
+        manager = ClipboardManager()
+        manager.temp_dir = Path(tmp)
+        
+        def timed(fn, *args):
+            start = time.perf_counter()
+            path = fn(*args)
+            return time.perf_counter() - start, path
+        
+        encode, first = timed(manager.store_image, image)
+        cached, second = timed(manager.store_image, image)
+        text_first, _ = timed(manager.store_text, text)
+        text_cached, _ = timed(manager.store_text, text)
+    
+    print(f"Imagem {width}x{height}")
+    print(f"{'Primeira captura (PNG)':28s} {encode * 1000:9.2f} ms")
+    print(f"{'Mesma imagem (cache)':28s} {cached * 1000:9.2f} ms")
+    print(f"{'Texto (primeira / cache)':28s} {text_first * 1000:6.3f} / {text_cached * 1000:.3f} ms")
+    sequence = clipboard_sequence()
+    print(f"Número de sequência do clipboard: {'disponível' if sequence is not None else 'indisponível'}")
+    ok = first == second and cached < encode / 5
+    print("✅ OK" if ok else "❌ Cache não evitou a codificação")
+    return ok
+
+
+def bench_bundle(count='2000', size_kb='4'):
+    """
+    Pasta com `count` arquivos pequenos (em subpastas): um envio por
+    arquivo (sessão keep-alive) vs. um pacote em uma única requisição.
+    """
+    import contextlib
+    import filecmp
+    import io
+    import os
+    import tempfile
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    
+    count = int(count)
+    size = int(float(size_kb) * 1024)
+    with tempfile.TemporaryDirectory() as tmp:
+        server, port = _start_local_server(Path(tmp) / 'received')
+        folder = Path(tmp) / 'projeto'
+        for i in range(count):
+            path = folder / f"modulo_{i % 20}" / f"arquivo_{i}.txt"
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(os.urandom(size // 2).hex().encode()[:size])
+        (folder / 'vazia').mkdir()
+        files = sorted(p for p in folder.rglob('*') if p.is_file())
+        
+        client = FileTransferClient(dedup_min_size=float('inf'), delta_min_size=float('inf'))
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            for path in files:
+                ok, message = client.send_file(path, '127.0.0.1', port)
+                if not ok:
+                    raise RuntimeError(message)
+            per_file = time.perf_counter() - start
+            
+            start = time.perf_counter()
+            ok, message = client.send_bundle([folder], '127.0.0.1', port)
+            bundled = time.perf_counter() - start
+            server.stop()
+        if not ok:
+            raise RuntimeError(message)
+        
+        received = Path(tmp) / 'received' / 'projeto'
+        comparison = filecmp.dircmp(folder, received)
+        same = (not comparison.left_only and not comparison.right_only
+                and all(filecmp.cmp(path, received / path.relative_to(folder), shallow=False)
+                        for path in files)
+                and (received / 'vazia').is_dir())
+    
+    print(f"{count} arquivos de {size_kb} KB")
+    print(f"{'Um envio por arquivo':24s} {per_file:7.2f}s  {count / per_file:8.0f} arquivos/s")
+    print(f"{'Pacote único':24s} {bundled:7.2f}s  {count / bundled:8.0f} arquivos/s")
+    ok = same and bundled < per_file
+    print("✅ OK" if ok else "❌ Pacote não reduziu o tempo (ou chegou diferente)")
+    return ok
+
+
+def bench_metrics(operations='200000'):
+    """
+    Custo de instrumentar o caminho quente: incremento de contador com
+    labels e observação de histograma, mais a coleta do /metrics com
+    séries de vários dispositivos.
+    """
+    import metrics
+    
+    limit_us = 5.0
+    operations = int(operations)
+    registry = metrics.Registry()
+    counter = registry.register(metrics.Counter, 'bench_total', 'Contador', ['peer', 'method'])
+    histogram = registry.register(metrics.Histogram, 'bench_seconds', 'Histograma', ['peer'])
+    
+    start = time.perf_counter()
+    for i in range(operations):
+        counter.labels('10.0.0.2:5000', 'stream').inc()
+    inc_us = (time.perf_counter() - start) / operations * 1e6
+    
+    series = histogram.labels('10.0.0.2:5000')
+    start = time.perf_counter()
+    for i in range(operations):
+        series.observe(i % 1000 / 1000)
+    observe_us = (time.perf_counter() - start) / operations * 1e6
+    
+    for peer in range(16):
+        for method in ('stream', 'chunked', 'dedup', 'delta', 'bundle'):
+            counter.labels(f"10.0.0.{peer}:5000", method).inc()
+        histogram.labels(f"10.0.0.{peer}:5000").observe(0.1)
+    start = time.perf_counter()
+    for _ in range(100):
+        text = registry.render()
+    render_ms = (time.perf_counter() - start) / 100 * 1000
+    
+    print(f"{'Contador com labels':24s} {inc_us:6.2f} us/op")
+    print(f"{'Histograma':24s} {observe_us:6.2f} us/op")
+    print(f"{'Coleta /metrics':24s} {render_ms:6.2f} ms ({len(text.splitlines())} linhas)")
+    ok = inc_us < limit_us and observe_us < limit_us
+    print("✅ OK" if ok else f"❌ Acima do limite de {limit_us} us/op")
+    return ok
+
+
+def _import_times(statement, cwd):
+    """{módulo: (nível, tempo acumulado em ms)} de `python -X importtime -c statement`"""
+    import subprocess
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', statement],
+                            cwd=cwd, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line.split('|')
+        level = (len(name) - len(name.lstrip()) - 1) // 2
+        times.setdefault(name.strip(), (level, int(cumulative) / 1000))
+    return times
+
+
+def bench_startup(runs='3'):
+    """
+    Início do receptor (main.py --receive-only): tempo de import por
+    módulo (python -X importtime) e do processo novo até o primeiro
+    /ping respondido.
+    """
+    import json
+    import os
+    import re
+    import signal
+    import subprocess
+    import tempfile
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    
+    limit_s = 1.0
+    root = Path(__file__).resolve().parent
+    
+    times = _import_times('import main', root)
+    children = sorted(((ms, name) for name, (level, ms) in times.items() if level == 1), reverse=True)
+    print(f"Import de main: {times['main'][1]:.0f} ms")
+    for ms, name in children[:6]:
+        print(f"  {name:28s} {ms:6.0f} ms")
+    vision = _import_times('import main; import gesture_detector', root)['gesture_detector'][1]
+    print(f"  {'(visão, só no modo completo)':28s} {vision:6.0f} ms")
+    
+    client = FileTransferClient()
+    elapsed = []
+    for _ in range(int(runs)):
+        with tempfile.TemporaryDirectory() as tmp:
+            (Path(tmp) / 'config.json').write_text(json.dumps({
+                'device_name': 'benchmark-startup',
+                'port': 0,
+                'upload_dir': str(Path(tmp) / 'received'),
+                'metrics_log_interval': 0
+            }))
+            start = time.perf_counter()
+            process = subprocess.Popen(
+                [sys.executable, '-u', str(root / 'main.py'), '--receive-only'],
+                cwd=tmp, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+            try:
+                port = None
+                for line in process.stdout:
+                    match = re.search(r'iniciado na porta (\d+)', line)
+                    if match:
+                        port = int(match.group(1))
+                        break
+                if port is None:
+                    raise RuntimeError("Receptor não iniciou")
+                while not client.ping_device('127.0.0.1', port, timeout=1):
+                    time.sleep(0.005)
+                elapsed.append(time.perf_counter() - start)
+            finally:
+                process.send_signal(signal.CTRL_C_EVENT if os.name == 'nt' else signal.SIGINT)
+                try:
+                    process.communicate(timeout=10)
+                except subprocess.TimeoutExpired:
+                    process.kill()
+                    process.communicate()
+    
+    median = _percentile(elapsed, 50)
+    print(f"Processo novo até o primeiro /ping: p50 {median * 1000:.0f} ms "
+          f"(mín {min(elapsed) * 1000:.0f} ms, {len(elapsed)} rodadas)")
+    ok = median < limit_s
+    print("✅ OK" if ok else f"❌ Acima do limite de {limit_s} s")
+    return ok
+
+
+class _AlwaysInfer:
+    """Scheduler que infere todo frame em resolução total (carga constante)"""
+    def plan(self, frame, idle, now):
+        return 1.0
+    
+    def observe(self, hand_found, now):
+        pass
+
+
+def bench_inference(seconds='5', size_mb='256'):
+    """
+    FPS sustentado da inferência sozinha e durante um envio grande pelo
+    servidor local (no mesmo processo), com o MediaPipe na thread da
+    câmera vs. em um processo separado (inference_process). Mede também
+    a vazão do envio em cada caso.
+    """
+    import contextlib
+    import io
+    import os
+    import tempfile
+    import threading
+    from pathlib import Path
+    import numpy as np
+    from gesture_detector import GestureDetector
+    from inference_process import ProcessHands
+    from file_transfer_client import FileTransferClient
+    
+    seconds = float(seconds)
+    size = int(float(size_mb) * 1024 * 1024)
+    rng = np.random.default_rng(0)
+    frame = rng.integers(0, 256, (480, 640, 3), dtype=np.uint8)
+    
+    def run_frames(detector, until):
+        frames = 0
+        start = time.perf_counter()
+        while not until():
+            detector.process_frame(frame.copy())
+            frames += 1
+        return frames / (time.perf_counter() - start)
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        source = Path(tmp) / 'grande.bin'
+        with open(source, 'wb') as f:
+            for _ in range(0, size, 16 * 1024 * 1024):
+                f.write(os.urandom(min(16 * 1024 * 1024, size - f.tell())))
+        
+        for backend in ('thread', 'process'):
+            hands = ProcessHands() if backend == 'process' else None
+            detector = GestureDetector(scheduler=_AlwaysInfer(), hands=hands)
+            server, port = _start_local_server(Path(tmp) / backend)
+            client = FileTransferClient(compression=False, dedup_min_size=float('inf'),
+                                        delta_min_size=float('inf'))
+            try:
+                deadline = time.perf_counter() + seconds
+                idle_fps = run_frames(detector, lambda: time.perf_counter() > deadline)
+                
+                done = threading.Event()
+                outcome = {}
+                
+                def send():
+                    start = time.perf_counter()
+                    with contextlib.redirect_stdout(io.StringIO()):
+                        outcome['result'] = client.send_file(source, '127.0.0.1', port)
+                    outcome['seconds'] = time.perf_counter() - start
+                    done.set()
+                
+                threading.Thread(target=send, daemon=True).start()
+                busy_fps = run_frames(detector, done.is_set)
+                if not outcome['result'][0]:
+                    raise RuntimeError(outcome['result'][1])
+                results[backend] = (idle_fps, busy_fps, size / outcome['seconds'] / 1e6)
+            finally:
+                detector.release()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    server.stop()
+    
+    print(f"Envio de {size_mb} MB durante a inferência ({os.cpu_count()} CPUs)")
+    print(f"{'Inferência':12s} {'FPS parado':>11s} {'FPS envio':>10s} {'queda':>7s} {'envio MB/s':>11s}")
+    for backend, (idle_fps, busy_fps, mbps) in results.items():
+        drop = 1 - busy_fps / idle_fps
+        print(f"{backend:12s} {idle_fps:11.1f} {busy_fps:10.1f} {drop:7.0%} {mbps:11.1f}")
+    idle_fps, busy_fps, _ = results['process']
+    ok = busy_fps >= idle_fps * 0.9
+    print("✅ OK" if ok else "❌ FPS caiu mais de 10% durante o envio com a inferência em processo")
+    return ok
+
+
+class _SharedUplink:
+    """Um único link de `mbps` para todos os envios de um cliente (uplink do emissor)"""
+    def __init__(self, mbps, chunk_size=64 * 1024):
+        self.rate = mbps * 1e6 / 8
+        self.chunk_size = chunk_size
+        self.available_at = 0.0
+        self.sent = 0
+        self.lock = threading.Lock()
+    
+    def take(self, n):
+        with self.lock:
+            now = time.perf_counter()
+            self.available_at = max(self.available_at, now) + n / self.rate
+            self.sent += n
+            delay = self.available_at - now
+        if delay > 0:
+            time.sleep(delay)
+    
+    def wrap(self, data):
+        if data is None:
+            return None
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            view = memoryview(data)
+            chunks = (view[i:i + self.chunk_size] for i in range(0, len(view), self.chunk_size))
+        elif hasattr(data, 'read'):
+            chunks = iter(lambda: data.read(self.chunk_size), b'')
+        else:
+            chunks = data
+        return self._throttle(chunks)
+    
+    def _throttle(self, chunks):
+        for chunk in chunks:
+            self.take(len(chunk))
+            yield chunk
+
+
+def bench_broadcast(peers='4', size_mb='16', mbps='200'):
+    """
+    Um arquivo para um grupo de receptores locais, com o uplink do emissor
+    limitado a `mbps` (os receptores repassam sem limite): um envio direto
+    por dispositivo vs. cadeia de retransmissão. Mede o tempo até cada
+    dispositivo ter o arquivo e os bytes que saíram do emissor.
+    """
+    import contextlib
+    import hashlib
+    import io
+    import os
+    import tempfile
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    
+    peers = int(peers)
+    size = int(float(size_mb) * 1024 * 1024)
+    mbps = float(mbps)
+    
+    def uplink_client(uplink):
+        client = FileTransferClient(dedup_min_size=float('inf'), delta_min_size=float('inf'))
+        session_for = client._session
+        
+        def session(ip, port):
+            s = session_for(ip, port)
+            if not hasattr(s, 'uplink'):
+                request = s.request
+                s.uplink = uplink
+                s.request = lambda method, url, data=None, **kw: request(
+                    method, url, data=uplink.wrap(data), **kw)
+            return s
+        
+        client._session = session
+        return client
+    
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        servers, devices = [], []
+        for i in range(peers):
+            server, port = _start_local_server(Path(tmp) / f"receptor{i}",
+                                               relay_peers=lambda: devices)
+            servers.append(server)
+            devices.append({'name': f"Dispositivo-{i:02d}", 'ip': '127.0.0.1', 'port': port,
+                            'rtt': None})
+        try:
+            for mode in ('direto', 'cadeia'):
+                source = Path(tmp) / f"{mode}.bin"
+                source.write_bytes(os.urandom(size))
+                digest = hashlib.sha256(source.read_bytes()).hexdigest()
+                
+                uplink = _SharedUplink(mbps)
+                client = uplink_client(uplink)
+                if mode == 'direto':
+                    # Receptores sem retransmissão: send_broadcast cai nos envios diretos
+                    for device in devices:
+                        client._peers[(device['ip'], device['port'])] = (
+                            time.monotonic(), {'features': ['chunked', 'stream']})
+                start = time.perf_counter()
+                with contextlib.redirect_stdout(io.StringIO()):
+                    ok, message, per_peer = client.send_broadcast(source, devices)
+                total = time.perf_counter() - start
+                client.close()
+                if not ok:
+                    raise RuntimeError(message)
+                
+                for server in servers:
+                    received = server.upload_dir / source.name
+                    if hashlib.sha256(received.read_bytes()).hexdigest() != digest:
+                        raise RuntimeError(f"Conteúdo diferente em {received}")
+                results[mode] = (total, [r['seconds'] for r in per_peer], uplink.sent)
+        finally:
+            with contextlib.redirect_stdout(io.StringIO()):
+                for server in servers:
+                    server.stop()
+    
+    print(f"{size_mb} MB para {peers} dispositivos, uplink do emissor de {mbps:g} Mbps")
+    print(f"{'Modo':8s} {'total s':>8s} {'por dispositivo (s)':>{8 * peers}s} {'uplink MB':>10s}")
+    for mode, (total, seconds, sent) in results.items():
+        per_peer = ''.join(f"{s:8.2f}" for s in seconds)
+        print(f"{mode:8s} {total:8.2f} {per_peer} {sent / 1e6:10.1f}")
+    
+    total, _, sent = results['cadeia']
+    ok = sent <= size * 1.1 and total < results['direto'][0]
+    print("✅ OK" if ok else "❌ Cadeia enviou mais de uma cópia ou não foi mais rápida")
+    return ok
+
+
+def bench_qos(mbps='100', size_mb='32', texts='10'):
+    """
+    Agendador de banda com o link limitado a `mbps`: latência de textos
+    pequenos enquanto um arquivo grande é enviado (fila única sem classes
+    vs. classes de prioridade com worker interativo) e divisão da banda
+    entre dois dispositivos recebendo arquivos grandes ao mesmo tempo.
+    """
+    import contextlib
+    import io
+    import os
+    import tempfile
+    from pathlib import Path
+    from file_transfer_client import FileTransferClient
+    from transfer_queue import TransferQueue
+    from transfer_scheduler import TransferScheduler
+    
+    mbps = float(mbps)
+    size = int(float(size_mb) * 1024 * 1024)
+    texts = int(texts)
+    limit_s = 1.0
+    
+    def client_for(scheduler):
+        return FileTransferClient(compression=False, dedup_min_size=float('inf'),
+                                  delta_min_size=float('inf'), scheduler=scheduler)
+    
+    latencies = {}
+    with tempfile.TemporaryDirectory() as tmp, contextlib.redirect_stdout(io.StringIO()):
+        bulk = Path(tmp) / 'grande.bin'
+        bulk.write_bytes(os.urandom(size))
+        servers = [_start_local_server(Path(tmp) / f"receptor{i}") for i in range(2)]
+        ports = [port for _, port in servers]
+        try:
+            for mode in ('fila única', 'qos'):
+                if mode == 'qos':
+                    scheduler = TransferScheduler(rate_mbps=mbps)
+                    transfers_options = {'workers': 1, 'interactive_workers': 1}
+                else:
+                    # Sem classes: tudo é bulk e divide o mesmo worker
+                    scheduler = TransferScheduler(rate_mbps=mbps, small_file_size=0)
+                    transfers_options = {'workers': 1}
+                client = client_for(scheduler)
+                client.ping_device('127.0.0.1', ports[0])
+                transfers = TransferQueue(lambda path: client.send_file(path, '127.0.0.1', ports[0]),
+                                          **transfers_options)
+                
+                running = transfers.submit(bulk)
+                time.sleep(0.5)  # envio grande já ocupando o link
+                values = []
+                for i in range(texts):
+                    text = Path(tmp) / f"{mode.replace(' ', '_')}_{i}.txt"
+                    text.write_text(f"texto copiado {i}\n" * 20)
+                    start = time.perf_counter()
+                    future = transfers.submit(text)
+                    future.result()
+                    values.append(time.perf_counter() - start)
+                    if running.done():
+                        break
+                latencies[mode] = values
+                running.result()
+                transfers.stop(wait=True)
+                client.close()
+            
+            # Dois dispositivos recebendo ao mesmo tempo, o segundo começando depois
+            client = client_for(TransferScheduler(rate_mbps=mbps))
+            finished = {}
+            
+            def send(port, delay):
+                time.sleep(delay)
+                start = time.perf_counter()
+                client.send_file(bulk, '127.0.0.1', port)
+                finished[port] = time.perf_counter() - start
+            
+            threads = [threading.Thread(target=send, args=(port, 0.5 * i)) for i, port in enumerate(ports)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            client.close()
+        finally:
+            for server, _ in servers:
+                server.stop()
+    
+    print(f"Link de {mbps:g} Mbps, envio de {size_mb} MB em andamento")
+    print(f"{'Textos':12s} {'p50 s':>7s} {'máx s':>7s}")
+    for mode, values in latencies.items():
+        print(f"{mode:12s} {_percentile(values, 50):7.2f} {max(values):7.2f}")
+    seconds = [finished[port] for port in ports]
+    print(f"Dois dispositivos (o 2º começa 0,5 s depois): {seconds[0]:.2f} s e {seconds[1]:.2f} s "
+          f"(os dois juntos ocupam o link por {2 * size * 8 / (mbps * 1e6):.2f} s)")
+    
+    ok = max(latencies['qos']) < limit_s and max(seconds) / min(seconds) < 1.5
+    print("✅ OK" if ok else f"❌ Texto levou mais de {limit_s:.0f} s ou banda dividida de forma desigual")
+    return ok
+
+
+BENCHMARKS = {
+    'filter': bench_filter,
+    'replay': bench_replay,
+    'transfer': bench_transfer,
+    'load': bench_load,
+    'small': bench_small,
+    'compression': bench_compression,
+    'dedup': bench_dedup,
+    'devices': bench_devices,
+    'speculative': bench_speculative,
+    'clipboard': bench_clipboard,
+    'encode': bench_encode,
+    'bundle': bench_bundle,
+    'metrics': bench_metrics,
+    'startup': bench_startup,
+    'inference': bench_inference,
+    'broadcast': bench_broadcast,
+    'qos': bench_qos,
+}
+
+
+def main():
+    if len(sys.argv) < 2 or sys.argv[1] not in BENCHMARKS:
+        print(__doc__)
+        sys.exit(2)
+    
+    ok = BENCHMARKS[sys.argv[1]](*sys.argv[2:])
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""
+Envio de vários arquivos e pastas como um único stream.
+
+O emissor percorre os caminhos sob demanda e gera um stream de registros
+(pasta, arquivo + conteúdo); o receptor desempacota conforme os bytes
+chegam, sem guardar o stream inteiro. Milhares de arquivos pequenos
+viram uma única requisição.
+"""
+
+import io
+import os
+import struct
+import sys
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+from werkzeug.utils import secure_filename
+
+from stream_receiver import UploadTooLarge, IncompleteUpload
+
+MAGIC = b'ATB1'
+BATCH_SIZE = 256 * 1024          # registros pequenos são agrupados até esse tamanho
+READ_SIZE = 1024 * 1024
+MAX_ENTRIES = 100_000            # arquivos + pastas de uma seleção
+MAX_SIZE = 500 * 1024 * 1024     # o mesmo limite de corpo do receptor
+
+# Registros do stream
+REC_DIR = b'D'    # + tamanho do nome (u16) + nome
+REC_FILE = b'F'   # + tamanho do nome (u16) + nome + tamanho (u64) + conteúdo
+REC_END = b'E'
+
+
+def parse_clipboard_paths(content):
+    """
+    Caminhos copiados no clipboard: lista de arquivos (CF_HDROP do
+    Windows), um caminho absoluto por linha ou URIs file:// (text/uri-list,
+    x-special/gnome-copied-files). Retorna a lista de caminhos, ou None
+    se alguma linha não é um caminho existente (é texto comum).
+    
+    Pastas só valem vindas de uma lista de arquivos ou de URIs (o que os
+    gerenciadores de arquivos copiam): um texto como "/" ou "." não vira
+    um pacote da pasta. A raiz de um disco nunca é aceita.
+    """
+    file_list = isinstance(content, (list, tuple))
+    if file_list:
+        lines = [str(item) for item in content]
+    else:
+        lines = [line.strip() for line in content.splitlines()]
+        lines = [line for line in lines if line and not line.startswith('#')]
+        if lines and lines[0] in ('copy', 'cut'):
+            lines = lines[1:]
+    
+    paths = []
+    for line in lines:
+        listed = file_list
+        if line.startswith('file://'):
+            listed = True
+            uri = urlparse(line)
+            path = unquote(uri.path)
+            if uri.netloc and uri.netloc != 'localhost':
+                path = f"//{uri.netloc}{path}"
+            elif sys.platform == 'win32' and path[:1] == '/' and path[2:3] == ':':
+                path = path[1:]  # /C:/pasta -> C:/pasta
+        else:
+            path = line.strip('"')
+        if not path or not os.path.isabs(path) or not os.path.exists(path):
+            return None
+        if os.path.isdir(path):
+            resolved = Path(path).resolve()
+            if not listed or resolved == Path(resolved.anchor):
+                return None
+        paths.append(path)
+    return paths or None
+
+
+def describe(paths):
+    """Descrição curta de uma seleção para mensagens"""
+    if len(paths) == 1:
+        return Path(paths[0]).name
+    return f"{Path(paths[0]).name} e mais {len(paths) - 1}"
+
+
+def walk_paths(paths):
+    """
+    Percorre os caminhos sob demanda, gerando ('D', nome) para pastas e
+    ('F', nome, caminho, tamanho) para arquivos. Os nomes são relativos à
+    pasta de cada item selecionado, separados por '/'. Links simbólicos
+    para pastas não são seguidos.
+    """
+    top_names = set()
+    for path in paths:
+        path = Path(path)
+        name = path.name or path.anchor.strip('\\/:') or 'raiz'
+        # Itens selecionados de pastas diferentes com o mesmo nome
+        stem, suffix, counter = Path(name).stem, Path(name).suffix, 1
+        while name in top_names:
+            name = f"{stem}_{counter}{suffix}"
+            counter += 1
+        top_names.add(name)
+        
+        if not path.is_dir():
+            yield REC_FILE, name, path, path.stat().st_size
+            continue
+        
+        yield REC_DIR, name
+        stack = [(path, name)]
+        while stack:
+            directory, prefix = stack.pop()
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    arcname = f"{prefix}/{entry.name}"
+                    if entry.is_dir(follow_symlinks=False):
+                        yield REC_DIR, arcname
+                        stack.append((entry.path, arcname))
+                    elif entry.is_file():
+                        yield REC_FILE, arcname, Path(entry.path), entry.stat().st_size
+
+
+def check_limits(paths, max_entries=MAX_ENTRIES, max_size=MAX_SIZE):
+    """
+    Confere, antes do envio, que a seleção cabe nos limites (percorre só
+    os metadados e para no primeiro excesso). UploadTooLarge se não cabe;
+    retorna (entradas, bytes).
+    """
+    entries = size = 0
+    for entry in walk_paths(paths):
+        entries += 1
+        if entry[0] == REC_FILE:
+            size += entry[3]
+        if entries > max_entries:
+            raise UploadTooLarge(f"Seleção com mais de {max_entries} arquivos e pastas")
+        if size > max_size:
+            raise UploadTooLarge(f"Seleção maior que {max_size // (1024 * 1024)} MB")
+    return entries, size
+
+
+def _name_record(kind, name):
+    data = name.encode('utf-8')
+    return kind + struct.pack('>H', len(data)) + data
+
+
+def bundle_stream(entries, batch_size=BATCH_SIZE):
+    """Gera o stream de registros de `entries` (ver walk_paths) em blocos de ~batch_size"""
+    buffer = bytearray(MAGIC)
+    for entry in entries:
+        if entry[0] == REC_DIR:
+            buffer += _name_record(REC_DIR, entry[1])
+            continue
+        
+        _, name, path, size = entry
+        buffer += _name_record(REC_FILE, name) + struct.pack('>Q', size)
+        with open(path, 'rb') as f:
+            remaining = size
+            while remaining > 0:
+                data = f.read(min(remaining, READ_SIZE))
+                if not data:
+                    raise IncompleteUpload(f"Arquivo mudou durante o envio: {path}")
+                remaining -= len(data)
+                if len(buffer) + len(data) <= batch_size:
+                    buffer += data
+                    continue
+                if buffer:
+                    yield bytes(buffer)
+                    buffer.clear()
+                yield data
+        if len(buffer) >= batch_size:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += REC_END
+    yield bytes(buffer)
+
+
+def safe_relpath(name):
+    """Nome relativo do stream -> Path seguro (sem '..', absolutos ou separadores)"""
+    parts = []
+    for part in name.split('/'):
+        if part in ('', '.', '..'):
+            raise ValueError(f"Nome inválido no pacote: {name!r}")
+        clean = secure_filename(part)
+        if not clean:
+            raise ValueError(f"Nome inválido no pacote: {name!r}")
+        parts.append(clean)
+    return Path(*parts)
+
+
+def _read_exact(source, length):
+    data = source.read(length)
+    if len(data) == length:
+        return data
+    chunks = [data]
+    length -= len(data)
+    while length > 0:
+        data = source.read(length)
+        if not data:
+            raise IncompleteUpload("Pacote truncado")
+        chunks.append(data)
+        length -= len(data)
+    return b''.join(chunks)
+
+
+def _copy_exact(source, fd, length, buffer):
+    view = memoryview(buffer)
+    readinto = getattr(source, 'readinto', None)
+    while length > 0:
+        if readinto is not None:
+            n = readinto(view[:min(length, len(buffer))])
+            data = view[:n]
+        else:
+            data = source.read(min(length, len(buffer)))
+            n = len(data)
+        if not n:
+            raise IncompleteUpload("Pacote truncado")
+        pending = memoryview(data)
+        while pending:
+            pending = pending[os.write(fd, pending):]
+        length -= n
+
+
+def unpack_bundle(source, destination, max_length):
+    """
+    Desempacota o stream em `destination` conforme ele chega. Retorna
+    (arquivos, pastas, bytes, nomes de primeiro nível em ordem). Nomes
+    são sanitizados; o chamador remove `destination` em caso de erro.
+    """
+    if isinstance(source, io.RawIOBase):
+        source = io.BufferedReader(source, BATCH_SIZE)
+    if _read_exact(source, len(MAGIC)) != MAGIC:
+        raise ValueError("Formato de pacote desconhecido")
+    
+    destination = Path(destination)
+    buffer = bytearray(READ_SIZE)
+    files = dirs = total = 0
+    top_level = {}  # nomes de primeiro nível, em ordem
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    
+    while True:
+        kind = _read_exact(source, 1)
+        if kind == REC_END:
+            return files, dirs, total, list(top_level)
+        if kind not in (REC_DIR, REC_FILE):
+            raise ValueError(f"Registro inválido: {kind!r}")
+        
+        length, = struct.unpack('>H', _read_exact(source, 2))
+        relpath = safe_relpath(_read_exact(source, length).decode('utf-8'))
+        target = destination / relpath
+        top_level.setdefault(relpath.parts[0])
+        
+        if kind == REC_DIR:
+            target.mkdir(parents=True, exist_ok=True)
+            dirs += 1
+            continue
+        
+        size, = struct.unpack('>Q', _read_exact(source, 8))
+        total += size
+        if total > max_length:
+            raise UploadTooLarge(f"Pacote excede o limite de {max_length} bytes")
+        target.parent.mkdir(parents=True, exist_ok=True)
+        fd = os.open(target, flags, 0o644)
+        try:
+            _copy_exact(source, fd, size, buffer)
+        finally:
+            os.close(fd)
+        files += 1
@@ -0,0 +1,238 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+from stream_receiver import preallocate
+
+DEFAULT_CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+
+
+class UploadClosed(Exception):
+    """Upload já finalizado (ou descartado): não aceita mais partes"""
+
+
+def _write_at(fd, offset, data, lock):
+    """Escreve `data` no offset indicado (pwrite quando disponível)"""
+    if hasattr(os, 'pwrite'):
+        view = memoryview(data)
+        while view:
+            written = os.pwrite(fd, view, offset)
+            view = view[written:]
+            offset += written
+    else:
+        # Windows não tem pwrite: seek + write sob lock
+        with lock:
+            os.lseek(fd, offset, os.SEEK_SET)
+            view = memoryview(data)
+            while view:
+                view = view[os.write(fd, view):]
+
+
+class UploadSession:
+    """Upload em partes: arquivo pré-alocado + mapa de chunks recebidos"""
+    def __init__(self, upload_id, filename, size, chunk_size, chunk_hashes,
+                 file_hash, part_path, state_path, received=None):
+        self.upload_id = upload_id
+        self.filename = filename
+        self.size = size
+        self.chunk_size = chunk_size
+        self.chunk_hashes = chunk_hashes
+        self.file_hash = file_hash
+        self.part_path = part_path
+        self.state_path = state_path
+        self.received = bytearray(received or len(chunk_hashes))
+        self.updated_at = time.time()
+        self.lock = threading.Lock()
+        self.writers = 0  # gravações em andamento (close() espera todas)
+        self.idle = threading.Condition(self.lock)
+        
+        self.fd = os.open(part_path, os.O_RDWR | os.O_CREAT | getattr(os, 'O_BINARY', 0))
+        if os.fstat(self.fd).st_size != size:
+            preallocate(self.fd, size)
+    
+    @property
+    def num_chunks(self):
+        return len(self.chunk_hashes)
+    
+    def chunk_length(self, index):
+        start = index * self.chunk_size
+        return min(self.chunk_size, self.size - start)
+    
+    def missing(self):
+        return [i for i, done in enumerate(self.received) if not done]
+    
+    def received_ranges(self):
+        """Intervalos de bytes recebidos [(início, fim), ...]"""
+        ranges = []
+        for i, done in enumerate(self.received):
+            if not done:
+                continue
+            start = i * self.chunk_size
+            end = start + self.chunk_length(i)
+            if ranges and ranges[-1][1] == start:
+                ranges[-1] = (ranges[-1][0], end)
+            else:
+                ranges.append((start, end))
+        return ranges
+    
+    def is_complete(self):
+        return all(self.received)
+    
+    def write_chunk(self, index, data):
+        """Valida o hash do chunk e grava no offset correspondente"""
+        if not 0 <= index < self.num_chunks:
+            raise ValueError(f"Chunk fora do intervalo: {index}")
+        if len(data) != self.chunk_length(index):
+            raise ValueError(f"Tamanho inválido do chunk {index}")
+        if hashlib.sha256(data).hexdigest() != self.chunk_hashes[index]:
+            raise ValueError(f"Hash inválido do chunk {index}")
+        
+        with self.lock:
+            if self.fd is None:
+                raise UploadClosed(f"Upload {self.upload_id} já finalizado")
+            self.writers += 1
+            fd = self.fd
+        try:
+            _write_at(fd, index * self.chunk_size, data, self.lock)
+            with self.lock:
+                self.received[index] = 1
+                self.updated_at = time.time()
+                self._save_state()
+        finally:
+            with self.lock:
+                self.writers -= 1
+                self.idle.notify_all()
+    
+    def _save_state(self):
+        state = {
+            'upload_id': self.upload_id,
+            'filename': self.filename,
+            'size': self.size,
+            'chunk_size': self.chunk_size,
+            'chunk_hashes': self.chunk_hashes,
+            'file_hash': self.file_hash,
+            'received': self.received_ranges(),
+        }
+        tmp_path = self.state_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+    
+    def close(self):
+        """Fecha o arquivo depois das gravações em andamento; novas partes falham"""
+        with self.lock:
+            fd, self.fd = self.fd, None
+            while self.writers:
+                self.idle.wait()
+        if fd is not None:
+            os.close(fd)
+
+
+class ChunkedUploadManager:
+    """
+    Gerencia uploads em partes no diretório de staging. O estado de cada
+    upload é persistido em JSON, permitindo retomar após reinício.
+    """
+    def __init__(self, staging_dir, max_age_hours=24):
+        self.staging_dir = Path(staging_dir)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self.max_age_hours = max_age_hours
+        self.sessions = {}
+        self.lock = threading.Lock()
+    
+    @staticmethod
+    def make_upload_id(filename, size, file_hash):
+        """ID determinístico pelo conteúdo: o mesmo arquivo retoma a mesma sessão"""
+        key = f"{filename}:{size}:{file_hash}".encode('utf-8')
+        return hashlib.sha256(key).hexdigest()[:32]
+    
+    def _paths(self, upload_id):
+        return (self.staging_dir / f"{upload_id}.part",
+                self.staging_dir / f"{upload_id}.json")
+    
+    def init_upload(self, filename, size, chunk_size, chunk_hashes, file_hash):
+        """Cria a sessão, ou retoma uma existente com o mesmo conteúdo"""
+        expected_chunks = (size + chunk_size - 1) // chunk_size if size else 0
+        if chunk_size <= 0 or len(chunk_hashes) != expected_chunks:
+            raise ValueError("Metadados de chunks inconsistentes")
+        # Sem o hash, arquivos diferentes com o mesmo nome e tamanho
+        # retomariam as partes um do outro
+        if not (isinstance(file_hash, str) and len(file_hash) == 64
+                and all(c in '0123456789abcdef' for c in file_hash)):
+            raise ValueError("sha256 do arquivo obrigatório")
+        
+        upload_id = self.make_upload_id(filename, size, file_hash)
+        with self.lock:
+            session = self.sessions.get(upload_id) or self._load(upload_id)
+            if session is None or session.chunk_size != chunk_size:
+                if session is not None:
+                    session.close()
+                part_path, state_path = self._paths(upload_id)
+                session = UploadSession(upload_id, filename, size, chunk_size,
+                                        list(chunk_hashes), file_hash,
+                                        part_path, state_path)
+                session._save_state()
+            self.sessions[upload_id] = session
+            return session
+    
+    def _load(self, upload_id):
+        """Recupera uma sessão persistida no disco"""
+        part_path, state_path = self._paths(upload_id)
+        if not (state_path.exists() and part_path.exists()):
+            return None
+        try:
+            with open(state_path, 'r') as f:
+                state = json.load(f)
+            received = bytearray(len(state['chunk_hashes']))
+            for start, end in state['received']:
+                first = start // state['chunk_size']
+                last = (end + state['chunk_size'] - 1) // state['chunk_size']
+                received[first:last] = b'\x01' * (last - first)
+            return UploadSession(upload_id, state['filename'], state['size'],
+                                 state['chunk_size'], state['chunk_hashes'],
+                                 state['file_hash'], part_path, state_path, received)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Estado de upload inválido ({upload_id}): {e}")
+            return None
+    
+    def get(self, upload_id):
+        with self.lock:
+            session = self.sessions.get(upload_id)
+            if session is None:
+                session = self._load(upload_id)
+                if session is not None:
+                    self.sessions[upload_id] = session
+            return session
+    
+    def finish(self, upload_id):
+        """
+        Fecha a sessão completa e retorna o caminho do arquivo montado.
+        O chamador move o arquivo para o destino final.
+        """
+        with self.lock:
+            session = self.sessions.get(upload_id)
+            if session is None or not session.is_complete():
+                return None
+            del self.sessions[upload_id]
+            # Sem o estado no disco, get() não recarrega a sessão finalizada
+            session.state_path.unlink(missing_ok=True)
+        session.close()
+        return session
+    
+    def cleanup(self):
+        """Remove uploads abandonados há mais de max_age_hours"""
+        limit = time.time() - self.max_age_hours * 3600
+        with self.lock:
+            for upload_id, session in list(self.sessions.items()):
+                if session.updated_at < limit:
+                    session.close()
+                    del self.sessions[upload_id]
+        for path in self.staging_dir.glob('*'):
+            try:
+                if path.stat().st_mtime < limit:
+                    path.unlink()
+            except OSError:
+                pass
@@ -1,54 +1,241 @@
-import pyperclip
+import hashlib
 import os
 import tempfile
-from PIL import ImageGrab
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 import time
 from pathlib import Path
+from bundle import parse_clipboard_paths
+import metrics
+
+try:
+    import win32clipboard
+except ImportError:
+    win32clipboard = None
+
+try:
+    from AppKit import NSPasteboard
+except ImportError:
+    NSPasteboard = None
+
+CACHE_ENTRIES = 16  # conteúdos já gravados mantidos no cache
+
+# Formatos de gravação das imagens do clipboard: extensão e opções do Pillow.
+# 'bmp' não comprime (a compressão fica com o envio, ver transfer_codec)
+IMAGE_FORMATS = {
+    'png': ('.png', 'PNG', {}),
+    'webp': ('.webp', 'WEBP', {'lossless': True, 'method': 0}),
+    'bmp': ('.bmp', 'BMP', {}),
+}
+
+CAPTURE_SECONDS = metrics.histogram(
+    'aiteleport_clipboard_capture_seconds', 'Tempo de captura do clipboard (leitura + gravação)', ['type'])
+ENCODE_SECONDS = metrics.histogram(
+    'aiteleport_clipboard_encode_seconds', 'Tempo de codificação das imagens do clipboard', ['format'])
+CACHE_HITS = metrics.counter(
+    'aiteleport_clipboard_cache_hits_total', 'Capturas reaproveitadas do cache', ['by'])
+
+
+def clipboard_sequence():
+    """
+    Contador de alterações do clipboard mantido pelo sistema (Windows:
+    GetClipboardSequenceNumber; macOS: changeCount), ou None se não há
+    como consultá-lo sem ler o conteúdo.
+    """
+    try:
+        if win32clipboard is not None:
+            return win32clipboard.GetClipboardSequenceNumber()
+        if NSPasteboard is not None:
+            return NSPasteboard.generalPasteboard().changeCount()
+    except Exception:
+        pass
+    return None
+
 
 class ClipboardManager:
-    def __init__(self):
+    """
+    Captura do clipboard com cache.
+    
+    Se o sistema informa um número de sequência do clipboard e ele não
+    mudou desde a última captura, o resultado anterior é devolvido sem
+    ler o clipboard. Caso contrário o conteúdo é lido e identificado por
+    hash: imagens e textos já gravados (LRU de CACHE_ENTRIES arquivos)
+    são reaproveitados sem codificar o PNG de novo. Arquivos em uso por
+    um envio (acquire/release) saem do cache sem ser apagados; o último
+    release() os apaga.
+    
+    capture_async() faz a captura e a codificação em um worker, fora da
+    thread da câmera.
+    """
+    def __init__(self, cache_entries=CACHE_ENTRIES, image_format='png', png_level=1):
+        if image_format not in IMAGE_FORMATS:
+            raise ValueError(f"Formato de imagem desconhecido: {image_format}")
         self.temp_dir = Path(tempfile.gettempdir()) / "ai_teleportation"
         self.temp_dir.mkdir(exist_ok=True)
-        
+        self.image_format = image_format
+        self.png_level = png_level  # zlib 1-9 (o padrão do Pillow é 6, ~20% mais lento)
+        self.cache_entries = cache_entries
+        self.cache = OrderedDict()  # hash do conteúdo -> caminho gravado
+        self.in_use = {}            # caminho -> envios que ainda leem o arquivo
+        self.evicted = set()        # fora do cache, apagados no último release()
+        self.last_sequence = None
+        self.last_capture = None
+        self.lock = threading.Lock()
+        # Um worker: o acesso ao clipboard do sistema é serializado de qualquer forma
+        self.pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix='clipboard')
+    
+    def capture_async(self, then=None):
+        """
+        Captura em segundo plano. Retorna um Future com (tipo, caminho),
+        ou com then(tipo, caminho) executado no mesmo worker.
+        """
+        def job():
+            capture = self.capture_clipboard()
+            return then(*capture) if then else capture
+        return self.pool.submit(job)
+    
     def capture_clipboard(self):
         """
         Captura conteúdo do clipboard e retorna:
-        - tipo: 'text', 'image', ou 'file'
-        - conteúdo: string de texto ou caminho do arquivo
+        - tipo: 'text', 'image', 'file' ou 'bundle'
+        - conteúdo: caminho do arquivo (lista de caminhos para 'bundle':
+          vários arquivos copiados ou pastas)
         """
+        start = time.perf_counter()
         try:
-            # Tenta capturar imagem primeiro
-            image = ImageGrab.grabclipboard()
-            if image is not None:
-                # Salva imagem temporariamente
-                filename = f"clipboard_{int(time.time())}.png"
-                filepath = self.temp_dir / filename
-                image.save(filepath, 'PNG')
-                return 'image', str(filepath)
-            
-            # Tenta capturar texto
-            text = pyperclip.paste()
-            if text and text.strip():
-                # Verifica se é caminho de arquivo
-                if os.path.exists(text):
-                    return 'file', text
-                else:
-                    # Salva texto como arquivo temporário
-                    filename = f"clipboard_{int(time.time())}.txt"
-                    filepath = self.temp_dir / filename
-                    with open(filepath, 'w', encoding='utf-8') as f:
-                        f.write(text)
-                    return 'text', str(filepath)
-            
-            return None, None
-            
+            with self.lock:
+                sequence = clipboard_sequence()
+                if (sequence is not None and sequence == self.last_sequence
+                        and self.last_capture and self._still_exists(self.last_capture[1])):
+                    CACHE_HITS.labels('sequence').inc()
+                    return self.last_capture
+                
+                capture = self._read_clipboard()
+                self.last_sequence = sequence
+                self.last_capture = capture if capture[0] else None
+                if capture[0]:
+                    CAPTURE_SECONDS.labels(capture[0]).observe(time.perf_counter() - start)
+                return capture
+        
         except Exception as e:
             print(f"Erro ao capturar clipboard: {e}")
             return None, None
     
+    @staticmethod
+    def _still_exists(content):
+        if isinstance(content, list):
+            return all(os.path.exists(path) for path in content)
+        return os.path.exists(content)
+    
+    def _read_clipboard(self):
+        # Importados no primeiro uso: receptores e o início do programa não pagam por eles
+        import pyperclip
+        from PIL import ImageGrab
+        
+        # Tenta capturar imagem primeiro
+        image = ImageGrab.grabclipboard()
+        if isinstance(image, list):
+            # Windows: arquivos copiados no Explorer vêm como lista de caminhos
+            paths = parse_clipboard_paths(image)
+            return self._paths_capture(paths) if paths else (None, None)
+        if image is not None:
+            return 'image', self.store_image(image)
+        
+        # Tenta capturar texto
+        text = pyperclip.paste()
+        if text and text.strip():
+            # Verifica se são caminhos de arquivos/pastas (um por linha ou file://)
+            paths = parse_clipboard_paths(text)
+            if paths:
+                return self._paths_capture(paths)
+            # Salva texto como arquivo temporário
+            return 'text', self.store_text(text)
+        
+        return None, None
+    
+    @staticmethod
+    def _paths_capture(paths):
+        if len(paths) == 1 and os.path.isfile(paths[0]):
+            return 'file', paths[0]
+        return 'bundle', paths
+    
+    def store_image(self, image):
+        """Grava a imagem no formato configurado, ou reaproveita o arquivo de um conteúdo igual"""
+        # SHA-1 só identifica o conteúdo (não é uso de segurança) e é ~2x
+        # mais rápido que BLAKE2 em imagens 4K
+        digest = hashlib.sha1(image.tobytes())
+        digest.update(f"{image.mode}:{image.size}".encode())
+        suffix, _, _ = IMAGE_FORMATS[self.image_format]
+        return self._store(digest.hexdigest(), suffix, lambda path: self.encode_image(image, path))
+    
+    def encode_image(self, image, path, image_format=None):
+        """Codifica `image` em `path` no formato pedido (ou no configurado)"""
+        image_format = image_format or self.image_format
+        _, pil_format, options = IMAGE_FORMATS[image_format]
+        if pil_format == 'PNG':
+            options = {'compress_level': self.png_level}
+        elif pil_format == 'BMP' and image.mode not in ('1', 'L', 'P', 'RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        with ENCODE_SECONDS.labels(image_format).time():
+            image.save(path, pil_format, **options)
+    
+    def store_text(self, text):
+        """Grava o texto em .txt, ou reaproveita o arquivo de um texto igual"""
+        data = text.encode('utf-8')
+        return self._store(hashlib.sha1(data).hexdigest(), '.txt', lambda path: path.write_bytes(data))
+    
+    def _store(self, digest, suffix, write):
+        cached = self.cache.get(digest)
+        if cached is not None and cached.exists():
+            self.cache.move_to_end(digest)
+            CACHE_HITS.labels('content').inc()
+            return str(cached)
+        
+        # Nome único (data + hash do conteúdo); gravado em temporário e
+        # renomeado para nunca expor um arquivo pela metade
+        filepath = self.temp_dir / f"clipboard_{time.strftime('%Y%m%d_%H%M%S')}_{digest[:8]}{suffix}"
+        temp_path = filepath.with_name(f".{filepath.name}.{os.getpid()}.tmp")
+        write(temp_path)
+        os.replace(temp_path, filepath)
+        
+        self.cache[digest] = filepath
+        self.cache.move_to_end(digest)
+        self.evicted.discard(filepath)
+        while len(self.cache) > self.cache_entries:
+            _, evicted = self.cache.popitem(last=False)
+            if evicted in self.in_use:
+                self.evicted.add(evicted)
+            else:
+                evicted.unlink(missing_ok=True)
+        return str(filepath)
+    
+    def acquire(self, path):
+        """Marca um arquivo capturado como em uso: o LRU não o apaga até o release()"""
+        path = Path(path)
+        with self.lock:
+            self.in_use[path] = self.in_use.get(path, 0) + 1
+    
+    def release(self, path):
+        """Fim de um uso; apaga o arquivo se ele saiu do cache enquanto era enviado"""
+        path = Path(path)
+        with self.lock:
+            count = self.in_use.pop(path, 0) - 1
+            if count > 0:
+                self.in_use[path] = count
+                return
+            if path not in self.evicted:
+                return
+            self.evicted.discard(path)
+        path.unlink(missing_ok=True)
+    
+    def stop(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+    
     def set_clipboard_text(self, text):
         """Define texto no clipboard"""
         try:
+            import pyperclip
             pyperclip.copy(text)
             return True
         except Exception as e:
@@ -59,8 +246,12 @@ class ClipboardManager:
         """Remove arquivos temporários antigos"""
         try:
             current_time = time.time()
+            with self.lock:
+                cached = set(self.cache.values()) | set(self.in_use)
             for file in self.temp_dir.glob("clipboard_*"):
+                if file in cached:
+                    continue
                 if current_time - file.stat().st_mtime > max_age_hours * 3600:
                     file.unlink()
         except Exception as e:
-            print(f"Erro ao limpar arquivos temporários: {e}")
\ No newline at end of file
+            print(f"Erro ao limpar arquivos temporários: {e}")
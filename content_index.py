@@ -0,0 +1,193 @@
+import hashlib
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+
+HASH_BUFFER_SIZE = 1024 * 1024
+FICLONE = 0x40049409  # ioctl de reflink (Btrfs, XFS)
+COMPACT_MIN_LINES = 1000  # linhas no log antes de valer regravar o índice
+
+
+def hash_file(path):
+    """SHA-256 de um arquivo lido em blocos"""
+    hasher = hashlib.sha256()
+    buffer = bytearray(HASH_BUFFER_SIZE)
+    view = memoryview(buffer)
+    with open(path, 'rb', buffering=0) as f:
+        while True:
+            n = f.readinto(view)
+            if not n:
+                break
+            hasher.update(view[:n])
+    return hasher.hexdigest()
+
+
+def clone_file(src, dst):
+    """
+    Cria `dst` com o conteúdo de `src` sem copiar dados quando possível:
+    reflink (cópia sob escrita), depois hardlink, por fim cópia comum.
+    Retorna o método usado.
+    """
+    if fcntl is not None:
+        try:
+            with open(src, 'rb') as fsrc, open(dst, 'xb') as fdst:
+                fcntl.ioctl(fdst.fileno(), FICLONE, fsrc.fileno())
+            return 'reflink'
+        except OSError:
+            Path(dst).unlink(missing_ok=True)
+    try:
+        os.link(src, dst)
+        return 'hardlink'
+    except OSError:
+        shutil.copyfile(src, dst)
+        return 'copy'
+
+
+class ContentIndex:
+    """
+    Hash de conteúdo dos arquivos em upload_dir, persistido em JSON.
+    Cada entrada guarda tamanho e mtime para detectar arquivos alterados
+    fora do servidor; nesses casos o hash é recalculado sob demanda.
+    
+    O índice reverso hash -> nomes permite achar um arquivo pelo
+    conteúdo (deduplicação de envios repetidos).
+    
+    Mudanças vão para um log só de acréscimo (uma linha JSON cada), sem
+    regravar o índice inteiro a cada arquivo recebido; o log é
+    incorporado ao JSON ao abrir, em close() e quando fica maior que o
+    próprio índice.
+    """
+    def __init__(self, root, index_name='.content_index.json', log_name='.content_index.log'):
+        self.root = Path(root)
+        self.index_path = self.root / index_name
+        self.log_path = self.root / log_name
+        self.entries = {}  # nome -> (tamanho, mtime_ns, sha256)
+        self.by_hash = {}  # sha256 -> {nomes}
+        self.lock = threading.Lock()
+        self._log = None
+        self._log_lines = 0
+        self._load()
+        with self.lock:
+            self._compact()
+    
+    def _load(self):
+        try:
+            with open(self.index_path, 'r') as f:
+                self.entries = {name: tuple(entry) for name, entry in json.load(f).items()}
+        except (OSError, ValueError):
+            self.entries = {}
+        try:
+            with open(self.log_path, 'r') as f:
+                for line in f:
+                    try:
+                        name, entry = json.loads(line)
+                    except ValueError:
+                        continue  # última linha cortada por uma queda
+                    if entry is None:
+                        self.entries.pop(name, None)
+                    else:
+                        self.entries[name] = tuple(entry)
+        except OSError:
+            pass
+        self.by_hash = {}
+        for name, entry in self.entries.items():
+            self.by_hash.setdefault(entry[2], set()).add(name)
+    
+    def _set(self, name, entry):
+        """Atualiza a entrada e o índice reverso (com o lock)"""
+        old = self.entries.get(name)
+        if old is not None and old[2] != entry[2]:
+            names = self.by_hash.get(old[2])
+            if names:
+                names.discard(name)
+                if not names:
+                    del self.by_hash[old[2]]
+        self.entries[name] = entry
+        self.by_hash.setdefault(entry[2], set()).add(name)
+    
+    def _append(self, name, entry):
+        """Grava a mudança no log (com o lock); entry None remove o nome"""
+        if self._log is None:
+            self._log = open(self.log_path, 'a')
+        self._log.write(json.dumps([name, entry]) + '\n')
+        self._log.flush()
+        self._log_lines += 1
+        if self._log_lines > COMPACT_MIN_LINES and self._log_lines > len(self.entries):
+            self._compact()
+    
+    def _compact(self):
+        """Grava o índice inteiro e esvazia o log (com o lock)"""
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+        tmp_path = self.index_path.with_suffix('.tmp')
+        with open(tmp_path, 'w') as f:
+            json.dump(self.entries, f)
+        os.replace(tmp_path, self.index_path)
+        # Uma queda entre as duas etapas só reaplica o log sobre o índice novo
+        open(self.log_path, 'w').close()
+        self._log_lines = 0
+    
+    def close(self):
+        """Incorpora o log ao índice (no encerramento do servidor)"""
+        with self.lock:
+            self._compact()
+    
+    def record(self, path, sha256):
+        """Registra o hash de um arquivo recém-gravado"""
+        path = Path(path)
+        st = path.stat()
+        with self.lock:
+            entry = (st.st_size, st.st_mtime_ns, sha256)
+            self._set(path.name, entry)
+            self._append(path.name, entry)
+    
+    def get_hash(self, path):
+        """Hash do arquivo; calcula e guarda se não houver entrada válida"""
+        path = Path(path)
+        st = path.stat()
+        with self.lock:
+            entry = self.entries.get(path.name)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime_ns:
+            return entry[2]
+        
+        sha256 = hash_file(path)
+        with self.lock:
+            entry = (st.st_size, st.st_mtime_ns, sha256)
+            self._set(path.name, entry)
+            self._append(path.name, entry)
+        return sha256
+    
+    def find(self, sha256):
+        """
+        Caminho de um arquivo com o conteúdo pedido, ou None. Entradas de
+        arquivos apagados ou alterados desde a indexação são descartadas.
+        """
+        with self.lock:
+            names = list(self.by_hash.get(sha256, ()))
+        for name in names:
+            path = self.root / name
+            try:
+                st = path.stat()
+            except OSError:
+                st = None
+            with self.lock:
+                entry = self.entries.get(name)
+                if st is not None and entry and entry[:2] == (st.st_size, st.st_mtime_ns):
+                    return path
+                # Índice desatualizado: remove a associação com esse hash
+                names_for_hash = self.by_hash.get(sha256)
+                if names_for_hash:
+                    names_for_hash.discard(name)
+                    if not names_for_hash:
+                        del self.by_hash[sha256]
+                if st is None and self.entries.pop(name, None) is not None:
+                    self._append(name, None)
+        return None
@@ -0,0 +1,240 @@
+"""
+Envio por diferença (estilo rsync).
+
+O receptor publica a assinatura de um arquivo que já tem (checksum fraco
++ hash forte por bloco); o emissor procura esses blocos no arquivo novo
+com um checksum rolante, em qualquer offset, e envia só instruções de
+cópia para os blocos encontrados e os bytes literais do resto.
+"""
+
+import hashlib
+import os
+import struct
+
+import numpy as np
+
+from stream_receiver import UploadTooLarge, IncompleteUpload
+
+WEAK_MOD = 1 << 16
+SEGMENT_SIZE = 4 * 1024 * 1024    # janela do arquivo processada por vez
+MAX_LITERAL = 1024 * 1024         # literais maiores são quebrados em partes
+BLOOM_SIZE = 1 << 20
+MIN_BLOCK_SIZE = 4096
+MAX_BLOCK_SIZE = 1024 * 1024
+
+# Instruções do stream de diferença
+OP_COPY = b'C'      # + índice do primeiro bloco (u32) + quantidade (u32)
+OP_LITERAL = b'L'   # + tamanho (u32) + bytes
+OP_END = b'E'
+
+
+def block_size_for(size):
+    """Tamanho de bloco ~ raiz do tamanho do arquivo (4KB a 1MB), como no rsync"""
+    block_size = MIN_BLOCK_SIZE
+    while block_size * block_size < size and block_size < MAX_BLOCK_SIZE:
+        block_size *= 2
+    return block_size
+
+
+def strong_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def signature(filepath, block_size=None):
+    """Checksum fraco e hash forte de cada bloco completo do arquivo"""
+    size = os.path.getsize(filepath)
+    block_size = block_size or block_size_for(size)
+    weights = np.arange(block_size, 0, -1, dtype=np.int64)
+    weak, strong = [], []
+    
+    with open(filepath, 'rb') as f:
+        while True:
+            data = f.read(block_size * 64)
+            count = len(data) // block_size
+            if count:
+                blocks = np.frombuffer(data, dtype=np.uint8,
+                                       count=count * block_size).reshape(count, block_size)
+                a = blocks.sum(axis=1, dtype=np.int64) % WEAK_MOD
+                b = (blocks @ weights) % WEAK_MOD
+                weak.extend((a + b * WEAK_MOD).tolist())
+                strong.extend(strong_hash(data[i * block_size:(i + 1) * block_size])
+                              for i in range(count))
+            if len(data) < block_size * 64:
+                break
+    
+    return {'block_size': block_size, 'size': size, 'weak': weak, 'strong': strong}
+
+
+def _rolling_weak(x, block_size):
+    """
+    Checksum fraco de todas as janelas de `block_size` bytes de `x`, via
+    somas acumuladas. Em uint32 o estouro é aritmética mód 2^32, o que
+    preserva os valores mód 2^16.
+    """
+    values = x.astype(np.uint32)
+    positions = np.arange(len(values), dtype=np.uint32)
+    s = np.concatenate((np.zeros(1, np.uint32), np.cumsum(values, dtype=np.uint32)))
+    t = np.concatenate((np.zeros(1, np.uint32), np.cumsum(values * positions, dtype=np.uint32)))
+    a = s[block_size:] - s[:-block_size]
+    k = positions[:len(a)]
+    b = (k + np.uint32(block_size)) * a - (t[block_size:] - t[:-block_size])
+    return (a & 0xFFFF).astype(np.int64) | ((b & 0xFFFF).astype(np.int64) << 16)
+
+
+class Delta:
+    """Blocos do arquivo base encontrados no arquivo novo"""
+    def __init__(self, size, block_size, matches):
+        self.size = size
+        self.block_size = block_size
+        self.matches = matches  # [(offset no arquivo novo, índice do bloco base)]
+    
+    @property
+    def literal_bytes(self):
+        return self.size - len(self.matches) * self.block_size
+    
+    def ops(self, filepath):
+        """Gera o stream de instruções, lendo os literais do arquivo novo"""
+        with open(filepath, 'rb') as f:
+            pos = 0
+            i = 0
+            while i < len(self.matches):
+                offset, index = self.matches[i]
+                yield from self._literal(f, pos, offset - pos)
+                
+                # Blocos base consecutivos viram uma única cópia
+                count = 1
+                while (i + count < len(self.matches)
+                       and self.matches[i + count][0] == offset + count * self.block_size
+                       and self.matches[i + count][1] == index + count):
+                    count += 1
+                yield OP_COPY + struct.pack('>II', index, count)
+                pos = offset + count * self.block_size
+                i += count
+            yield from self._literal(f, pos, self.size - pos)
+        yield OP_END
+    
+    @staticmethod
+    def _literal(f, offset, length):
+        f.seek(offset)
+        while length > 0:
+            data = f.read(min(length, MAX_LITERAL))
+            if not data:
+                raise IncompleteUpload("Arquivo mudou durante o envio")
+            yield OP_LITERAL + struct.pack('>I', len(data)) + data
+            length -= len(data)
+
+
+def compute_delta(filepath, sig):
+    """Procura os blocos da assinatura em qualquer offset do arquivo novo"""
+    size = os.path.getsize(filepath)
+    block_size = sig['block_size']
+    if size < block_size or not sig['weak']:
+        return Delta(size, block_size, [])
+    
+    known = np.unique(np.array(sig['weak'], dtype=np.int64))
+    # Filtro rápido (tabela de 1MB, cabe no cache) antes da busca exata
+    bloom = np.zeros(BLOOM_SIZE, dtype=bool)
+    bloom[known & (BLOOM_SIZE - 1)] = True
+    by_weak = {}
+    for index, (weak, strong) in enumerate(zip(sig['weak'], sig['strong'])):
+        by_weak.setdefault(weak, {}).setdefault(strong, index)
+    
+    data = np.memmap(filepath, dtype=np.uint8, mode='r')
+    matches = []
+    pos = 0
+    try:
+        for start in range(0, size - block_size + 1, SEGMENT_SIZE):
+            window = data[start:min(size, start + SEGMENT_SIZE + block_size - 1)]
+            weak = _rolling_weak(window, block_size)
+            candidates = np.flatnonzero(bloom[weak & (BLOOM_SIZE - 1)])
+            found = np.minimum(np.searchsorted(known, weak[candidates]), len(known) - 1)
+            candidates = candidates[known[found] == weak[candidates]]
+            for k in candidates.tolist():
+                offset = start + k
+                if offset < pos:
+                    continue
+                block = bytes(data[offset:offset + block_size])
+                index = by_weak[int(weak[k])].get(strong_hash(block))
+                if index is not None:
+                    matches.append((offset, index))
+                    pos = offset + block_size
+    finally:
+        del data
+    return Delta(size, block_size, matches)
+
+
+def _read_exact(stream, length):
+    chunks = []
+    while length > 0:
+        data = stream.read(length)
+        if not data:
+            raise IncompleteUpload("Stream de diferença truncado")
+        chunks.append(data)
+        length -= len(data)
+    return b''.join(chunks)
+
+
+def _read_range(f, offset, length):
+    f.seek(offset)
+    while length > 0:
+        data = f.read(min(length, MAX_LITERAL))
+        if not data:
+            raise ValueError("Arquivo base mudou durante o envio")
+        yield data
+        length -= len(data)
+
+
+def apply_delta(stream, base_path, filepath, block_size, max_length):
+    """
+    Reconstrói o arquivo novo a partir do arquivo base e do stream de
+    instruções. Retorna (bytes gravados, sha256 hex); em caso de erro o
+    arquivo parcial é removido.
+    """
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    fd = os.open(filepath, flags, 0o644)
+    try:
+        hasher = hashlib.sha256()
+        total = 0
+        base_size = os.path.getsize(base_path)
+        with open(base_path, 'rb') as base:
+            while True:
+                op = _read_exact(stream, 1)
+                if op == OP_END:
+                    break
+                if op == OP_COPY:
+                    index, count = struct.unpack('>II', _read_exact(stream, 8))
+                    offset, length = index * block_size, count * block_size
+                    if offset + length > base_size:
+                        raise ValueError("Cópia fora do arquivo base")
+                    pieces = _read_range(base, offset, length)
+                elif op == OP_LITERAL:
+                    length, = struct.unpack('>I', _read_exact(stream, 4))
+                    # O emissor quebra literais em MAX_LITERAL: acima disso
+                    # o registro é inválido (e não é bufferizado)
+                    if length > MAX_LITERAL:
+                        raise ValueError(f"Literal maior que {MAX_LITERAL} bytes")
+                    pieces = [_read_exact(stream, length)]
+                else:
+                    raise ValueError(f"Instrução inválida: {op!r}")
+                
+                for data in pieces:
+                    total += len(data)
+                    if total > max_length:
+                        raise UploadTooLarge(f"Upload excede o limite de {max_length} bytes")
+                    hasher.update(data)
+                    view = memoryview(data)
+                    while view:
+                        view = view[os.write(fd, view):]
+        
+        os.close(fd)
+        fd = None
+        return total, hasher.hexdigest()
+    
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        try:
+            os.unlink(filepath)
+        except OSError:
+            pass
+        raise
@@ -1,18 +1,62 @@
-from zeroconf import ServiceInfo, Zeroconf, ServiceBrowser, ServiceListener
+from zeroconf import ServiceInfo, ServiceStateChange
+from zeroconf.asyncio import AsyncZeroconf, AsyncServiceBrowser, AsyncServiceInfo
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import socket
 import threading
 import time
+from device_registry import DeviceRegistry
+import metrics
+
+DEVICES = metrics.gauge('aiteleport_devices', 'Dispositivos vivos no registro')
+RESOLVE_SECONDS = metrics.histogram(
+    'aiteleport_mdns_resolve_seconds', 'Tempo de resolução dos serviços anunciados via mDNS')
+PEER_RTT = metrics.gauge('aiteleport_peer_rtt_seconds', 'RTT do /ping no endereço mais rápido', ['peer'])
+PROBE_FAILURES = metrics.counter(
+    'aiteleport_peer_probe_failures_total', 'Rodadas de verificação sem resposta', ['peer'])
 
 class DeviceDiscovery:
-    def __init__(self, device_name, port=5000):
+    """
+    Descoberta via mDNS com AsyncZeroconf, em um event loop próprio.
+    
+    Cada serviço anunciado é resolvido em uma tarefa separada (resoluções
+    lentas não seguram as demais), com todos os endereços IPv4/IPv6.
+    Atualizações do anúncio resolvem o serviço de novo. Com um cliente
+    de transferência, um PeerProber confirma quem responde e escolhe o
+    endereço mais rápido de cada dispositivo.
+    """
+    def __init__(self, device_name, port=5000, directions=None, regions=None, edge_margin=0.3,
+                 groups=None, client=None, probe_interval=2.0, probe_timeout=1.0, max_probe_failures=2,
+                 resolve_timeout=3.0):
         self.device_name = device_name
         self.port = port
-        self.zeroconf = Zeroconf()
         self.service_type = "_aiteleport._tcp.local."
-        self.discovered_devices = {}
-        self.listener = None
+        self.service_name = f"{device_name}.{self.service_type}"
+        self.registry = DeviceRegistry(directions, regions, edge_margin, groups)
+        DEVICES.set_function(lambda: len(self.registry.snapshot()))
+        self.resolve_timeout = resolve_timeout
+        self.known = {}       # service_name -> dispositivo resolvido (vivo ou não)
+        self._resolving = {}  # service_name -> tarefa de resolução em andamento
         self.browser = None
         
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever,
+                                            name='zeroconf-loop', daemon=True)
+        self.loop_thread.start()
+        self.aiozc = self._run(self._create_zeroconf())
+        
+        self.prober = None
+        if client is not None:
+            self.prober = PeerProber(self, client, probe_interval, probe_timeout,
+                                     max_probe_failures)
+    
+    async def _create_zeroconf(self):
+        return AsyncZeroconf()
+    
+    def _run(self, coro, timeout=10):
+        """Executa uma corrotina no loop do Zeroconf e espera o resultado"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop).result(timeout)
+    
     def get_local_ip(self):
         """Obtém IP local"""
         s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
@@ -25,13 +69,16 @@ class DeviceDiscovery:
             s.close()
         return ip
     
-    def register_service(self):
-        """Registra este dispositivo na rede"""
+    def register_service(self, wait=True):
+        """
+        Registra este dispositivo na rede. A verificação do nome na rede
+        leva ~1s; com wait=False ela segue em segundo plano.
+        """
         local_ip = self.get_local_ip()
         
         info = ServiceInfo(
             self.service_type,
-            f"{self.device_name}.{self.service_type}",
+            self.service_name,
             addresses=[socket.inet_aton(local_ip)],
             port=self.port,
             properties={
@@ -40,70 +87,207 @@ class DeviceDiscovery:
             }
         )
         
-        self.zeroconf.register_service(info)
-        print(f"Serviço registrado: {self.device_name} em {local_ip}:{self.port}")
+        async def register():
+            await (await self.aiozc.async_register_service(info))
+        
+        future = asyncio.run_coroutine_threadsafe(register(), self.loop)
+        future.add_done_callback(lambda f: self._registered(f, local_ip))
+        if wait:
+            future.result(10)
         return info
     
+    def _registered(self, future, local_ip):
+        if future.cancelled():
+            return
+        if future.exception() is not None:
+            print(f"Erro ao registrar serviço: {future.exception()}")
+        else:
+            print(f"Serviço registrado: {self.device_name} em {local_ip}:{self.port}")
+    
     def start_discovery(self):
         """Inicia descoberta de dispositivos"""
-        self.listener = DeviceListener(self.discovered_devices)
-        self.browser = ServiceBrowser(self.zeroconf, self.service_type, self.listener)
+        async def start():
+            self.browser = AsyncServiceBrowser(self.aiozc.zeroconf, self.service_type,
+                                               handlers=[self._on_service_state_change])
+        
+        self._run(start())
+        if self.prober:
+            self.prober.start()
         print("Descoberta de dispositivos iniciada")
     
+    def _on_service_state_change(self, zeroconf, service_type, name, state_change):
+        """Callback do browser (no loop): não bloqueia, só agenda tarefas"""
+        if name == self.service_name:
+            return
+        if state_change is ServiceStateChange.Removed:
+            task = self._resolving.pop(name, None)
+            if task:
+                task.cancel()
+            self._forget(name)
+            return
+        
+        # Added ou Updated: (re)resolve, descartando uma resolução antiga
+        task = self._resolving.pop(name, None)
+        if task:
+            task.cancel()
+        self._resolving[name] = self.loop.create_task(self._resolve(service_type, name))
+    
+    async def _resolve(self, service_type, name):
+        try:
+            start = time.perf_counter()
+            info = AsyncServiceInfo(service_type, name)
+            if not await info.async_request(self.aiozc.zeroconf, int(self.resolve_timeout * 1000)):
+                print(f"Não foi possível resolver {name}")
+                return
+            RESOLVE_SECONDS.observe(time.perf_counter() - start)
+            
+            addresses = info.parsed_scoped_addresses()
+            if not addresses or info.port is None:
+                return
+            # IPv4 primeiro até o prober medir qual responde mais rápido
+            addresses.sort(key=lambda address: ':' in address)
+            
+            device_name = info.properties.get(b'device_name', b'Unknown').decode('utf-8')
+            previous = self.known.get(name)
+            device = {
+                'name': device_name,
+                'ip': addresses[0],
+                'addresses': addresses,
+                'port': info.port,
+                'service_name': name,
+                'rtt': None
+            }
+            if previous and previous['ip'] in addresses and previous['port'] == info.port:
+                device['ip'] = previous['ip']
+                device['rtt'] = previous.get('rtt')
+            
+            self.known[name] = device
+            self.registry.add(name, device)
+            if previous is None:
+                print(f"Dispositivo descoberto: {device_name} ({', '.join(addresses)}:{info.port})")
+            elif previous['addresses'] != addresses or previous['port'] != info.port:
+                print(f"Dispositivo atualizado: {device_name} ({', '.join(addresses)}:{info.port})")
+            if self.prober:
+                self.prober.wake()
+        finally:
+            if self._resolving.get(name) is asyncio.current_task():
+                del self._resolving[name]
+    
+    def _forget(self, name):
+        self.known.pop(name, None)
+        device = self.registry.remove(name)
+        if device is not None:
+            print(f"Dispositivo removido: {device['name']}")
+    
     def get_devices(self):
-        """Retorna lista de dispositivos descobertos"""
-        return list(self.discovered_devices.values())
+        """Retorna os dispositivos descobertos (snapshot imutável, sem cópia)"""
+        return self.registry.snapshot()
     
-    def find_device_by_position(self, x, y, screen_width, screen_height, margin=200):
+    def find_device_by_position(self, x, y, screen_width, screen_height):
         """
-        Encontra dispositivo baseado na posição da mão na tela.
-        Se a mão está na borda direita, procura dispositivo à direita.
+        Encontra dispositivo baseado na posição da mão na tela: a direção
+        a partir do centro (ou a região configurada) aponta o dispositivo.
         """
-        devices = self.get_devices()
-        
-        if not devices:
-            return None
-        
-        # Por simplicidade, retorna o primeiro dispositivo disponível
-        # Em produção, você implementaria lógica espacial mais sofisticada
-        if len(devices) == 1:
-            return devices[0]
-        
-        # Se mão na borda direita da tela, pega primeiro dispositivo
-        if x > screen_width - margin:
-            return devices[0]
-        
-        return None
+        return self.registry.find(x, y, screen_width, screen_height)
     
     def close(self):
         """Encerra discovery"""
-        if self.browser:
-            self.browser.cancel()
-        self.zeroconf.close()
+        if self.prober:
+            self.prober.stop()
+        
+        async def shutdown():
+            if self.browser:
+                await self.browser.async_cancel()
+            for task in list(self._resolving.values()):
+                task.cancel()
+            await self.aiozc.async_close()
+        
+        try:
+            self._run(shutdown())
+        finally:
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.loop_thread.join(timeout=2)
 
-class DeviceListener(ServiceListener):
-    def __init__(self, devices_dict):
-        self.devices = devices_dict
+class PeerProber:
+    """
+    Verifica periodicamente cada dispositivo conhecido com /ping em todos
+    os seus endereços, em paralelo, registrando o RTT de cada um.
+    
+    - O endereço mais rápido que respondeu vira o 'ip' do dispositivo.
+    - Após `max_failures` rodadas sem resposta o dispositivo sai do
+      registro (segundos, em vez do TTL do mDNS); continua sendo sondado
+      e volta assim que responder.
+    """
+    def __init__(self, discovery, client, interval=2.0, timeout=1.0, max_failures=2, workers=8):
+        self.discovery = discovery
+        self.client = client
+        self.interval = interval
+        self.timeout = timeout
+        self.max_failures = max_failures
+        self.failures = {}  # service_name -> rodadas seguidas sem resposta
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='peer-probe')
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self.thread = None
+    
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='peer-prober', daemon=True)
+        self.thread.start()
+    
+    def wake(self):
+        """Antecipa a próxima rodada (ex.: dispositivo novo ou atualizado)"""
+        self._wake.set()
+    
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self.thread:
+            self.thread.join(timeout=self.timeout + 1)
+        self.pool.shutdown(wait=False, cancel_futures=True)
+    
+    def _ping(self, address, port):
+        start = time.perf_counter()
+        if self.client.ping_device(address, port, timeout=self.timeout):
+            return time.perf_counter() - start
+        return None
+    
+    def probe_once(self):
+        """Uma rodada: todos os endereços de todos os dispositivos em paralelo"""
+        known = list(self.discovery.known.items())
+        futures = {
+            (name, address): self.pool.submit(self._ping, address, device['port'])
+            for name, device in known
+            for address in device['addresses']
+        }
         
-    def add_service(self, zeroconf, service_type, name):
-        info = zeroconf.get_service_info(service_type, name)
-        if info:
-            device_name = info.properties.get(b'device_name', b'Unknown').decode('utf-8')
-            ip = socket.inet_ntoa(info.addresses[0])
-            port = info.port
+        registry = self.discovery.registry
+        for name, device in known:
+            rtts = {address: futures[(name, address)].result()
+                    for address in device['addresses']}
+            alive = {address: rtt for address, rtt in rtts.items() if rtt is not None}
             
-            self.devices[name] = {
-                'name': device_name,
-                'ip': ip,
-                'port': port,
-                'service_name': name
-            }
-            print(f"Dispositivo descoberto: {device_name} ({ip}:{port})")
-    
-    def remove_service(self, zeroconf, service_type, name):
-        if name in self.devices:
-            device = self.devices.pop(name)
-            print(f"Dispositivo removido: {device['name']}")
+            if alive:
+                self.failures.pop(name, None)
+                best = min(alive, key=alive.get)
+                fields = {'ip': best, 'rtt': alive[best], 'rtts': rtts}
+                device.update(fields)
+                PEER_RTT.labels(device['name']).set(alive[best])
+                if not registry.update(name, **fields) and name in self.discovery.known:
+                    registry.add(name, device)
+                    print(f"Dispositivo voltou a responder: {device['name']}")
+                continue
+            
+            self.failures[name] = self.failures.get(name, 0) + 1
+            PROBE_FAILURES.labels(device['name']).inc()
+            if self.failures[name] >= self.max_failures and registry.remove(name) is not None:
+                print(f"Dispositivo não responde: {device['name']}")
     
-    def update_service(self, zeroconf, service_type, name):
-        pass
\ No newline at end of file
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.probe_once()
+            except RuntimeError:
+                # Pool encerrado durante o stop()
+                break
+            self._wake.wait(self.interval)
+            self._wake.clear()
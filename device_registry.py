@@ -0,0 +1,158 @@
+import threading
+
+import numpy as np
+
+DIRECTIONS = {'right': 0.0, 'up': 90.0, 'left': 180.0, 'down': 270.0}
+
+# Direções atribuídas, em ordem, aos dispositivos sem direção configurada;
+# com mais dispositivos que isso, eles são distribuídos igualmente no círculo
+AUTO_DIRECTIONS = (0.0, 180.0, 90.0, 270.0, 45.0, 135.0, 225.0, 315.0)
+
+GRID_SIZE = 64  # resolução da tabela posição -> dispositivo
+
+
+def parse_direction(value):
+    """'right'/'left'/'up'/'down' ou ângulo em graus (0 = direita, anti-horário)"""
+    if isinstance(value, str):
+        return DIRECTIONS[value.lower()]
+    return float(value) % 360.0
+
+
+class DeviceRegistry:
+    """
+    Dispositivos descobertos, com leitura sem lock e sem alocação.
+    
+    Escritas (thread do Zeroconf) acontecem sob lock e publicam um novo
+    estado imutável (versão, tupla de dispositivos, tabela espacial) com
+    uma única troca de referência; leitores (loop de renderização) só
+    leem essa referência.
+    
+    A tabela espacial divide a tela em GRID_SIZE x GRID_SIZE células já
+    associadas ao alvo: regiões configuradas têm prioridade, depois a
+    direção (ângulo a partir do centro) mais próxima, valendo só na faixa
+    de borda `edge_margin`. Achar o alvo da mão é uma indexação.
+    
+    Grupos (`groups`: nome -> lista de nomes de dispositivos, ou '*' para
+    todos) também são alvos, posicionados pela direção/região configurada
+    com o nome do grupo; o alvo traz os dispositivos vivos em `members`.
+    """
+    def __init__(self, directions=None, regions=None, edge_margin=0.3, groups=None):
+        self.directions = {name: parse_direction(value)
+                           for name, value in (directions or {}).items()}
+        self.regions = dict(regions or {})  # nome -> [x0, y0, x1, y1] normalizados
+        self.groups = {name: members if members == '*' else frozenset(members)
+                       for name, members in (groups or {}).items()}
+        self.edge_margin = edge_margin
+        self.lock = threading.Lock()
+        self._devices = {}  # service_name -> dict do dispositivo
+        self._state = (0, (), None, ())  # versão, dispositivos, tabela, alvos
+        
+        # Geometria das células (fixa): centros normalizados, ângulo e faixa de borda
+        centers = (np.arange(GRID_SIZE) + 0.5) / GRID_SIZE
+        cx, cy = np.meshgrid(centers, centers)
+        self._cells = (cx, cy)
+        self._angles = np.degrees(np.arctan2(-(cy - 0.5), cx - 0.5)) % 360.0
+        self._edge = ((cx < edge_margin) | (cx > 1 - edge_margin) |
+                      (cy < edge_margin) | (cy > 1 - edge_margin))
+    
+    @property
+    def version(self):
+        return self._state[0]
+    
+    def snapshot(self):
+        """Tupla imutável dos dispositivos atuais (não copia)"""
+        return self._state[1]
+    
+    def add(self, key, device):
+        with self.lock:
+            self._devices[key] = dict(device)
+            self._publish()
+    
+    def update(self, key, **fields):
+        """Copy-on-write: o dict antigo continua válido para quem já o leu"""
+        with self.lock:
+            if key not in self._devices:
+                return False
+            self._devices[key] = {**self._devices[key], **fields}
+            self._publish()
+            return True
+    
+    def remove(self, key):
+        with self.lock:
+            device = self._devices.pop(key, None)
+            if device is not None:
+                self._publish()
+            return device
+    
+    def get(self, key):
+        with self.lock:
+            return self._devices.get(key)
+    
+    def _publish(self):
+        """Recalcula direções e a tabela espacial; chamado com o lock"""
+        devices = sorted(self._devices.values(), key=lambda d: d['name'])
+        unset = sum(1 for d in devices if d['name'] not in self.directions)
+        # Direções configuradas (inclusive de grupos) não são reatribuídas
+        free = [a for a in AUTO_DIRECTIONS if a not in self.directions.values()]
+        if unset <= len(free):
+            auto = iter(free)
+        else:
+            auto = (i * 360.0 / unset for i in range(unset))
+        published = []
+        for device in devices:
+            direction = self.directions.get(device['name'])
+            if direction is None:
+                direction = next(auto)
+            published.append({**device, 'direction': direction,
+                              'region': self.regions.get(device['name'])})
+        published = tuple(published)
+        
+        # Grupos com posição configurada e ao menos um membro vivo
+        targets = list(published)
+        for name, members in self.groups.items():
+            if name not in self.directions and name not in self.regions:
+                continue
+            live = tuple(d for d in published if members == '*' or d['name'] in members)
+            if live:
+                targets.append({'name': name, 'service_name': f"grupo:{name}", 'members': live,
+                                'direction': self.directions.get(name),
+                                'region': self.regions.get(name)})
+        targets = tuple(targets)
+        self._state = (self._state[0] + 1, published, self._build_grid(targets), targets)
+    
+    def _build_grid(self, targets):
+        grid = np.full((GRID_SIZE, GRID_SIZE), -1, dtype=np.int16)
+        if not targets:
+            return grid
+        
+        # Ângulo: alvo com a menor distância angular, só na borda
+        # (grupos só com região não entram)
+        angled = np.array([i for i, t in enumerate(targets) if t['direction'] is not None])
+        if len(angled):
+            directions = np.array([targets[i]['direction'] for i in angled])
+            diff = np.abs(self._angles[..., None] - directions)
+            diff = np.minimum(diff, 360.0 - diff)
+            grid[self._edge] = angled[np.argmin(diff, axis=-1)][self._edge]
+        
+        # Regiões configuradas sobrescrevem a direção
+        cx, cy = self._cells
+        for index, target in enumerate(targets):
+            if target['region']:
+                x0, y0, x1, y1 = target['region']
+                grid[(cx >= x0) & (cx < x1) & (cy >= y0) & (cy < y1)] = index
+        return grid
+    
+    def find(self, x, y, screen_width, screen_height):
+        """Dispositivo (ou grupo) alvo para a mão em (x, y) pixels, em O(1)"""
+        _, _, grid, targets = self._state
+        if not targets:
+            return None
+        # Um único dispositivo sem direção/região configurada: vale qualquer posição
+        if (len(targets) == 1 and targets[0]['name'] not in self.directions
+                and not targets[0]['region']):
+            return targets[0]
+        
+        col = min(max(int(x / screen_width * GRID_SIZE), 0), GRID_SIZE - 1)
+        row = min(max(int(y / screen_height * GRID_SIZE), 0), GRID_SIZE - 1)
+        index = grid[row, col]
+        return targets[index] if index >= 0 else None
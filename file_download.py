@@ -0,0 +1,172 @@
+import mimetypes
+import mmap
+import os
+import uuid
+
+from flask import Response
+
+SLICE_SIZE = 256 * 1024  # fatia do mmap entregue por iteração
+
+
+def parse_range(header, size):
+    """
+    Interpreta um cabeçalho Range ("bytes=0-99,200-,-500").
+    Retorna lista de (início, fim) inclusivos, [] se nenhum intervalo é
+    satisfazível (416), ou None se o cabeçalho deve ser ignorado.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    
+    ranges = []
+    for part in header[len('bytes='):].split(','):
+        part = part.strip()
+        if '-' not in part:
+            return None
+        first, last = part.split('-', 1)
+        try:
+            if first == '':
+                # Sufixo: últimos N bytes
+                length = int(last)
+                if length <= 0 or size == 0:
+                    continue
+                start, end = max(0, size - length), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if last and start > end:
+                    return None
+                if start >= size:
+                    continue
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        ranges.append((start, end))
+    return ranges
+
+
+class FileRange:
+    """
+    Corpo de resposta com um intervalo do arquivo.
+    
+    Servidores com sendfile usam fileno()/offset/length diretamente
+    (zero cópia); nos demais o intervalo é entregue em fatias de um
+    mmap, lidas direto do page cache sem buffers de leitura extras.
+    """
+    def __init__(self, path, offset, length):
+        self.file = open(path, 'rb')
+        self.offset = offset
+        self.length = length
+        self._mmap = None
+    
+    def fileno(self):
+        return self.file.fileno()
+    
+    def slices(self, offset, length):
+        if length <= 0:
+            return
+        if self._mmap is None:
+            self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        end = offset + length
+        for start in range(offset, end, SLICE_SIZE):
+            yield self._mmap[start:min(start + SLICE_SIZE, end)]
+    
+    def __iter__(self):
+        return self.slices(self.offset, self.length)
+    
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self.file.close()
+
+
+class MultiRangeBody(FileRange):
+    """Corpo multipart/byteranges para pedidos com vários intervalos"""
+    def __init__(self, path, ranges, size, content_type, boundary):
+        super().__init__(path, 0, 0)
+        self.ranges = ranges
+        self.size = size
+        self.content_type = content_type
+        self.boundary = boundary
+        self.length = sum(len(h) + (end - start + 1) for h, (start, end)
+                          in zip(self._headers(), ranges)) + len(self._trailer())
+    
+    def fileno(self):
+        # Não é um intervalo contíguo: sem sendfile direto
+        raise OSError("multipart/byteranges não suporta sendfile")
+    
+    def _headers(self):
+        for i, (start, end) in enumerate(self.ranges):
+            # Cada parte após a primeira começa com CRLF antes do delimitador
+            prefix = '' if i == 0 else '\r\n'
+            yield (f"{prefix}--{self.boundary}\r\n"
+                   f"Content-Type: {self.content_type}\r\n"
+                   f"Content-Range: bytes {start}-{end}/{self.size}\r\n\r\n").encode('ascii')
+    
+    def _trailer(self):
+        return f"\r\n--{self.boundary}--\r\n".encode('ascii')
+    
+    def __iter__(self):
+        for header, (start, end) in zip(self._headers(), self.ranges):
+            yield header
+            yield from self.slices(start, end - start + 1)
+        yield self._trailer()
+
+
+def _file_response(environ, body, status, headers):
+    """Usa o wsgi.file_wrapper do servidor quando ele existe (sendfile)"""
+    file_wrapper = environ.get('wsgi.file_wrapper')
+    if file_wrapper is not None and type(body) is FileRange:
+        payload = file_wrapper(body)
+    else:
+        payload = body
+    response = Response(payload, status=status, headers=headers, direct_passthrough=True)
+    response.call_on_close(body.close)
+    return response
+
+
+def serve_file(request, filepath, etag=None):
+    """
+    Resposta de download com suporte a Range/multi-range, ETag e
+    If-None-Match / If-Range.
+    """
+    size = os.path.getsize(filepath)
+    content_type = mimetypes.guess_type(str(filepath))[0] or 'application/octet-stream'
+    
+    headers = {'Accept-Ranges': 'bytes'}
+    if etag:
+        headers['ETag'] = f'"{etag}"'
+        if_none_match = request.headers.get('If-None-Match', '')
+        if f'"{etag}"' in if_none_match or if_none_match.strip() == '*':
+            return Response(status=304, headers=headers)
+    
+    ranges = parse_range(request.headers.get('Range'), size)
+    
+    # If-Range: só honra o Range se a versão do arquivo não mudou
+    if_range = request.headers.get('If-Range')
+    if ranges is not None and if_range and if_range.strip() != f'"{etag}"':
+        ranges = None
+    
+    if ranges is None:
+        headers['Content-Type'] = content_type
+        headers['Content-Length'] = str(size)
+        headers['Content-Disposition'] = f'attachment; filename="{filepath.name}"'
+        return _file_response(request.environ, FileRange(filepath, 0, size), 200, headers)
+    
+    if not ranges:
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+    
+    if len(ranges) == 1:
+        start, end = ranges[0]
+        headers['Content-Type'] = content_type
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+        headers['Content-Length'] = str(end - start + 1)
+        body = FileRange(filepath, start, end - start + 1)
+        return _file_response(request.environ, body, 206, headers)
+    
+    boundary = uuid.uuid4().hex
+    body = MultiRangeBody(filepath, ranges, size, content_type, boundary)
+    headers['Content-Type'] = f'multipart/byteranges; boundary={boundary}'
+    headers['Content-Length'] = str(body.length)
+    return _file_response(request.environ, body, 206, headers)
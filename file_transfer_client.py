@@ -1,46 +1,668 @@
 import requests
+from requests.adapters import HTTPAdapter
+import hashlib
+import json
+import os
+from urllib.parse import quote
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from chunked_upload import DEFAULT_CHUNK_SIZE
+from transfer_codec import CODECS, COMPRESSED_EXTENSIONS, choose_codec, encode_chunks, encode_file
+from content_index import hash_file
+from delta_sync import compute_delta
+from bundle import bundle_stream, check_limits, describe, walk_paths
+from relay import RELAY_HEADER, encode_chain, failed_results, plan_chains
+from stream_receiver import UploadTooLarge
+import metrics
+
+TRANSFERS = metrics.counter(
+    'aiteleport_transfers_total', 'Envios por dispositivo, método e resultado', ['peer', 'method', 'result'])
+BYTES_SENT = metrics.counter(
+    'aiteleport_bytes_sent_total', 'Bytes de conteúdo enviados (sem os evitados por dedup/diferença)', ['peer'])
+TRANSFER_SECONDS = metrics.histogram(
+    'aiteleport_transfer_seconds', 'Duração dos envios bem-sucedidos', ['peer', 'method'])
+THROUGHPUT = metrics.gauge(
+    'aiteleport_transfer_throughput_bytes_per_second', 'Vazão do último envio com dados', ['peer'])
+
+
+def _record_transfer(ip, port, method, success, sent, seconds):
+    peer = f"{ip}:{port}"
+    TRANSFERS.labels(peer, method, 'ok' if success else 'error').inc()
+    if not success:
+        return
+    TRANSFER_SECONDS.labels(peer, method).observe(seconds)
+    if sent:
+        BYTES_SENT.labels(peer).inc(sent)
+        if seconds > 0:
+            THROUGHPUT.labels(peer).set(sent / seconds)
+
+
+def device_url(ip, port):
+    """URL base do dispositivo; endereços IPv6 vão entre colchetes (zona como %25)"""
+    if ':' in ip:
+        return f"http://[{ip.replace('%', '%25')}]:{port}"
+    return f"http://{ip}:{port}"
+
 
 class FileTransferClient:
-    def __init__(self, timeout=30):
+    def __init__(self, timeout=30, streams=4, chunk_size=DEFAULT_CHUNK_SIZE,
+                 chunked_threshold=16 * 1024 * 1024, max_resume_attempts=3,
+                 pool_size=8, compression=True, dedup_min_size=64 * 1024,
+                 delta_min_size=1024 * 1024, delta_max_literal=0.5, scheduler=None,
+                 peer_info_ttl=60):
         self.timeout = timeout
+        self.streams = streams                      # conexões paralelas por arquivo
+        self.chunk_size = chunk_size
+        self.chunked_threshold = chunked_threshold  # acima disso, envio em partes
+        self.max_resume_attempts = max_resume_attempts
+        self.pool_size = max(pool_size, streams)    # conexões mantidas por dispositivo
+        self._sessions = {}                         # (ip, porta) -> requests.Session
+        self._sessions_lock = threading.Lock()
+        self.compression = compression              # compressão adaptativa por envio
+        self._peers = {}                            # (ip, porta) -> (instante, resposta do /ping)
+        self.peer_info_ttl = peer_info_ttl          # segundos até consultar o /ping de novo
+        self.dedup_min_size = dedup_min_size        # abaixo disso, enviar é tão barato quanto perguntar
+        self.delta_min_size = delta_min_size
+        self.delta_max_literal = delta_max_literal  # fração máxima de bytes novos para enviar por diferença
+        self._hashes = {}                           # (caminho, tamanho, mtime_ns) -> sha256
+        self.scheduler = scheduler                  # TransferScheduler: limites de banda e prioridade
+    
+    def _session(self, target_ip, target_port):
+        """
+        Sessão keep-alive do dispositivo: as conexões TCP ficam abertas no
+        pool e são reaproveitadas por envios, pings e downloads seguintes.
+        """
+        key = (target_ip, target_port)
+        session = self._sessions.get(key)
+        if session is None:
+            with self._sessions_lock:
+                session = self._sessions.get(key)
+                if session is None:
+                    session = requests.Session()
+                    # Dispositivos estão na rede local: sem proxy/netrc do
+                    # ambiente (consultá-los custa ~1ms por requisição)
+                    session.trust_env = False
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount('http://', adapter)
+                    self._sessions[key] = session
+        return session
+    
+    def _body(self, data, target_ip, size=None):
+        """Corpo da requisição liberado pelo agendador de banda, se houver limites"""
+        if self.scheduler is None:
+            return data
+        return self.scheduler.throttle(data, target_ip, size)
+    
+    def close(self, target_ip=None, target_port=None):
+        """Fecha as conexões de um dispositivo (ou de todos)"""
+        with self._sessions_lock:
+            if target_ip is None:
+                sessions, self._sessions = list(self._sessions.values()), {}
+            else:
+                session = self._sessions.pop((target_ip, target_port), None)
+                sessions = [session] if session else []
+        for session in sessions:
+            session.close()
     
     def send_file(self, filepath, target_ip, target_port=5000):
         """
         Envia arquivo para dispositivo alvo
         Retorna: (success: bool, message: str)
         """
+        start = time.perf_counter()
+        success, message, method, sent = self._send_file(Path(filepath), target_ip, target_port)
+        _record_transfer(target_ip, target_port, method, success, sent, time.perf_counter() - start)
+        return success, message
+    
+    def _send_file(self, filepath, target_ip, target_port):
+        """send_file(); retorna também o método usado e os bytes de conteúdo enviados"""
+        method = 'stream'
         try:
-            filepath = Path(filepath)
-            
             if not filepath.exists():
-                return False, f"Arquivo não encontrado: {filepath}"
+                return False, f"Arquivo não encontrado: {filepath}", method, 0
+            
+            size = filepath.stat().st_size
+            features = self._peer_info(target_ip, target_port).get('features', [])
+            
+            # Conteúdo repetido: o receptor recria o arquivo localmente
+            if 'dedup' in features and size >= self.dedup_min_size:
+                result = self._materialize(filepath, target_ip, target_port)
+                if result is not None:
+                    return (*result, 'dedup', 0)
             
-            url = f"http://{target_ip}:{target_port}/upload"
+            # Versão editada de um arquivo já enviado: só os blocos alterados
+            if 'delta' in features and size >= self.delta_min_size:
+                result = self._send_delta(filepath, target_ip, target_port)
+                if result is not None:
+                    return (*result[:2], 'delta', result[2])
             
-            with open(filepath, 'rb') as f:
-                files = {'file': (filepath.name, f)}
-                response = requests.post(url, files=files, timeout=self.timeout)
+            if size >= self.chunked_threshold:
+                method = 'chunked'
+                result = self.send_file_chunked(filepath, target_ip, target_port)
+                if result is not None:
+                    return (*result, method, size)
+                # Dispositivo sem suporte a envio em partes: requisição única
+                method = 'stream'
+            
+            response = self._send_stream(filepath, target_ip, target_port)
+            
+            if response.status_code in (404, 405):
+                # Dispositivo antigo: multipart/form-data
+                self._forget_peer(target_ip, target_port)
+                method = 'multipart'
+                url = f"{device_url(target_ip, target_port)}/upload"
+                with open(filepath, 'rb') as f:
+                    files = {'file': (filepath.name, f)}
+                    response = self._session(target_ip, target_port).post(
+                        url, files=files, timeout=self.timeout)
             
             if response.status_code == 200:
-                return True, f"Arquivo enviado com sucesso: {filepath.name}"
+                return True, f"Arquivo enviado com sucesso: {filepath.name}", method, size
             else:
-                return False, f"Erro ao enviar: {response.text}"
-                
+                return False, f"Erro ao enviar: {response.text}", method, 0
+        
+        except requests.exceptions.Timeout:
+            return False, "Timeout ao enviar arquivo", method, 0
+        except requests.exceptions.ConnectionError:
+            self._forget_peer(target_ip, target_port)
+            return False, f"Não foi possível conectar a {target_ip}:{target_port}", method, 0
+        except Exception as e:
+            return False, f"Erro ao enviar arquivo: {str(e)}", method, 0
+    
+    def send_bundle(self, paths, target_ip, target_port=5000):
+        """
+        Envia vários arquivos e/ou pastas em uma única requisição (pacote
+        em streaming, percorrido sob demanda). Retorna (success, message).
+        """
+        start = time.perf_counter()
+        success, message, method, sent = self._send_bundle(paths, target_ip, target_port)
+        if method is not None:
+            _record_transfer(target_ip, target_port, method, success, sent,
+                             time.perf_counter() - start)
+        return success, message
+    
+    def _send_bundle(self, paths, target_ip, target_port):
+        """send_bundle(); método None quando cada arquivo foi enviado (e medido) em separado"""
+        try:
+            paths = [Path(path) for path in paths]
+            for path in paths:
+                if not path.exists():
+                    return False, f"Arquivo não encontrado: {path}", 'bundle', 0
+            try:
+                check_limits(paths)
+            except UploadTooLarge as e:
+                return False, str(e), 'bundle', 0
+            
+            features = self._peer_info(target_ip, target_port).get('features', [])
+            if 'bundle' not in features:
+                # Dispositivo antigo: um envio por arquivo
+                if any(path.is_dir() for path in paths):
+                    return False, "O dispositivo não aceita pastas", 'bundle', 0
+                results = [self.send_file(path, target_ip, target_port) for path in paths]
+                failed = [message for success, message in results if not success]
+                if failed:
+                    return False, failed[0], None, 0
+                return True, f"{len(paths)} arquivos enviados com sucesso: {describe(paths)}", None, 0
+            
+            url = f"{device_url(target_ip, target_port)}/upload/bundle"
+            session = self._session(target_ip, target_port)
+            headers = {'Content-Type': 'application/octet-stream'}
+            
+            # Compressão do pacote inteiro, a menos que só haja formatos já comprimidos
+            codec = None
+            if self.compression and not all(
+                    path.is_file() and path.suffix.lower() in COMPRESSED_EXTENSIONS
+                    for path in paths):
+                codec = next((c for c in CODECS if c in self._codecs(target_ip, target_port)), None)
+            if codec:
+                body = self._body(encode_chunks(bundle_stream(walk_paths(paths)), codec), target_ip)
+                response = session.put(url, data=body,
+                                       headers={**headers, 'Content-Encoding': codec},
+                                       timeout=self.timeout)
+                if response.status_code == 415:
+                    self._forget_peer(target_ip, target_port)
+                    codec = None
+            if not codec:
+                response = session.put(url, data=self._body(bundle_stream(walk_paths(paths)), target_ip),
+                                       headers=headers, timeout=self.timeout)
+            
+            if response.status_code == 200:
+                info = response.json()
+                return True, (f"{info['files']} arquivos enviados com sucesso: "
+                              f"{', '.join(info['names'])}"), 'bundle', info['size']
+            return False, f"Erro ao enviar: {response.text}", 'bundle', 0
+        
         except requests.exceptions.Timeout:
-            return False, "Timeout ao enviar arquivo"
+            return False, "Timeout ao enviar arquivos", 'bundle', 0
         except requests.exceptions.ConnectionError:
-            return False, f"Não foi possível conectar a {target_ip}:{target_port}"
+            self._forget_peer(target_ip, target_port)
+            return False, f"Não foi possível conectar a {target_ip}:{target_port}", 'bundle', 0
         except Exception as e:
-            return False, f"Erro ao enviar arquivo: {str(e)}"
+            return False, f"Erro ao enviar arquivos: {str(e)}", 'bundle', 0
+    
+    def send_broadcast(self, filepath, devices, fanout=1):
+        """
+        Envia o mesmo conteúdo para vários dispositivos. Um arquivo vai em
+        até `fanout` cadeias de retransmissão entre os dispositivos que
+        suportam (o uplink carrega uma cópia por cadeia); os demais, os que
+        falharem na cadeia e os pacotes (pastas/vários arquivos) recebem
+        envios diretos em paralelo.
+        
+        Retorna (success, message, resultados): um dict por dispositivo com
+        name, success, message e seconds (até o dispositivo ter o arquivo).
+        """
+        start = time.perf_counter()
+        if isinstance(filepath, list):
+            send_one = self.send_bundle
+            relayed, direct = [], list(devices)
+        else:
+            filepath = Path(filepath)
+            send_one = self.send_file
+            relayed = [d for d in devices
+                       if 'relay' in self._peer_info(d['ip'], d['port']).get('features', [])]
+            direct = [d for d in devices if d not in relayed]
+        
+        def send_direct(device):
+            success, message = send_one(filepath, device['ip'], device['port'])
+            return {'name': device['name'], 'success': success, 'message': message,
+                    'seconds': time.perf_counter() - start}
+        
+        chains = plan_chains(relayed, fanout) if relayed else []
+        results = {}  # id(dispositivo) -> resultado
+        with ThreadPoolExecutor(max_workers=len(chains) + len(direct) or 1) as pool:
+            relays = [(chain, pool.submit(self.send_relay, filepath, chain)) for chain in chains]
+            directs = [(device, pool.submit(send_direct, device)) for device in direct]
+            
+            # Quem falhou na cadeia (ex.: um salto caiu) recebe envio direto
+            for chain, future in relays:
+                for device, result in zip(chain, future.result()):
+                    if result['success']:
+                        results[id(device)] = result
+                    else:
+                        directs.append((device, pool.submit(send_direct, device)))
+            for device, future in directs:
+                results[id(device)] = future.result()
+        
+        ordered = [results[id(device)] for device in devices]
+        delivered = sum(1 for result in ordered if result['success'])
+        name = describe(filepath) if isinstance(filepath, list) else filepath.name
+        message = f"Enviado para {delivered}/{len(devices)} dispositivos: {name}"
+        return delivered == len(devices), message, ordered
+    
+    def send_relay(self, filepath, chain):
+        """
+        Envia o arquivo ao primeiro dispositivo de `chain`, que o repassa
+        aos seguintes enquanto recebe. Retorna os resultados de cada um.
+        """
+        filepath = Path(filepath)
+        if not filepath.exists():
+            return failed_results(chain, f"Arquivo não encontrado: {filepath}")
+        size = filepath.stat().st_size
+        
+        # Compressão só com um codec que toda a cadeia aceita
+        codec = None
+        if self.compression:
+            accepted = set(CODECS)
+            for device in chain:
+                accepted &= set(self._codecs(device['ip'], device['port']))
+            codec = choose_codec(filepath, accepted)
+        
+        if codec:
+            return self._put_relay(encode_file(filepath, codec), filepath.name, size, codec, chain)
+        with open(filepath, 'rb') as f:
+            return self._put_relay(f, filepath.name, size, 'identity', chain)
+    
+    def forward_relay(self, chunks, filename, size, encoding, chain):
+        """Repasse de um dispositivo da cadeia: corpo já codificado, vindo do anterior"""
+        return self._put_relay(chunks, filename, size, encoding, chain)
+    
+    def _put_relay(self, data, filename, size, encoding, chain):
+        head, rest = chain[0], chain[1:]
+        start = time.perf_counter()
+        headers = {
+            'X-Filename': quote(filename),
+            'X-File-Size': str(size),
+            RELAY_HEADER: encode_chain(rest),
+            'Content-Type': 'application/octet-stream'
+        }
+        if encoding != 'identity':
+            headers['Content-Encoding'] = encoding
+        
+        try:
+            response = self._session(head['ip'], head['port']).put(
+                f"{device_url(head['ip'], head['port'])}/upload/relay",
+                data=self._body(data, head['ip'], size), headers=headers, timeout=self.timeout)
+            results = response.json().get('results') or []
+        except requests.exceptions.Timeout:
+            results = []
+            error = "Timeout ao enviar arquivo"
+        except requests.exceptions.ConnectionError:
+            self._forget_peer(head['ip'], head['port'])
+            results = []
+            error = f"Não foi possível conectar a {head['ip']}:{head['port']}"
+        except ValueError:
+            results = []
+            error = f"Erro ao enviar: {response.text}"
+        else:
+            error = "Sem resposta do dispositivo anterior da cadeia"
+        
+        _record_transfer(head['ip'], head['port'], 'relay', bool(results) and results[0]['success'],
+                         size, time.perf_counter() - start)
+        results = results[:len(chain)]
+        results += failed_results(chain[len(results):], error)
+        return [{**result, 'name': device['name']} for device, result in zip(chain, results)]
+    
+    def _peer_info(self, target_ip, target_port):
+        """
+        Recursos e codecs anunciados pelo dispositivo no /ping, em cache
+        por `peer_info_ttl` segundos (o dispositivo pode ser atualizado ou
+        trocar de configuração) ou até uma falha de conexão ou recusa.
+        """
+        key = (target_ip, target_port)
+        cached = self._peers.get(key)
+        if cached is None or time.monotonic() - cached[0] > self.peer_info_ttl:
+            try:
+                response = self._session(target_ip, target_port).get(
+                    f"{device_url(target_ip, target_port)}/ping", timeout=5)
+                cached = self._peers[key] = (time.monotonic(), response.json())
+            except (requests.exceptions.RequestException, ValueError):
+                self._forget_peer(target_ip, target_port)
+                return {}
+        return cached[1]
+    
+    def _forget_peer(self, target_ip, target_port):
+        """Descarta o /ping em cache: a próxima transferência consulta de novo"""
+        self._peers.pop((target_ip, target_port), None)
+    
+    def _codecs(self, target_ip, target_port):
+        return self._peer_info(target_ip, target_port).get('codecs', [])
+    
+    def _file_hash(self, filepath):
+        """SHA-256 do arquivo, em cache enquanto tamanho e mtime não mudarem"""
+        st = filepath.stat()
+        key = (str(filepath), st.st_size, st.st_mtime_ns)
+        if key not in self._hashes:
+            self._hashes[key] = hash_file(filepath)
+        return self._hashes[key]
+    
+    def _materialize(self, filepath, target_ip, target_port):
+        """
+        Se o receptor já tem o conteúdo, pede que crie o arquivo a partir
+        dele (/materialize); nenhum dado é transferido. Retorna
+        (success, message) ou None para seguir com o envio normal.
+        """
+        response = self._session(target_ip, target_port).post(
+            f"{device_url(target_ip, target_port)}/materialize",
+            json={'sha256': self._file_hash(filepath), 'filename': filepath.name},
+            timeout=self.timeout)
+        if response.status_code == 200:
+            return True, f"Arquivo enviado com sucesso (já existia no destino): {filepath.name}"
+        return None
+    
+    def _send_delta(self, filepath, target_ip, target_port):
+        """
+        Envia só os blocos alterados em relação ao arquivo de mesmo nome
+        que o receptor já tem. Retorna (success, message, bytes novos) ou
+        None quando não há base ou a diferença é grande demais para compensar.
+        """
+        session = self._session(target_ip, target_port)
+        base_url = device_url(target_ip, target_port)
+        response = session.get(f"{base_url}/signature/{quote(filepath.name)}",
+                               timeout=self.timeout)
+        if response.status_code != 200:
+            return None
+        sig = response.json()
+        
+        delta = compute_delta(filepath, sig)
+        if delta.literal_bytes > delta.size * self.delta_max_literal:
+            return None
+        
+        headers = {
+            'X-Filename': quote(filepath.name),
+            'X-Base': quote(sig['base']),
+            'X-Base-Sha256': sig['sha256'],
+            'X-Block-Size': str(sig['block_size']),
+            'X-File-Sha256': self._file_hash(filepath),
+            'Content-Type': 'application/octet-stream'
+        }
+        response = session.put(f"{base_url}/upload/delta",
+                               data=self._body(delta.ops(filepath), target_ip, delta.literal_bytes),
+                               headers=headers, timeout=self.timeout)
+        if response.status_code == 200:
+            return True, (f"Arquivo enviado com sucesso ({delta.literal_bytes} bytes novos): "
+                          f"{filepath.name}"), delta.literal_bytes
+        return None
+    
+    def _send_stream(self, filepath, target_ip, target_port, path='/upload/stream'):
+        """
+        Envia o arquivo como corpo cru, lido do disco em streaming.
+        Se a amostra do arquivo comprime bem e o receptor aceita, o corpo
+        vai comprimido (Content-Encoding) em blocos.
+        """
+        url = f"{device_url(target_ip, target_port)}{path}"
+        headers = {
+            'X-Filename': quote(filepath.name),
+            'Content-Type': 'application/octet-stream'
+        }
+        session = self._session(target_ip, target_port)
+        size = filepath.stat().st_size
+        
+        codec = None
+        if self.compression:
+            codec = choose_codec(filepath, self._codecs(target_ip, target_port))
+        if codec:
+            headers['Content-Encoding'] = codec
+            headers['X-File-Size'] = str(size)
+            response = session.put(url, data=self._body(encode_file(filepath, codec), target_ip, size),
+                                   headers=headers, timeout=self.timeout)
+            if response.status_code != 415:
+                return response
+            # Receptor recusou o codec: envia sem compressão
+            self._forget_peer(target_ip, target_port)
+            del headers['Content-Encoding'], headers['X-File-Size']
+        
+        with open(filepath, 'rb') as f:
+            return session.put(url, data=self._body(f, target_ip, size), headers=headers,
+                               timeout=self.timeout)
+    
+    def precompute_hash(self, filepath):
+        """Calcula (e guarda em cache) o SHA-256 usado pelo envio sem retransmissão"""
+        return self._file_hash(Path(filepath))
+    
+    def stage_file(self, filepath, target_ip, target_port, token):
+        """
+        Envio especulativo: transfere o conteúdo para a área pendente do
+        receptor, identificado por `token`, sem publicá-lo. Retorna True
+        se o receptor guardou o arquivo.
+        """
+        try:
+            filepath = Path(filepath)
+            features = self._peer_info(target_ip, target_port).get('features', [])
+            if 'pending' not in features:
+                return False
+            start = time.perf_counter()
+            response = self._send_stream(filepath, target_ip, target_port,
+                                         path=f"/pending/{token}")
+            success = response.status_code == 200
+            _record_transfer(target_ip, target_port, 'staged', success,
+                             filepath.stat().st_size, time.perf_counter() - start)
+            return success
+        except (OSError, requests.exceptions.RequestException):
+            return False
+    
+    def commit_staged(self, token, filename, target_ip, target_port):
+        """
+        Publica um envio especulativo no receptor (só uma requisição
+        pequena). Retorna (success, message) ou None se o receptor não tem
+        mais o conteúdo (expirou), para enviar pelo caminho normal.
+        """
+        try:
+            response = self._session(target_ip, target_port).post(
+                f"{device_url(target_ip, target_port)}/pending/{token}/commit",
+                timeout=self.timeout)
+        except requests.exceptions.RequestException:
+            return None
+        if response.status_code == 200:
+            _record_transfer(target_ip, target_port, 'commit', True, 0,
+                             response.elapsed.total_seconds())
+            return True, f"Arquivo enviado com sucesso (antecipado): {filename}"
+        return None
+    
+    def discard_staged(self, token, target_ip, target_port):
+        """Descarta um envio especulativo não usado (falhas são ignoradas: ele expira)"""
+        try:
+            self._session(target_ip, target_port).delete(
+                f"{device_url(target_ip, target_port)}/pending/{token}", timeout=5)
+        except requests.exceptions.RequestException:
+            pass
+    
+    def hash_chunks(self, filepath, chunk_size):
+        """Calcula o SHA-256 de cada chunk e do arquivo inteiro em uma passada"""
+        chunk_hashes = []
+        file_hash = hashlib.sha256()
+        with open(filepath, 'rb') as f:
+            while True:
+                data = f.read(chunk_size)
+                if not data:
+                    break
+                chunk_hashes.append(hashlib.sha256(data).hexdigest())
+                file_hash.update(data)
+        return chunk_hashes, file_hash.hexdigest()
+    
+    def send_file_chunked(self, filepath, target_ip, target_port=5000):
+        """
+        Envia arquivo em chunks por várias conexões paralelas, retomando
+        os chunks que faltarem. Retorna (success, message), ou None se o
+        dispositivo não suporta o protocolo.
+        """
+        filepath = Path(filepath)
+        base_url = f"{device_url(target_ip, target_port)}/upload/chunked"
+        size = filepath.stat().st_size
+        chunk_hashes, file_hash = self.hash_chunks(filepath, self.chunk_size)
+        session = self._session(target_ip, target_port)
+        
+        response = session.post(base_url, json={
+            'filename': filepath.name,
+            'size': size,
+            'chunk_size': self.chunk_size,
+            'chunk_hashes': chunk_hashes,
+            'sha256': file_hash
+        }, timeout=self.timeout)
+        
+        if response.status_code in (404, 405):
+            self._forget_peer(target_ip, target_port)
+            return None
+        if response.status_code != 200:
+            return False, f"Erro ao enviar: {response.text}"
+        
+        upload_id = response.json()['upload_id']
+        missing = response.json()['missing']
+        
+        def put_chunk(index):
+            try:
+                with open(filepath, 'rb') as f:
+                    f.seek(index * self.chunk_size)
+                    data = f.read(self.chunk_size)
+                r = session.put(f"{base_url}/{upload_id}/{index}",
+                                data=self._body(data, target_ip, size), timeout=self.timeout)
+                return r.status_code == 200
+            except requests.exceptions.RequestException:
+                return False
+        
+        for _ in range(self.max_resume_attempts + 1):
+            if not missing:
+                break
+            with ThreadPoolExecutor(max_workers=self.streams) as pool:
+                list(pool.map(put_chunk, missing))
+            
+            # Pergunta ao receptor o que ainda falta (retomada)
+            status = session.get(f"{base_url}/{upload_id}", timeout=self.timeout)
+            if status.status_code != 200:
+                return False, f"Erro ao consultar envio: {status.text}"
+            missing = status.json()['missing']
+        
+        if missing:
+            return False, f"Envio incompleto: faltam {len(missing)} partes de {filepath.name}"
+        
+        response = session.post(f"{base_url}/{upload_id}/complete",
+                                timeout=self.timeout)
+        if response.status_code == 200:
+            return True, f"Arquivo enviado com sucesso: {filepath.name}"
+        return False, f"Erro ao enviar: {response.text}"
+    
+    def download_file(self, filename, target_ip, target_port, dest_path):
+        """
+        Baixa um arquivo do dispositivo em pedaços paralelos (HTTP Range).
+        Pedaços já baixados ficam registrados ao lado do arquivo parcial,
+        então uma nova chamada retoma de onde parou enquanto o ETag for o
+        mesmo. Retorna (success, message).
+        """
+        url = f"{device_url(target_ip, target_port)}/download/{quote(filename)}"
+        dest_path = Path(dest_path)
+        part_path = dest_path.with_name(dest_path.name + '.part')
+        state_path = dest_path.with_name(dest_path.name + '.part.json')
+        session = self._session(target_ip, target_port)
+        
+        try:
+            head = session.head(url, timeout=self.timeout)
+            if head.status_code != 200:
+                return False, f"Erro ao baixar: HTTP {head.status_code}"
+            size = int(head.headers['Content-Length'])
+            etag = head.headers.get('ETag', '')
+            
+            done = set()
+            if part_path.exists() and state_path.exists():
+                with open(state_path, 'r') as f:
+                    state = json.load(f)
+                if state.get('etag') == etag and state.get('chunk_size') == self.chunk_size:
+                    done = set(state['done'])
+            if not done:
+                with open(part_path, 'wb') as f:
+                    f.truncate(size)
+            
+            pieces = [i for i in range((size + self.chunk_size - 1) // self.chunk_size)
+                      if i not in done]
+            lock = threading.Lock()
+            
+            def fetch(index):
+                start = index * self.chunk_size
+                end = min(start + self.chunk_size, size) - 1
+                headers = {'Range': f'bytes={start}-{end}', 'If-Range': etag}
+                r = session.get(url, headers=headers, timeout=self.timeout)
+                if r.status_code != 206:
+                    return False
+                with open(part_path, 'r+b') as f:
+                    f.seek(start)
+                    f.write(r.content)
+                with lock:
+                    done.add(index)
+                    with open(state_path, 'w') as f:
+                        json.dump({'etag': etag, 'chunk_size': self.chunk_size,
+                                   'done': sorted(done)}, f)
+                return True
+            
+            with ThreadPoolExecutor(max_workers=self.streams) as pool:
+                results = list(pool.map(fetch, pieces))
+            
+            if not all(results):
+                return False, f"Download incompleto de {filename}; tente novamente para retomar"
+            
+            os.replace(part_path, dest_path)
+            state_path.unlink(missing_ok=True)
+            return True, f"Arquivo baixado: {dest_path.name}"
+        
+        except requests.exceptions.RequestException as e:
+            return False, f"Erro ao baixar {filename}: {e}"
     
-    def ping_device(self, target_ip, target_port=5000):
+    def ping_device(self, target_ip, target_port=5000, timeout=5):
         """
         Verifica se dispositivo está acessível
         """
         try:
-            url = f"http://{target_ip}:{target_port}/ping"
-            response = requests.get(url, timeout=5)
+            url = f"{device_url(target_ip, target_port)}/ping"
+            response = self._session(target_ip, target_port).get(url, timeout=timeout)
             return response.status_code == 200
         except Exception:
-            return False
\ No newline at end of file
+            return False
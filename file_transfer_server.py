@@ -1,25 +1,88 @@
-from flask import Flask, request, jsonify, send_file
-import os
+from flask import Flask, Response, g, request, jsonify
 from pathlib import Path
+import shutil
 import threading
+import time
+import uuid
+import zlib
 from werkzeug.utils import secure_filename
+from urllib.parse import unquote
+from werkzeug.exceptions import RequestEntityTooLarge
+from chunked_upload import ChunkedUploadManager, UploadClosed
+from content_index import ContentIndex, clone_file, hash_file
+from name_allocator import NameAllocator
+from pending_uploads import PendingStore
+from delta_sync import MAX_BLOCK_SIZE, signature, apply_delta
+from bundle import unpack_bundle
+from file_download import serve_file
+from stream_receiver import receive_stream, UploadTooLarge, IncompleteUpload
+from relay import RELAY_HEADER, RelayForwarder, decode_chain
+from server_backends import create_server
+from transfer_codec import CODECS, decoding_stream
+import metrics
+
+REQUESTS = metrics.counter(
+    'aiteleport_http_requests_total', 'Requisições atendidas por rota e status', ['route', 'status'])
+REQUEST_SECONDS = metrics.histogram(
+    'aiteleport_http_request_seconds', 'Duração das requisições por rota', ['route'])
+REQUESTS_ACTIVE = metrics.gauge(
+    'aiteleport_http_requests_active', 'Requisições em andamento')
+CONNECTIONS = metrics.gauge(
+    'aiteleport_http_connections', 'Conexões abertas (ativas e keep-alive ociosas)')
+FILES_RECEIVED = metrics.counter(
+    'aiteleport_files_received_total', 'Arquivos publicados em upload_dir, por rota', ['route'])
+BYTES_RECEIVED = metrics.counter(
+    'aiteleport_bytes_received_total', 'Bytes de conteúdo recebidos, por rota', ['route'])
+PENDING_UPLOADS = metrics.gauge(
+    'aiteleport_pending_uploads', 'Envios especulativos aguardando confirmação')
 
 class FileTransferServer:
-    def __init__(self, port=5000, upload_dir='received_files'):
+    def __init__(self, port=5000, upload_dir='received_files', backend='pooled',
+                 workers=16, read_timeout=30, pending_ttl=120, scheduler=None,
+                 relay_peers=None):
         self.port = port
+        self.backend = backend
+        self.workers = workers
+        self.read_timeout = read_timeout
+        self.scheduler = scheduler  # TransferScheduler: limites de banda e prioridade
         self.upload_dir = Path(upload_dir)
         self.upload_dir.mkdir(exist_ok=True)
         
         self.app = Flask(__name__)
         self.app.config['MAX_CONTENT_LENGTH'] = 500 * 1024 * 1024  # 500MB max
+        self.server = None
         self.server_thread = None
+        self.ready = threading.Event()
+        self.relay_client = None  # cliente do repasse em cadeia (criado sob demanda)
+        # Dispositivos para os quais o repasse é permitido (ex.: get_devices da
+        # descoberta); sem ele, este dispositivo só é o fim de uma cadeia
+        self.relay_peers = relay_peers
+        self._relay_lock = threading.Lock()
+        
+        # Uploads em partes (retomáveis) ficam em staging até completar
+        self.chunked_uploads = ChunkedUploadManager(self.upload_dir / '.partial')
+        self.chunked_uploads.cleanup()
+        
+        # Nomes únicos em O(1); arquivos entram em upload_dir com commit atômico
+        self.names = NameAllocator(self.upload_dir, self.upload_dir / '.partial')
+        
+        # Hash de conteúdo dos arquivos recebidos (ETag dos downloads)
+        self.content_index = ContentIndex(self.upload_dir)
+        
+        # Envios especulativos aguardando confirmação (ou expiração)
+        self.pending = PendingStore(self.upload_dir / '.pending', ttl=pending_ttl)
+        PENDING_UPLOADS.set_function(lambda: len(self.pending.entries))
         
         self._setup_routes()
+        self._setup_metrics()
     
     def _setup_routes(self):
         @self.app.route('/ping', methods=['GET'])
         def ping():
-            return jsonify({'status': 'ok'})
+            return jsonify({'status': 'ok',
+                            'features': ['chunked', 'stream', 'dedup', 'delta', 'pending', 'bundle',
+                                         'relay'],
+                            'codecs': CODECS})
         
         @self.app.route('/upload', methods=['POST'])
         def upload_file():
@@ -33,16 +96,325 @@ class FileTransferServer:
                     return jsonify({'error': 'No selected file'}), 400
                 
                 filename = secure_filename(file.filename)
-                filepath = self.upload_dir / filename
+                temp_path = self.names.temp_path()
+                
+                file.save(temp_path)
+                filepath = self.names.commit(temp_path, filename)
+                self.content_index.get_hash(filepath)
+                _received(filepath.stat().st_size)
+                
+                print(f"Arquivo recebido: {filepath}")
+                
+                return jsonify({
+                    'status': 'success',
+                    'filename': filepath.name,
+                    'path': str(filepath)
+                }), 200
+            
+            except Exception as e:
+                print(f"Erro ao receber arquivo: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/upload/stream', methods=['PUT'])
+        def upload_stream():
+            """
+            Upload com corpo cru (sem multipart): os bytes vão direto do
+            socket para o arquivo final. Nome no cabeçalho X-Filename.
+            Com Content-Encoding o corpo é descomprimido em streaming e
+            X-File-Size traz o tamanho original.
+            """
+            filename = secure_filename(unquote(request.headers.get('X-Filename', '')))
+            if not filename:
+                return jsonify({'error': 'No selected file'}), 400
+            
+            body = self._request_body()
+            if body is None:
+                return jsonify({'error': 'Unsupported encoding', 'codecs': CODECS}), 415
+            stream, content_length = body
+            
+            try:
+                temp_path = self.names.temp_path()
+                size, digest = receive_stream(
+                    stream,
+                    temp_path,
+                    max_length=self.app.config['MAX_CONTENT_LENGTH'],
+                    content_length=content_length
+                )
+                filepath = self.names.commit(temp_path, filename)
+                self.content_index.record(filepath, digest)
+                _received(size)
+                
+                print(f"Arquivo recebido: {filepath}")
+                
+                return jsonify({
+                    'status': 'success',
+                    'filename': filepath.name,
+                    'path': str(filepath),
+                    'size': size,
+                    'sha256': digest
+                }), 200
+            
+            except (UploadTooLarge, RequestEntityTooLarge) as e:
+                return jsonify({'error': str(e)}), 413
+            except (IncompleteUpload, EOFError, zlib.error) as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                print(f"Erro ao receber arquivo: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/upload/bundle', methods=['PUT'])
+        def upload_bundle():
+            """
+            Vários arquivos e pastas em uma requisição: o pacote é
+            desempacotado em staging conforme chega e cada item de primeiro
+            nível é publicado em upload_dir (com nome único) no final.
+            """
+            body = self._request_body()
+            if body is None:
+                return jsonify({'error': 'Unsupported encoding', 'codecs': CODECS}), 415
+            stream, _ = body
+            
+            staging = self.upload_dir / '.partial' / f"{uuid.uuid4().hex}.bundle"
+            staging.mkdir()
+            try:
+                files, dirs, size, top_level = unpack_bundle(
+                    stream, staging, max_length=self.app.config['MAX_CONTENT_LENGTH'])
+                names = [self.names.commit(staging / name, name).name for name in top_level]
+                _received(size, files=files)
+                
+                print(f"Pacote recebido: {files} arquivos, {dirs} pastas ({', '.join(names)})")
+                
+                return jsonify({
+                    'status': 'success',
+                    'names': names,
+                    'files': files,
+                    'dirs': dirs,
+                    'size': size
+                }), 200
+            
+            except (UploadTooLarge, RequestEntityTooLarge) as e:
+                return jsonify({'error': str(e)}), 413
+            except (IncompleteUpload, EOFError, zlib.error, ValueError, FileExistsError) as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                print(f"Erro ao receber pacote: {e}")
+                return jsonify({'error': str(e)}), 500
+            finally:
+                shutil.rmtree(staging, ignore_errors=True)
+        
+        @self.app.route('/upload/relay', methods=['PUT'])
+        def upload_relay():
+            """
+            Como /upload/stream, repassando o corpo (como chegou, ainda
+            comprimido) ao resto da cadeia do cabeçalho X-Relay enquanto
+            grava. Responde com o resultado deste dispositivo e de cada um
+            dos seguintes, na ordem da cadeia.
+            """
+            start = time.perf_counter()
+            filename = secure_filename(unquote(request.headers.get('X-Filename', '')))
+            file_size = request.headers.get('X-File-Size', '')
+            if not filename or not file_size.isdigit():
+                return jsonify({'error': 'X-Filename and X-File-Size required'}), 400
+            try:
+                chain = decode_chain(request.headers.get(RELAY_HEADER))
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            if chain and not self._relay_allowed(chain):
+                return jsonify({'error': 'Relay target is not a known device'}), 403
+            encoding = request.headers.get('Content-Encoding', 'identity').strip().lower()
+            if encoding != 'identity' and encoding not in CODECS:
+                return jsonify({'error': 'Unsupported encoding', 'codecs': CODECS}), 415
+            file_size = int(file_size)
+            
+            forwarder = None
+            raw = stream = self._input(file_size)
+            if chain:
+                forwarder = RelayForwarder(
+                    lambda chunks, rest: self._relay_client().forward_relay(
+                        chunks, filename, file_size, encoding, rest),
+                    chain)
+                raw = stream = forwarder.tee(stream)
+            if encoding != 'identity':
+                stream = decoding_stream(stream, encoding)
+            
+            status, error = 200, None
+            try:
+                temp_path = self.names.temp_path()
+                size, digest = receive_stream(
+                    stream,
+                    temp_path,
+                    max_length=self.app.config['MAX_CONTENT_LENGTH'],
+                    content_length=file_size
+                )
+                if forwarder:
+                    # O decodificador pode parar antes do fim do corpo cru
+                    while raw.read(64 * 1024):
+                        pass
+                filepath = self.names.commit(temp_path, filename)
+                self.content_index.record(filepath, digest)
+                _received(size)
+                print(f"Arquivo recebido: {filepath}")
+            
+            except (UploadTooLarge, RequestEntityTooLarge) as e:
+                status, error = 413, str(e)
+            except (IncompleteUpload, EOFError, zlib.error) as e:
+                status, error = 400, str(e)
+            except Exception as e:
+                print(f"Erro ao receber arquivo: {e}")
+                status, error = 500, str(e)
+            
+            result = {
+                'success': status == 200,
+                'message': f"Arquivo enviado com sucesso: {filename}" if error is None else error,
+                'seconds': time.perf_counter() - start
+            }
+            downstream = forwarder.finish(complete=status == 200) if forwarder else []
+            body = {'results': [result, *downstream]}
+            if error is not None:
+                body['error'] = error
+            return jsonify(body), status
+        
+        @self.app.route('/pending/<token>', methods=['PUT'])
+        def pending_put(token):
+            """
+            Envio especulativo: recebe o conteúdo (como /upload/stream)
+            mas só o publica em upload_dir no commit.
+            """
+            filename = secure_filename(unquote(request.headers.get('X-Filename', '')))
+            if not filename:
+                return jsonify({'error': 'No selected file'}), 400
+            if not self.pending.valid_token(token):
+                return jsonify({'error': 'Invalid token'}), 400
+            
+            body = self._request_body()
+            if body is None:
+                return jsonify({'error': 'Unsupported encoding', 'codecs': CODECS}), 415
+            stream, content_length = body
+            
+            try:
+                temp_path = self.pending.path_for(token)
+                size, digest = receive_stream(
+                    stream,
+                    temp_path,
+                    max_length=self.app.config['MAX_CONTENT_LENGTH'],
+                    content_length=content_length
+                )
+                self.pending.add(token, filename, temp_path, size, digest)
+                _received(size, files=0)
+                return jsonify({'status': 'pending', 'size': size, 'sha256': digest}), 200
+            
+            except (UploadTooLarge, RequestEntityTooLarge) as e:
+                return jsonify({'error': str(e)}), 413
+            except (IncompleteUpload, EOFError, zlib.error) as e:
+                return jsonify({'error': str(e)}), 400
+            except Exception as e:
+                print(f"Erro ao receber arquivo: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/pending/<token>/commit', methods=['POST'])
+        def pending_commit(token):
+            """Publica o envio especulativo em upload_dir (o emissor soltou a mão aqui)"""
+            entry = self.pending.take(token)
+            if entry is None:
+                return jsonify({'error': 'Unknown or expired upload'}), 404
+            try:
+                filepath = self.names.commit(entry.path, entry.filename)
+                self.content_index.record(filepath, entry.sha256)
+                _received(0)  # os bytes já contaram no PUT /pending
+                
+                print(f"Arquivo recebido: {filepath}")
+                
+                return jsonify({
+                    'status': 'success',
+                    'filename': filepath.name,
+                    'path': str(filepath),
+                    'size': entry.size,
+                    'sha256': entry.sha256
+                }), 200
+            except OSError as e:
+                entry.path.unlink(missing_ok=True)
+                print(f"Erro ao publicar arquivo: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/pending/<token>', methods=['DELETE'])
+        def pending_delete(token):
+            """Descarta um envio especulativo (a mão soltou em outro dispositivo)"""
+            if not self.pending.discard(token):
+                return jsonify({'error': 'Unknown upload'}), 404
+            return jsonify({'status': 'discarded'}), 200
+        
+        @self.app.route('/upload/chunked', methods=['POST'])
+        def chunked_init():
+            try:
+                meta = request.get_json(force=True)
+                filename = secure_filename(meta.get('filename', ''))
+                if not filename:
+                    return jsonify({'error': 'No selected file'}), 400
                 
-                # Se arquivo já existe, adiciona número
-                counter = 1
-                while filepath.exists():
-                    name, ext = os.path.splitext(filename)
-                    filepath = self.upload_dir / f"{name}_{counter}{ext}"
-                    counter += 1
+                size = int(meta['size'])
+                if size > self.app.config['MAX_CONTENT_LENGTH']:
+                    return jsonify({'error': 'File too large'}), 413
+                
+                session = self.chunked_uploads.init_upload(
+                    filename, size, int(meta['chunk_size']),
+                    meta['chunk_hashes'], meta.get('sha256', '')
+                )
+                return jsonify({
+                    'upload_id': session.upload_id,
+                    'missing': session.missing()
+                }), 200
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+        
+        @self.app.route('/upload/chunked/<upload_id>/<int:index>', methods=['PUT'])
+        def chunked_put(upload_id, index):
+            session = self.chunked_uploads.get(upload_id)
+            if session is None:
+                return jsonify({'error': 'Unknown upload'}), 404
+            try:
+                data = self._input(request.content_length).read()
+                session.write_chunk(index, data)
+                _received(len(data), files=0)
+                return jsonify({'status': 'ok'}), 200
+            except UploadClosed as e:
+                return jsonify({'error': str(e)}), 409
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+        
+        @self.app.route('/upload/chunked/<upload_id>', methods=['GET'])
+        def chunked_status(upload_id):
+            session = self.chunked_uploads.get(upload_id)
+            if session is None:
+                return jsonify({'error': 'Unknown upload'}), 404
+            return jsonify({
+                'upload_id': upload_id,
+                'missing': session.missing(),
+                'received_ranges': session.received_ranges()
+            }), 200
+        
+        @self.app.route('/upload/chunked/<upload_id>/complete', methods=['POST'])
+        def chunked_complete(upload_id):
+            try:
+                session = self.chunked_uploads.get(upload_id)
+                if session is None:
+                    return jsonify({'error': 'Unknown upload'}), 404
+                if not session.is_complete():
+                    return jsonify({'error': 'Upload incomplete',
+                                    'missing': session.missing()}), 409
                 
-                file.save(filepath)
+                session = self.chunked_uploads.finish(upload_id)
+                if session is None:
+                    return jsonify({'error': 'Upload already completed'}), 409
+                # Os chunks foram conferidos um a um; o arquivo montado ainda
+                # precisa bater com o hash declarado antes de entrar no índice
+                # de deduplicação (/has e /materialize confiam nele)
+                digest = hash_file(session.part_path)
+                if digest != session.file_hash:
+                    session.part_path.unlink(missing_ok=True)
+                    return jsonify({'error': 'Checksum mismatch'}), 400
+                filepath = self.names.commit(session.part_path, session.filename)
+                self.content_index.record(filepath, digest)
+                _received(0)
                 
                 print(f"Arquivo recebido: {filepath}")
                 
@@ -51,7 +423,119 @@ class FileTransferServer:
                     'filename': filepath.name,
                     'path': str(filepath)
                 }), 200
+            except Exception as e:
+                print(f"Erro ao finalizar upload: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/has/<sha256>', methods=['GET'])
+        def has_content(sha256):
+            """Consulta (GET/HEAD) se já existe arquivo com esse conteúdo"""
+            path = self.content_index.find(sha256.lower())
+            if path is None:
+                return jsonify({'exists': False}), 404
+            return jsonify({'exists': True, 'size': path.stat().st_size}), 200
+        
+        @self.app.route('/materialize', methods=['POST'])
+        def materialize():
+            """
+            Cria um arquivo novo a partir de conteúdo já recebido (reflink,
+            hardlink ou cópia local), sem transferir os dados de novo.
+            """
+            try:
+                meta = request.get_json(force=True)
+                filename = secure_filename(meta.get('filename', ''))
+                if not filename:
+                    return jsonify({'error': 'No selected file'}), 400
+                
+                source = self.content_index.find(str(meta['sha256']).lower())
+                if source is None:
+                    return jsonify({'error': 'Unknown content'}), 404
+                
+                temp_path = self.names.temp_path()
+                method = clone_file(source, temp_path)
+                filepath = self.names.commit(temp_path, filename)
+                self.content_index.record(filepath, meta['sha256'].lower())
+                _received(0)
+                
+                print(f"Arquivo recebido (sem transferência, {method}): {filepath}")
+                
+                return jsonify({
+                    'status': 'success',
+                    'filename': filepath.name,
+                    'path': str(filepath),
+                    'method': method
+                }), 200
+            except (KeyError, TypeError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
+            except OSError as e:
+                print(f"Erro ao materializar arquivo: {e}")
+                return jsonify({'error': str(e)}), 500
+        
+        @self.app.route('/signature/<filename>', methods=['GET'])
+        def file_signature(filename):
+            """Assinatura por blocos de um arquivo recebido (base para envio por diferença)"""
+            filepath = self.upload_dir / secure_filename(filename)
+            if not filepath.is_file():
+                return jsonify({'error': 'File not found'}), 404
+            sig = signature(filepath)
+            sig['base'] = filepath.name
+            sig['sha256'] = self.content_index.get_hash(filepath)
+            return jsonify(sig), 200
+        
+        @self.app.route('/upload/delta', methods=['PUT'])
+        def upload_delta():
+            """
+            Recebe só as diferenças em relação a um arquivo base que o
+            receptor já tem (instruções de cópia de blocos + literais).
+            """
+            filename = secure_filename(unquote(request.headers.get('X-Filename', '')))
+            base_path = self.upload_dir / secure_filename(unquote(request.headers.get('X-Base', '')))
+            if not filename:
+                return jsonify({'error': 'No selected file'}), 400
+            if not base_path.is_file():
+                return jsonify({'error': 'Unknown base file'}), 404
+            
+            # A base não pode ter mudado desde que a assinatura foi gerada
+            if self.content_index.get_hash(base_path) != request.headers.get('X-Base-Sha256'):
+                return jsonify({'error': 'Base file changed'}), 409
+            
+            try:
+                block_size = int(request.headers.get('X-Block-Size', ''))
+            except ValueError:
+                return jsonify({'error': 'Invalid X-Block-Size'}), 400
+            if not 0 < block_size <= MAX_BLOCK_SIZE:
+                return jsonify({'error': 'Invalid X-Block-Size'}), 400
+            
+            try:
+                temp_path = self.names.temp_path()
+                size, digest = apply_delta(
+                    self._input(request.content_length),
+                    base_path,
+                    temp_path,
+                    block_size=block_size,
+                    max_length=self.app.config['MAX_CONTENT_LENGTH']
+                )
+                if digest != request.headers.get('X-File-Sha256', digest):
+                    temp_path.unlink()
+                    return jsonify({'error': 'Checksum mismatch'}), 400
+                filepath = self.names.commit(temp_path, filename)
+                self.content_index.record(filepath, digest)
+                _received(0)  # o arquivo foi reconstruído a partir da base
                 
+                print(f"Arquivo recebido (diferença): {filepath}")
+                
+                return jsonify({
+                    'status': 'success',
+                    'filename': filepath.name,
+                    'path': str(filepath),
+                    'size': size,
+                    'sha256': digest
+                }), 200
+            
+            except (UploadTooLarge, RequestEntityTooLarge) as e:
+                return jsonify({'error': str(e)}), 413
+            except (IncompleteUpload, KeyError, ValueError) as e:
+                return jsonify({'error': str(e)}), 400
             except Exception as e:
                 print(f"Erro ao receber arquivo: {e}")
                 return jsonify({'error': str(e)}), 500
@@ -60,30 +544,136 @@ class FileTransferServer:
         def download_file(filename):
             try:
                 filepath = self.upload_dir / secure_filename(filename)
-                if filepath.exists():
-                    return send_file(filepath)
+                if filepath.is_file():
+                    return serve_file(request, filepath,
+                                      etag=self.content_index.get_hash(filepath))
                 return jsonify({'error': 'File not found'}), 404
             except Exception as e:
                 return jsonify({'error': str(e)}), 500
     
+    def _setup_metrics(self):
+        """Duração e contagem de requisições por rota, e a rota /metrics"""
+        @self.app.before_request
+        def start_timer():
+            g.metrics_start = time.perf_counter()
+            REQUESTS_ACTIVE.inc()
+        
+        @self.app.after_request
+        def record_request(response):
+            if 'metrics_start' in g:
+                route = _route()
+                REQUESTS.labels(route, response.status_code).inc()
+                REQUEST_SECONDS.labels(route).observe(time.perf_counter() - g.metrics_start)
+            return response
+        
+        @self.app.teardown_request
+        def finish_request(exc):
+            if g.pop('metrics_start', None) is not None:
+                REQUESTS_ACTIVE.dec()
+        
+        @self.app.route('/metrics', methods=['GET'])
+        def metrics_route():
+            """Métricas no formato de texto do Prometheus"""
+            return Response(metrics.REGISTRY.render(),
+                            content_type='text/plain; version=0.0.4; charset=utf-8')
+    
+    def _request_body(self):
+        """
+        Corpo da requisição e seu tamanho original. Com Content-Encoding o
+        corpo é descomprimido em streaming e X-File-Size traz o tamanho;
+        None se o codec não é suportado.
+        """
+        encoding = request.headers.get('Content-Encoding', 'identity').strip().lower()
+        if encoding == 'identity':
+            return self._input(request.content_length), request.content_length
+        if encoding in CODECS:
+            file_size = request.headers.get('X-File-Size')
+            file_size = int(file_size) if file_size else None
+            return decoding_stream(self._input(file_size), encoding), file_size
+        return None
+    
+    def _input(self, size=None):
+        """Corpo cru da requisição; lido pelo agendador de banda só quando há limites"""
+        if self.scheduler is None:
+            return request.stream
+        return self.scheduler.reader(request.stream, request.remote_addr, size)
+    
+    def _relay_allowed(self, chain):
+        """
+        Só repassa para dispositivos descobertos na rede local: a cadeia
+        vem do emissor e não pode virar um proxy para endereços arbitrários.
+        """
+        if self.relay_peers is None:
+            return False
+        # Qualquer endereço do dispositivo: o emissor pode ter escolhido outro
+        known = {(address, device['port']) for device in self.relay_peers()
+                 for address in device.get('addresses') or [device['ip']]}
+        return all((hop['ip'], hop['port']) in known for hop in chain)
+    
+    def _relay_client(self):
+        """Cliente HTTP do repasse, criado no primeiro envio em cadeia"""
+        with self._relay_lock:
+            if self.relay_client is None:
+                from file_transfer_client import FileTransferClient
+                self.relay_client = FileTransferClient(timeout=self.read_timeout,
+                                                       scheduler=self.scheduler)
+            return self.relay_client
+    
     def start(self):
-        """Inicia servidor em thread separada"""
+        """Faz o bind da porta e atende as requisições em thread separada"""
+        options = {}
+        if self.backend == 'pooled':
+            options = {'workers': self.workers, 'read_timeout': self.read_timeout}
+        self.server = create_server(self.backend, '0.0.0.0', self.port, self.app, **options)
+        self.port = self.server.server_address[1]
+        if hasattr(self.server, 'open_connections'):
+            CONNECTIONS.set_function(self.server.open_connections)
+        
+        self.ready.clear()
         self.server_thread = threading.Thread(
-            target=self._run_server,
+            target=self._serve,
             daemon=True
         )
         self.server_thread.start()
-        print(f"Servidor HTTP iniciado na porta {self.port}")
+        print(f"Servidor HTTP ({self.backend}) iniciado na porta {self.port}")
     
-    def _run_server(self):
-        """Executa servidor Flask"""
-        self.app.run(
-            host='0.0.0.0',
-            port=self.port,
-            debug=False,
-            use_reloader=False
-        )
+    def _serve(self):
+        # A porta já está escutando (conexões aguardam no backlog): o
+        # servidor está pronto assim que o loop de atendimento começa
+        self.ready.set()
+        self.server.serve_forever()
+    
+    def wait_ready(self, timeout=5):
+        """Espera o servidor começar a atender; False se não ficou pronto a tempo"""
+        return self.ready.wait(timeout) and self.is_running()
+    
+    def stop(self, timeout=10):
+        """Para de aceitar conexões e aguarda as transferências em andamento"""
+        if self.server is None:
+            return
+        self.server.shutdown_gracefully(timeout)
+        if self.server_thread is not None:
+            self.server_thread.join(timeout=1)
+        self.server = None
+        if self.relay_client is not None:
+            self.relay_client.close()
+        self.content_index.close()
+        print("Servidor HTTP encerrado")
     
     def is_running(self):
         """Verifica se servidor está rodando"""
-        return self.server_thread is not None and self.server_thread.is_alive()
\ No newline at end of file
+        return self.server_thread is not None and self.server_thread.is_alive()
+
+
+def _route():
+    """Regra da rota atendida (sem os parâmetros, para não multiplicar séries)"""
+    rule = request.url_rule
+    return rule.rule if rule is not None else 'unmatched'
+
+
+def _received(size, files=1):
+    route = _route()
+    if files:
+        FILES_RECEIVED.labels(route).inc(files)
+    if size:
+        BYTES_RECEIVED.labels(route).inc(size)
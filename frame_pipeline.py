@@ -0,0 +1,245 @@
+import queue
+import threading
+import time
+from collections import deque
+from gesture_state import GestureState
+import metrics
+
+STAGE_SECONDS = metrics.histogram(
+    'aiteleport_frame_stage_seconds', 'Duração das etapas do pipeline da câmera', ['stage'])
+FRAMES = metrics.counter('aiteleport_frames_total', 'Frames processados pela inferência')
+FPS = metrics.gauge('aiteleport_fps', 'Frames por segundo processados pela inferência')
+FRAMES_DROPPED = metrics.counter(
+    'aiteleport_frames_dropped_total', 'Frames descartados (captura ou exibição mais rápidas que o resto)')
+RESULTS_QUEUED = metrics.gauge(
+    'aiteleport_pipeline_results_queued', 'Frames processados aguardando exibição')
+EVENTS_QUEUED = metrics.gauge(
+    'aiteleport_pipeline_events_queued', 'Mudanças de gesto aguardando a thread principal')
+
+MAX_INFERENCE_FAILURES = 30  # frames seguidos com erro antes de parar o pipeline
+
+
+class FramePacket:
+    """Frame em trânsito pelo pipeline, com timestamps de cada estágio"""
+    __slots__ = ('seq', 'frame', 'captured_at', 'timings',
+                 'annotated', 'hands')
+
+    def __init__(self, seq, frame, captured_at):
+        self.seq = seq
+        self.frame = frame
+        self.captured_at = captured_at
+        self.timings = {}
+        self.annotated = None
+        self.hands = {}
+
+
+class LatestFrameSlot:
+    """
+    Fila de tamanho 1 que sempre guarda apenas o frame mais recente.
+    Um put sobre um frame ainda não consumido descarta o antigo.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._item = None
+        self.dropped = 0
+
+    def put(self, item):
+        with self._cond:
+            if self._item is not None:
+                self.dropped += 1
+            self._item = item
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        with self._cond:
+            if self._item is None:
+                self._cond.wait(timeout)
+            item, self._item = self._item, None
+            return item
+
+
+class StageStats:
+    """Latências recentes por estágio (janela deslizante)"""
+    def __init__(self, window=120):
+        self.window = window
+        self._lock = threading.Lock()
+        self._samples = {}
+
+    def record(self, stage, seconds):
+        with self._lock:
+            samples = self._samples.get(stage)
+            if samples is None:
+                samples = self._samples[stage] = deque(maxlen=self.window)
+            samples.append(seconds)
+
+    def summary(self):
+        """Retorna {estágio: (média_ms, p95_ms)}"""
+        with self._lock:
+            snapshot = {stage: sorted(s) for stage, s in self._samples.items() if s}
+
+        result = {}
+        for stage, values in snapshot.items():
+            mean = sum(values) / len(values)
+            p95 = values[min(len(values) - 1, int(len(values) * 0.95))]
+            result[stage] = (mean * 1000, p95 * 1000)
+        return result
+
+    def format(self):
+        parts = [f"{stage}={mean:.1f}/{p95:.1f}ms"
+                 for stage, (mean, p95) in sorted(self.summary().items())]
+        return " ".join(parts)
+
+
+class FramePipeline:
+    """
+    Pipeline captura -> inferência -> renderização.
+
+    A captura roda em uma thread própria e só mantém o frame mais novo;
+    a inferência roda em outra thread e publica resultados em uma fila
+    limitada. A renderização fica com quem consome os resultados (a thread
+    principal, já que cv2.imshow precisa dela). Mudanças de estado do gesto
+    vão para uma fila de eventos separada para nunca serem perdidas quando
+    um resultado é descartado.
+    """
+    def __init__(self, camera, process_fn, result_queue_size=2):
+        self.camera = camera
+        self.process_fn = process_fn
+
+        self.frame_slot = LatestFrameSlot()
+        self.results = queue.Queue(maxsize=result_queue_size)
+        self.events = queue.Queue()
+        self.stats = StageStats()
+
+        self.running = False
+        self.error = None
+        self.dropped_results = 0
+        self._threads = []
+
+    def start(self):
+        """Inicia as threads de captura e inferência"""
+        self.running = True
+        self._threads = [
+            threading.Thread(target=self._capture_loop, name='capture', daemon=True),
+            threading.Thread(target=self._inference_loop, name='inference', daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+        FRAMES_DROPPED.set_function(lambda: self.frame_slot.dropped + self.dropped_results)
+        RESULTS_QUEUED.set_function(self.results.qsize)
+        EVENTS_QUEUED.set_function(self.events.qsize)
+
+    def stop(self, timeout=1.0):
+        """Para as threads do pipeline"""
+        self.running = False
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def is_alive(self):
+        return self.running and all(t.is_alive() for t in self._threads)
+
+    def _capture_loop(self):
+        seq = 0
+        while self.running:
+            t0 = time.perf_counter()
+            ret, frame = self.camera.read()
+            if not ret:
+                self.error = "Erro ao ler frame da câmera"
+                self.running = False
+                break
+
+            seq += 1
+            packet = FramePacket(seq, frame, time.perf_counter())
+            packet.timings['capture'] = packet.captured_at - t0
+            self._record('capture', packet.timings['capture'])
+            self.frame_slot.put(packet)
+
+    def _record(self, stage, seconds):
+        self.stats.record(stage, seconds)
+        STAGE_SECONDS.labels(stage).observe(seconds)
+
+    def _inference_loop(self):
+        last_states = {}
+        failures = 0
+        window_start, window_frames = time.perf_counter(), 0
+        while self.running:
+            packet = self.frame_slot.get(timeout=0.1)
+            if packet is None:
+                continue
+
+            t0 = time.perf_counter()
+            try:
+                annotated, hands = self.process_fn(packet.frame)
+            except Exception as e:
+                # Um frame com erro é descartado; só falhas seguidas encerram
+                failures += 1
+                print(f"Erro na inferência (frame {packet.seq} descartado): {e}")
+                if failures >= MAX_INFERENCE_FAILURES:
+                    self.error = f"Erro na inferência: {e}"
+                    self.running = False
+                    break
+                continue
+            failures = 0
+            packet.timings['inference'] = time.perf_counter() - t0
+            self._record('inference', packet.timings['inference'])
+
+            packet.annotated = annotated
+            packet.hands = hands
+
+            FRAMES.inc()
+            window_frames += 1
+            now = time.perf_counter()
+            if now - window_start >= 1.0:
+                FPS.set(window_frames / (now - window_start))
+                window_start, window_frames = now, 0
+
+            # Eventos por mão: (hand_id, estado anterior, novo estado, posição, shape)
+            for hand_id, (state, hand_position) in hands.items():
+                last_state = last_states.get(hand_id, GestureState.IDLE)
+                if state != last_state:
+                    self.events.put((hand_id, last_state, state, hand_position,
+                                     packet.frame.shape))
+                if hand_position is None and state == GestureState.IDLE:
+                    last_states.pop(hand_id, None)
+                else:
+                    last_states[hand_id] = state
+
+            self._publish(packet)
+
+    def _publish(self, packet):
+        """Publica resultado descartando o mais antigo se a fila estiver cheia"""
+        while True:
+            try:
+                self.results.put_nowait(packet)
+                return
+            except queue.Full:
+                try:
+                    self.results.get_nowait()
+                    self.dropped_results += 1
+                except queue.Empty:
+                    pass
+
+    def drain_events(self):
+        """Retorna todas as mudanças de estado pendentes, em ordem"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def get_result(self, timeout=None):
+        """Próximo frame processado, ou None se nenhum ficou pronto a tempo"""
+        try:
+            return self.results.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def record_render(self, packet, render_seconds):
+        """Registra tempo de renderização e idade fim-a-fim do frame"""
+        self._record('render', render_seconds)
+        self._record('frame_age', time.perf_counter() - packet.captured_at)
+
+    def report(self):
+        dropped = self.frame_slot.dropped + self.dropped_results
+        return f"[pipeline] {self.stats.format()} descartados={dropped}"
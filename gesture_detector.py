@@ -1,153 +1,137 @@
 import cv2
-import mediapipe as mp
 import time
-from enum import Enum
+import numpy as np
+from inference_scheduler import InferenceScheduler
+from hand_features import stack_landmarks
+from gesture_logic import GestureLogic
+from gesture_state import GestureState
 
-class GestureState(Enum):
-    IDLE = "idle"
-    GRABBING = "grabbing"
-    HOLDING = "holding"
-    RELEASING = "releasing"
+# Conexões entre landmarks desenhadas no preview (topologia do MediaPipe Hands)
+HAND_CONNECTIONS = (
+    (0, 1), (1, 2), (2, 3), (3, 4),
+    (0, 5), (5, 6), (6, 7), (7, 8),
+    (5, 9), (9, 10), (10, 11), (11, 12),
+    (9, 13), (13, 14), (14, 15), (15, 16),
+    (13, 17), (0, 17), (17, 18), (18, 19), (19, 20),
+)
 
-class GestureDetector:
-    def __init__(self):
-        self.mp_hands = mp.solutions.hands
-        self.hands = self.mp_hands.Hands(
+
+class MediaPipeHands:
+    """
+    MediaPipe Hands no processo atual: frame BGR -> (landmarks (N, 21, 3),
+    lateralidade). A conversão para RGB usa buffers reaproveitados.
+    """
+    def __init__(self, max_num_hands=2):
+        import mediapipe as mp
+        
+        self.hands = mp.solutions.hands.Hands(
             static_image_mode=False,
-            max_num_hands=1,
+            max_num_hands=max_num_hands,
             min_detection_confidence=0.7,
             min_tracking_confidence=0.5
         )
-        self.mp_draw = mp.solutions.drawing_utils
-        
-        self.state = GestureState.IDLE
-        self.grab_start_time = None
-        self.hold_duration_threshold = 0.5  # segundos
-        
-    def is_hand_closed(self, hand_landmarks):
-        """Detecta se a mão está fechada (punho)"""
-        # Pega as coordenadas dos dedos
-        thumb_tip = hand_landmarks.landmark[4]
-        index_tip = hand_landmarks.landmark[8]
-        middle_tip = hand_landmarks.landmark[12]
-        ring_tip = hand_landmarks.landmark[16]
-        pinky_tip = hand_landmarks.landmark[20]
-        
-        # Base da palma
-        wrist = hand_landmarks.landmark[0]
-        palm_base = hand_landmarks.landmark[9]
-        
-        # Calcula distância média das pontas dos dedos até a base da palma
-        avg_distance = (
-            self._distance(index_tip, palm_base) +
-            self._distance(middle_tip, palm_base) +
-            self._distance(ring_tip, palm_base) +
-            self._distance(pinky_tip, palm_base)
-        ) / 4
-        
-        # Mão fechada = dedos próximos da palma
-        return avg_distance < 0.15
+        self._rgb = {}  # shape -> buffer RGB (resolução total e reduzida)
     
-    def is_hand_open(self, hand_landmarks):
-        """Detecta se a mão está aberta"""
-        thumb_tip = hand_landmarks.landmark[4]
-        index_tip = hand_landmarks.landmark[8]
-        middle_tip = hand_landmarks.landmark[12]
-        ring_tip = hand_landmarks.landmark[16]
-        pinky_tip = hand_landmarks.landmark[20]
+    def detect(self, frame, in_place=False):
+        """Landmarks do frame BGR; com in_place o próprio frame vira RGB"""
+        if in_place:
+            rgb = frame
+        else:
+            rgb = self._rgb.get(frame.shape)
+            if rgb is None:
+                rgb = self._rgb[frame.shape] = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=rgb)
+        results = self.hands.process(rgb)
         
-        palm_base = hand_landmarks.landmark[9]
+        if not results.multi_hand_landmarks:
+            return np.empty((0, 21, 3), dtype=np.float32), []
+        points = stack_landmarks(results.multi_hand_landmarks)
+        handedness = [h.classification[0].label for h in results.multi_handedness]
+        return points, handedness
+    
+    def close(self):
+        self.hands.close()
+
+
+class GestureDetector(GestureLogic):
+    """
+    Frame da câmera -> estados do gesto por mão. A inferência fica com
+    `hands` (MediaPipeHands no processo atual por padrão, ou
+    inference_process.ProcessHands em um processo separado).
+    """
+    def __init__(self, scheduler=None, max_num_hands=2, filter_name='one_euro',
+                 lost_grace_frames=5, lost_grace_ms=300, hands=None):
+        super().__init__(filter_name=filter_name,
+                         lost_grace_frames=lost_grace_frames,
+                         lost_grace_ms=lost_grace_ms)
         
-        # Calcula distância média das pontas dos dedos até a base da palma
-        avg_distance = (
-            self._distance(index_tip, palm_base) +
-            self._distance(middle_tip, palm_base) +
-            self._distance(ring_tip, palm_base) +
-            self._distance(pinky_tip, palm_base)
-        ) / 4
+        self.hands = hands or MediaPipeHands(max_num_hands)
         
-        # Mão aberta = dedos longe da palma
-        return avg_distance > 0.20
-    
-    def _distance(self, point1, point2):
-        """Calcula distância euclidiana entre dois pontos"""
-        return ((point1.x - point2.x)**2 + 
-                (point1.y - point2.y)**2 + 
-                (point1.z - point2.z)**2)**0.5
-    
-    def get_hand_position(self, hand_landmarks, frame_shape):
-        """Retorna posição (x, y) do centro da mão em pixels"""
-        h, w, _ = frame_shape
-        palm_base = hand_landmarks.landmark[9]
-        return int(palm_base.x * w), int(palm_base.y * h)
+        # Decide quando rodar a inferência e em qual resolução
+        self.scheduler = scheduler or InferenceScheduler()
+        self._small = None  # buffer do frame reduzido
     
-    def process_frame(self, frame):
+    def process_frame(self, frame, now=None):
         """
         Processa um frame e retorna:
         - frame anotado
-        - estado do gesto
-        - posição da mão (x, y) ou None
+        - {hand_id: (estado do gesto, posição da mão (x, y) ou None)}
+        
+        `now` permite injetar o timestamp do frame (replay offline).
         """
-        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = self.hands.process(rgb_frame)
+        if now is None:
+            now = time.time()
+        
+        if self.recorder:
+            self.recorder.add_frame(frame, now)
+        scale = self.scheduler.plan(frame, self.state == GestureState.IDLE, now)
         
-        hand_position = None
+        if scale is None:
+            # Cena estática e ociosa: nada a inferir neste frame
+            self._draw_status(frame, {})
+            return frame, {}
         
-        if results.multi_hand_landmarks:
-            for hand_landmarks in results.multi_hand_landmarks:
-                # Desenha landmarks
-                self.mp_draw.draw_landmarks(
-                    frame, 
-                    hand_landmarks, 
-                    self.mp_hands.HAND_CONNECTIONS
-                )
-                
-                # Detecta gesto
-                hand_position = self.get_hand_position(hand_landmarks, frame.shape)
-                
-                is_closed = self.is_hand_closed(hand_landmarks)
-                is_open = self.is_hand_open(hand_landmarks)
-                
-                # Máquina de estados
-                if self.state == GestureState.IDLE:
-                    if is_closed:
-                        self.state = GestureState.GRABBING
-                        self.grab_start_time = time.time()
-                        
-                elif self.state == GestureState.GRABBING:
-                    if not is_closed:
-                        # Soltou muito rápido, volta ao idle
-                        self.state = GestureState.IDLE
-                        self.grab_start_time = None
-                    elif time.time() - self.grab_start_time > self.hold_duration_threshold:
-                        # Segurou tempo suficiente
-                        self.state = GestureState.HOLDING
-                        
-                elif self.state == GestureState.HOLDING:
-                    if is_open:
-                        self.state = GestureState.RELEASING
-                        self.grab_start_time = None
-                    elif not is_closed:
-                        # Mão não está mais fechada mas não abriu completamente
-                        self.state = GestureState.IDLE
-                        self.grab_start_time = None
-                        
-                elif self.state == GestureState.RELEASING:
-                    # Reset após release
-                    self.state = GestureState.IDLE
+        if scale < 1.0:
+            # Landmarks são normalizados, então a escala não afeta posições
+            h, w = frame.shape[:2]
+            size = (max(1, int(w * scale)), max(1, int(h * scale)))
+            if self._small is None or self._small.shape[1::-1] != size:
+                self._small = np.empty((size[1], size[0], frame.shape[2]), dtype=frame.dtype)
+            cv2.resize(frame, size, dst=self._small, interpolation=cv2.INTER_AREA)
+            points, handedness = self.hands.detect(self._small, in_place=True)
         else:
-            # Sem mão detectada
-            if self.state != GestureState.IDLE:
-                self.state = GestureState.IDLE
-                self.grab_start_time = None
+            points, handedness = self.hands.detect(frame)
+        self.scheduler.observe(len(points) > 0, now)
         
-        # Adiciona status no frame
+        self._draw_landmarks(frame, points)
+        
+        hands = self.update_hands(points, handedness, frame.shape, now)
+        
+        self._draw_status(frame, hands)
+        
+        return frame, hands
+    
+    def _draw_landmarks(self, frame, points):
+        """Desenha landmarks e conexões de cada mão"""
+        h, w = frame.shape[:2]
+        for hand in points:
+            pixels = [(int(x * w), int(y * h)) for x, y, _ in hand]
+            for a, b in HAND_CONNECTIONS:
+                cv2.line(frame, pixels[a], pixels[b], (255, 255, 255), 2)
+            for pixel in pixels:
+                cv2.circle(frame, pixel, 3, (0, 0, 255), -1)
+    
+    def _draw_status(self, frame, hands):
+        """Adiciona status no frame"""
         status_text = f"Estado: {self.state.value.upper()}"
-        cv2.putText(frame, status_text, (10, 30), 
+        cv2.putText(frame, status_text, (10, 30),
                    cv2.FONT_HERSHEY_SIMPLEX, 1, (0, 255, 0), 2)
         
-        return frame, self.state, hand_position
+        for hand_id, (state, position) in hands.items():
+            if position:
+                cv2.putText(frame, f"#{hand_id} {state.value}", position,
+                           cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
     
     def release(self):
         """Libera recursos"""
-        self.hands.close()
\ No newline at end of file
+        self.hands.close()
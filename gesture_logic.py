@@ -0,0 +1,106 @@
+import time
+import numpy as np
+from hand_features import PALM_BASE, extract_features
+from hand_tracker import GestureState, HandTracker
+from landmark_filter import Hysteresis
+
+# Ordem de prioridade para o estado agregado exibido na tela
+_STATE_PRIORITY = {
+    GestureState.IDLE: 0,
+    GestureState.RELEASING: 1,
+    GestureState.GRABBING: 2,
+    GestureState.HOLDING: 3,
+}
+
+class GestureLogic:
+    """
+    Lógica landmarks -> estados do gesto, sem dependência do MediaPipe.
+    Usada pelo GestureDetector e pelo replay offline de gravações.
+    """
+    def __init__(self, filter_name='one_euro', lost_grace_frames=5, lost_grace_ms=300):
+        # Estado agregado (mão mais avançada no gesto)
+        self.state = GestureState.IDLE
+        self.hold_duration_threshold = 0.5  # segundos
+        
+        # Limiares em unidades do tamanho da palma (invariantes à escala),
+        # com histerese: entra em "fechada" abaixo de 0.6 e só sai acima de 0.7
+        self.closed_threshold = 0.6
+        self.closed_release_threshold = 0.7
+        self.open_threshold = 0.8
+        self.open_release_threshold = 0.72
+        
+        # Cada mão tem ID estável, filtro de landmarks e máquina de estados própria
+        self.tracker = HandTracker(
+            hold_duration_threshold=self.hold_duration_threshold,
+            lost_grace_frames=lost_grace_frames,
+            lost_grace_ms=lost_grace_ms,
+            filter_name=filter_name
+        )
+        
+        # Gravador opcional dos landmarks crus (ver gesture_replay.py)
+        self.recorder = None
+    
+    def is_hand_closed(self, track, extension):
+        """Detecta se a mão está fechada (punho)"""
+        # Mão fechada = dedos próximos da palma (em unidades do tamanho da palma)
+        if track.closed_gate is None:
+            track.closed_gate = Hysteresis(self.closed_threshold, self.closed_release_threshold)
+        return track.closed_gate.update(extension)
+    
+    def is_hand_open(self, track, extension):
+        """Detecta se a mão está aberta"""
+        # Mão aberta = dedos longe da palma
+        if track.open_gate is None:
+            track.open_gate = Hysteresis(self.open_threshold, self.open_release_threshold)
+        return track.open_gate.update(extension)
+    
+    def get_hand_position(self, points, frame_shape):
+        """Retorna posição (x, y) do centro da mão em pixels"""
+        h, w, _ = frame_shape
+        palm_base = points[PALM_BASE]
+        return int(palm_base[0] * w), int(palm_base[1] * h)
+    
+    def update_hands(self, points, handedness, frame_shape, now=None):
+        """
+        Atualiza as mãos rastreadas a partir de landmarks já extraídos.
+        
+        points: array (N, 21, 3); handedness: lista com 'Left'/'Right'.
+        Retorna {hand_id: (estado, posição)}; mãos perdidas neste frame
+        aparecem uma última vez como (IDLE, None).
+        """
+        if now is None:
+            now = time.time()
+        
+        if self.recorder:
+            self.recorder.add_hands(now, points, handedness, frame_shape)
+        
+        hands = {}
+        
+        tracks, lost = self.tracker.update(points[:, PALM_BASE, :2], handedness, now)
+        
+        if tracks:
+            # Suaviza os landmarks de cada mão com o filtro da própria trilha
+            filtered = np.stack([track.filter(points[i], now)
+                                 for i, track in enumerate(tracks)])
+            
+            # Features de todas as mãos em uma única passada vetorizada
+            features = extract_features(filtered)
+            
+            for i, track in enumerate(tracks):
+                track.points = filtered[i]
+                track.position = self.get_hand_position(filtered[i], frame_shape)
+                is_closed = self.is_hand_closed(track, features.extension[i])
+                is_open = self.is_hand_open(track, features.extension[i])
+                track.machine.update(is_closed, is_open, now)
+                hands[track.hand_id] = (track.state, track.position)
+        
+        # Mãos sem detecção além da janela de tolerância
+        for track in lost:
+            hands[track.hand_id] = (GestureState.IDLE, None)
+        
+        self.state = max(
+            (track.state for track in self.tracker.tracks.values()),
+            key=_STATE_PRIORITY.get,
+            default=GestureState.IDLE
+        )
+        return hands
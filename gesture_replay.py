@@ -0,0 +1,305 @@
+"""
+Gravação e replay offline de gestos
+
+Uso:
+    python gesture_replay.py record saida.npz [--frames] [--seconds 30]
+    python gesture_replay.py replay gravacao.npz [--labels gt.json] [--frames]
+
+A gravação guarda os landmarks crus de cada frame processado (formato
+.npz compacto, float16). Com --frames o vídeo também é gravado ao lado
+(saida.avi, MJPG) para replay completo pelo process_frame.
+
+O arquivo de labels é uma lista JSON de transições esperadas:
+    [{"t": 1.25, "state": "holding"}, {"t": 2.10, "state": "releasing"}]
+com "t" em segundos desde o início da gravação.
+"""
+
+import argparse
+import json
+import sys
+import time
+from collections import deque
+from pathlib import Path
+
+import numpy as np
+
+from gesture_logic import GestureLogic
+from gesture_state import GestureState
+
+_HANDEDNESS_CODES = {'Left': 0, 'Right': 1}
+_HANDEDNESS_NAMES = {v: k for k, v in _HANDEDNESS_CODES.items()}
+
+MAX_RECORDED_FRAMES = 30 * 60 * 10  # ~10 minutos a 30 FPS
+
+
+class GestureRecorder:
+    """
+    Acumula landmarks (e opcionalmente frames) com timestamps. Guarda só
+    os últimos `max_frames` frames (uma sessão longa não cresce sem
+    limite); o vídeo vai direto para o disco.
+    """
+    def __init__(self, path, record_frames=False, max_frames=MAX_RECORDED_FRAMES):
+        self.path = Path(path)
+        self.record_frames = record_frames
+        self.hands = deque(maxlen=max_frames)  # (timestamp, pontos, lateralidades)
+        self.frame_shape = (0, 0, 3)
+        self.frame_timestamps = deque(maxlen=max_frames)
+        self.skipped_frames = 0  # frames do vídeo que saíram da janela
+        self._writer = None
+    
+    def add_hands(self, now, points, handedness, frame_shape):
+        self.frame_shape = tuple(frame_shape)
+        self.hands.append((
+            now,
+            np.asarray(points, dtype=np.float16).reshape(-1, 21, 3),
+            [_HANDEDNESS_CODES.get(h, 0) for h in handedness[:len(points)]],
+        ))
+    
+    def add_frame(self, frame, now):
+        if not self.record_frames:
+            return
+        if self._writer is None:
+            import cv2
+            h, w = frame.shape[:2]
+            self._writer = cv2.VideoWriter(
+                str(self.path.with_suffix('.avi')),
+                cv2.VideoWriter_fourcc(*'MJPG'), 30, (w, h)
+            )
+        self._writer.write(frame)
+        if len(self.frame_timestamps) == self.frame_timestamps.maxlen:
+            self.skipped_frames += 1
+        self.frame_timestamps.append(now)
+    
+    def save(self):
+        """Grava o arquivo .npz (timestamps relativos ao primeiro frame)"""
+        timestamps = [t for t, _, _ in self.hands]
+        starts = timestamps[:1] + list(self.frame_timestamps)[:1]
+        t0 = min(starts) if starts else 0.0
+        
+        points = (np.concatenate([p for _, p, _ in self.hands]) if self.hands
+                  else np.empty((0, 21, 3), dtype=np.float16))
+        np.savez_compressed(
+            self.path,
+            timestamps=np.asarray(timestamps, dtype=np.float64) - t0,
+            counts=np.asarray([len(p) for _, p, _ in self.hands], dtype=np.uint8),
+            points=points,
+            handedness=np.asarray([c for _, _, codes in self.hands for c in codes],
+                                  dtype=np.uint8),
+            frame_shape=np.asarray(self.frame_shape, dtype=np.int32),
+            frame_timestamps=np.asarray(self.frame_timestamps, dtype=np.float64) - t0,
+            skipped_frames=np.asarray(self.skipped_frames, dtype=np.int64),
+        )
+        if self._writer is not None:
+            self._writer.release()
+        print(f"Gravação salva: {self.path} ({len(timestamps)} frames)")
+
+
+class Recording:
+    """Gravação carregada do disco"""
+    def __init__(self, path):
+        self.path = Path(path)
+        data = np.load(self.path)
+        self.timestamps = data['timestamps']
+        self.counts = data['counts']
+        self.points = data['points'].astype(np.float32)
+        self.handedness = data['handedness']
+        self.frame_shape = tuple(int(v) for v in data['frame_shape'])
+        self.frame_timestamps = data['frame_timestamps']
+        # Gravações longas guardam só o fim; o vídeo tem o início inteiro
+        self.skipped_frames = int(data['skipped_frames']) if 'skipped_frames' in data else 0
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts, dtype=np.int64)))
+    
+    def __len__(self):
+        return len(self.timestamps)
+    
+    def frame_hands(self, i):
+        """Landmarks (N, 21, 3) e lateralidades do i-ésimo frame"""
+        a, b = self.offsets[i], self.offsets[i + 1]
+        handedness = [_HANDEDNESS_NAMES[int(c)] for c in self.handedness[a:b]]
+        return self.points[a:b], handedness
+
+
+class ReplayReport:
+    """Resultado de um replay: desempenho, timeline e acurácia"""
+    def __init__(self, latencies, wall_time, timeline):
+        self.latencies = np.asarray(latencies)
+        self.wall_time = wall_time
+        self.timeline = timeline  # [(t, hand_id, estado anterior, novo estado)]
+        self.accuracy = None
+    
+    @property
+    def fps(self):
+        return len(self.latencies) / self.wall_time if self.wall_time else 0.0
+    
+    def percentiles(self):
+        if not len(self.latencies):
+            return {}
+        values = np.percentile(self.latencies * 1000, [50, 95, 99])
+        return dict(zip(('p50', 'p95', 'p99'), values))
+    
+    def match_labels(self, labels, tolerance=0.25):
+        """
+        Compara as transições previstas com as esperadas. Cada label casa
+        com a transição prevista mais próxima para o mesmo estado dentro
+        da tolerância (segundos).
+        """
+        predicted = [(t, new.value) for t, _, _, new in self.timeline
+                     if new != GestureState.IDLE]
+        used = set()
+        errors = []
+        
+        for label in sorted(labels, key=lambda l: l['t']):
+            best = None
+            for j, (t, state) in enumerate(predicted):
+                if j in used or state != label['state']:
+                    continue
+                delta = abs(t - label['t'])
+                if delta <= tolerance and (best is None or delta < best[1]):
+                    best = (j, delta)
+            if best:
+                used.add(best[0])
+                errors.append(best[1])
+        
+        matched = len(errors)
+        self.accuracy = {
+            'labels': len(labels),
+            'predicted': len(predicted),
+            'matched': matched,
+            'recall': matched / len(labels) if labels else 1.0,
+            'precision': matched / len(predicted) if predicted else 1.0,
+            'mean_offset_ms': float(np.mean(errors) * 1000) if errors else 0.0,
+        }
+        return self.accuracy
+    
+    def print_summary(self):
+        print(f"Frames: {len(self.latencies)}  FPS: {self.fps:.0f}")
+        print("Latência por frame: " + "  ".join(
+            f"{k}={v:.3f}ms" for k, v in self.percentiles().items()))
+        print("Transições:")
+        for t, hand_id, old, new in self.timeline:
+            print(f"  {t:8.3f}s  #{hand_id}  {old.value} -> {new.value}")
+        if self.accuracy:
+            a = self.accuracy
+            print(f"Acurácia: recall={a['recall']:.2f} precision={a['precision']:.2f} "
+                  f"({a['matched']}/{a['labels']} labels, "
+                  f"desvio médio {a['mean_offset_ms']:.0f}ms)")
+
+
+def _track_transitions(hands, last_states, timeline, t):
+    for hand_id, (state, _) in hands.items():
+        old = last_states.get(hand_id, GestureState.IDLE)
+        if state != old:
+            timeline.append((t, hand_id, old, state))
+        last_states[hand_id] = state
+
+
+def replay_landmarks(recording, logic=None):
+    """Alimenta a lógica de estados só com os landmarks, o mais rápido possível"""
+    logic = logic or GestureLogic()
+    latencies, timeline, last_states = [], [], {}
+    
+    start = time.perf_counter()
+    for i in range(len(recording)):
+        points, handedness = recording.frame_hands(i)
+        t = float(recording.timestamps[i])
+        
+        t0 = time.perf_counter()
+        hands = logic.update_hands(points, handedness, recording.frame_shape, now=t)
+        latencies.append(time.perf_counter() - t0)
+        
+        _track_transitions(hands, last_states, timeline, t)
+    
+    return ReplayReport(latencies, time.perf_counter() - start, timeline)
+
+
+def replay_frames(recording, detector):
+    """Alimenta o process_frame com os frames gravados (requer MediaPipe)"""
+    import cv2
+    
+    capture = cv2.VideoCapture(str(recording.path.with_suffix('.avi')))
+    for _ in range(recording.skipped_frames):
+        capture.grab()
+    latencies, timeline, last_states = [], [], {}
+    
+    start = time.perf_counter()
+    for t in recording.frame_timestamps:
+        ret, frame = capture.read()
+        if not ret:
+            break
+        
+        t0 = time.perf_counter()
+        _, hands = detector.process_frame(frame, now=float(t))
+        latencies.append(time.perf_counter() - t0)
+        
+        _track_transitions(hands, last_states, timeline, float(t))
+    
+    capture.release()
+    return ReplayReport(latencies, time.perf_counter() - start, timeline)
+
+
+def record(path, record_frames=False, seconds=30, camera_index=0):
+    """Grava gestos da câmera usando o GestureDetector"""
+    import cv2
+    from gesture_detector import GestureDetector
+    
+    detector = GestureDetector()
+    detector.recorder = GestureRecorder(path, record_frames)
+    camera = cv2.VideoCapture(camera_index)
+    
+    print(f"Gravando por {seconds}s... (Ctrl+C para parar)")
+    deadline = time.time() + seconds
+    try:
+        while time.time() < deadline:
+            ret, frame = camera.read()
+            if not ret:
+                break
+            detector.process_frame(frame)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        camera.release()
+        detector.release()
+        detector.recorder.save()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Gravação e replay de gestos")
+    sub = parser.add_subparsers(dest='command', required=True)
+    
+    rec = sub.add_parser('record')
+    rec.add_argument('path')
+    rec.add_argument('--frames', action='store_true')
+    rec.add_argument('--seconds', type=float, default=30)
+    rec.add_argument('--camera', type=int, default=0)
+    
+    rep = sub.add_parser('replay')
+    rep.add_argument('path')
+    rep.add_argument('--labels')
+    rep.add_argument('--tolerance', type=float, default=0.25)
+    rep.add_argument('--frames', action='store_true')
+    
+    args = parser.parse_args(argv)
+    
+    if args.command == 'record':
+        record(args.path, args.frames, args.seconds, args.camera)
+        return 0
+    
+    recording = Recording(args.path)
+    if args.frames:
+        from gesture_detector import GestureDetector
+        detector = GestureDetector()
+        report = replay_frames(recording, detector)
+        detector.release()
+    else:
+        report = replay_landmarks(recording)
+    
+    if args.labels:
+        with open(args.labels, 'r') as f:
+            report.match_labels(json.load(f), args.tolerance)
+    
+    report.print_summary()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,8 @@
+from enum import Enum
+
+
+class GestureState(Enum):
+    IDLE = "idle"
+    GRABBING = "grabbing"
+    HOLDING = "holding"
+    RELEASING = "releasing"
@@ -0,0 +1,85 @@
+import numpy as np
+
+# Índices dos landmarks do MediaPipe Hands
+WRIST = 0
+PALM_BASE = 9  # articulação MCP do dedo médio
+FINGERTIPS = np.array([4, 8, 12, 16, 20])
+
+# Cadeia de articulações por dedo (polegar, indicador, médio, anelar, mínimo)
+FINGER_JOINTS = np.array([
+    [1, 2, 3, 4],
+    [5, 6, 7, 8],
+    [9, 10, 11, 12],
+    [13, 14, 15, 16],
+    [17, 18, 19, 20],
+])
+
+NUM_LANDMARKS = 21
+
+
+def landmarks_to_array(hand_landmarks, out=None):
+    """Converte os 21 landmarks do MediaPipe em um array (21, 3)"""
+    if out is None:
+        out = np.empty((NUM_LANDMARKS, 3), dtype=np.float32)
+    for i, lm in enumerate(hand_landmarks.landmark):
+        out[i, 0] = lm.x
+        out[i, 1] = lm.y
+        out[i, 2] = lm.z
+    return out
+
+
+def stack_landmarks(hands_landmarks):
+    """Converte várias mãos de uma vez em um array (N, 21, 3)"""
+    out = np.empty((len(hands_landmarks), NUM_LANDMARKS, 3), dtype=np.float32)
+    for i, hand_landmarks in enumerate(hands_landmarks):
+        landmarks_to_array(hand_landmarks, out[i])
+    return out
+
+
+def _angle_between(a, b):
+    """Ângulo (rad) entre vetores no último eixo"""
+    dot = np.einsum('...i,...i->...', a, b)
+    norms = np.linalg.norm(a, axis=-1) * np.linalg.norm(b, axis=-1)
+    cos = dot / np.maximum(norms, 1e-9)
+    return np.arccos(np.clip(cos, -1.0, 1.0))
+
+
+class HandFeatures:
+    """
+    Features geométricas de uma ou mais mãos, calculadas em uma única
+    passada vetorizada sobre arrays (..., 21, 3).
+
+    As distâncias normalizadas são divididas pelo tamanho da palma
+    (punho -> base do dedo médio), tornando os limiares independentes
+    da distância da mão à câmera.
+    """
+    __slots__ = ('points', 'scale', 'tip_palm', 'tip_wrist',
+                 'tip_palm_norm', 'tip_wrist_norm', 'curl', 'extension')
+
+    def __init__(self, points):
+        self.points = points
+
+        wrist = points[..., WRIST, :]
+        palm = points[..., PALM_BASE, :]
+        tips = points[..., FINGERTIPS, :]
+
+        self.scale = np.maximum(np.linalg.norm(palm - wrist, axis=-1), 1e-6)
+
+        self.tip_palm = np.linalg.norm(tips - palm[..., None, :], axis=-1)
+        self.tip_wrist = np.linalg.norm(tips - wrist[..., None, :], axis=-1)
+        self.tip_palm_norm = self.tip_palm / self.scale[..., None]
+        self.tip_wrist_norm = self.tip_wrist / self.scale[..., None]
+
+        # Curvatura por dedo: soma dos ângulos de flexão nas articulações
+        joints = points[..., FINGER_JOINTS, :]
+        bones = np.diff(joints, axis=-2)
+        self.curl = (_angle_between(bones[..., 0, :], bones[..., 1, :]) +
+                     _angle_between(bones[..., 1, :], bones[..., 2, :]))
+
+        # Extensão média dos quatro dedos (sem o polegar)
+        self.extension = self.tip_palm_norm[..., 1:].mean(axis=-1)
+
+
+def extract_features(points):
+    """Calcula as features de uma mão (21, 3) ou de um lote (N, 21, 3)"""
+    return HandFeatures(np.asarray(points, dtype=np.float32))
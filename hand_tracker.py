@@ -0,0 +1,158 @@
+import time
+import numpy as np
+from landmark_filter import make_filter
+from gesture_state import GestureState
+
+
+class HandStateMachine:
+    """Máquina de estados IDLE -> GRABBING -> HOLDING -> RELEASING de uma mão"""
+    def __init__(self, hold_duration_threshold=0.5, release_window=1.0):
+        self.state = GestureState.IDLE
+        self.grab_start_time = None
+        self.release_start_time = None
+        self.hold_duration_threshold = hold_duration_threshold  # segundos
+        self.release_window = release_window  # tempo máximo abrindo a mão
+    
+    def update(self, is_closed, is_open, now=None):
+        """Avança a máquina com a classificação do frame atual"""
+        if now is None:
+            now = time.time()
+        
+        if self.state == GestureState.IDLE:
+            if is_closed:
+                self.state = GestureState.GRABBING
+                self.grab_start_time = now
+        
+        elif self.state == GestureState.GRABBING:
+            if not is_closed:
+                # Soltou muito rápido, volta ao idle
+                self.reset()
+            elif now - self.grab_start_time > self.hold_duration_threshold:
+                # Segurou tempo suficiente
+                self.state = GestureState.HOLDING
+        
+        elif self.state == GestureState.HOLDING:
+            if is_open:
+                self.state = GestureState.RELEASING
+                self.grab_start_time = None
+                self.release_start_time = None
+            elif not is_closed:
+                # Mão abrindo: tolera a faixa intermediária por um tempo,
+                # senão o gesto é cancelado
+                if self.release_start_time is None:
+                    self.release_start_time = now
+                elif now - self.release_start_time > self.release_window:
+                    self.reset()
+            else:
+                self.release_start_time = None
+        
+        elif self.state == GestureState.RELEASING:
+            # Reset após release
+            self.state = GestureState.IDLE
+        
+        return self.state
+    
+    def reset(self):
+        self.state = GestureState.IDLE
+        self.grab_start_time = None
+        self.release_start_time = None
+
+
+class TrackedHand:
+    """Mão rastreada entre frames, com ID estável e máquina própria"""
+    __slots__ = ('hand_id', 'handedness', 'centroid', 'last_seen', 'missed_frames',
+                 'machine', 'filter', 'closed_gate', 'open_gate', 'position', 'points')
+    
+    def __init__(self, hand_id, handedness, centroid, now, hold_duration_threshold,
+                 landmark_filter):
+        self.hand_id = hand_id
+        self.handedness = handedness
+        self.centroid = centroid
+        self.last_seen = now
+        self.missed_frames = 0
+        self.machine = HandStateMachine(hold_duration_threshold)
+        self.filter = landmark_filter
+        self.closed_gate = None  # Hysteresis criada pelo detector
+        self.open_gate = None
+        self.position = None
+        self.points = None
+    
+    @property
+    def state(self):
+        return self.machine.state
+
+
+class HandTracker:
+    """
+    Rastreador de centróides leve: associa as detecções de cada frame às
+    mãos já conhecidas pela menor distância, penalizando troca de lateralidade
+    (Left/Right do MediaPipe).
+    
+    Uma mão que some só é descartada depois de `lost_grace_frames` frames
+    e `lost_grace_ms` milissegundos sem detecção, para que falhas pontuais
+    do detector não reiniciem o gesto.
+    """
+    def __init__(self, max_distance=0.2, handedness_penalty=0.15,
+                 hold_duration_threshold=0.5, lost_grace_frames=5,
+                 lost_grace_ms=300, filter_name='one_euro'):
+        self.max_distance = max_distance  # em coordenadas normalizadas
+        self.handedness_penalty = handedness_penalty
+        self.hold_duration_threshold = hold_duration_threshold
+        self.lost_grace_frames = lost_grace_frames
+        self.lost_grace_ms = lost_grace_ms
+        self.filter_name = filter_name
+        self.tracks = {}
+        self._next_id = 1
+    
+    def update(self, centroids, handedness, now):
+        """
+        Associa detecções (centróides (N, 2) e lateralidades) às mãos
+        rastreadas. Retorna (lista de TrackedHand na ordem das detecções,
+        lista de mãos perdidas de vez neste frame).
+        """
+        track_list = list(self.tracks.values())
+        assigned = [None] * len(centroids)
+        
+        if track_list and len(centroids):
+            known = np.array([t.centroid for t in track_list], dtype=np.float32)
+            cost = np.linalg.norm(centroids[:, None, :] - known[None, :, :], axis=-1)
+            same_side = (np.array(handedness)[:, None] ==
+                         np.array([t.handedness for t in track_list])[None, :])
+            cost = cost + np.where(same_side, 0.0, self.handedness_penalty)
+            
+            # Associação gulosa pelos pares de menor custo
+            for flat in np.argsort(cost, axis=None):
+                det, trk = divmod(int(flat), len(track_list))
+                if cost[det, trk] > self.max_distance:
+                    break
+                if assigned[det] is not None or track_list[trk] is None:
+                    continue
+                assigned[det] = track_list[trk]
+                track_list[trk] = None
+        
+        matched = set()
+        for det, track in enumerate(assigned):
+            if track is None:
+                track = TrackedHand(self._next_id, handedness[det], centroids[det],
+                                    now, self.hold_duration_threshold,
+                                    make_filter(self.filter_name))
+                self.tracks[track.hand_id] = track
+                self._next_id += 1
+                assigned[det] = track
+            track.centroid = centroids[det]
+            track.handedness = handedness[det]
+            track.last_seen = now
+            track.missed_frames = 0
+            matched.add(track.hand_id)
+        
+        lost = []
+        for hand_id, track in list(self.tracks.items()):
+            if hand_id in matched:
+                continue
+            track.missed_frames += 1
+            if (track.missed_frames > self.lost_grace_frames and
+                    (now - track.last_seen) * 1000 > self.lost_grace_ms):
+                del self.tracks[hand_id]
+                lost.append(track)
+        
+        return assigned, lost
@@ -0,0 +1,178 @@
+"""
+Inferência do MediaPipe em um processo separado.
+
+Os frames vão por um anel de buffers em memória compartilhada
+(multiprocessing.shared_memory), alocado uma vez; pelo pipe só passam
+mensagens pequenas: (seq, slot, shape) de ida e (seq, landmarks,
+lateralidade) de volta. O processo da aplicação não disputa o GIL com a
+inferência, e o servidor HTTP e os envios não seguram a câmera.
+"""
+
+import multiprocessing
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+RING_SLOTS = 3
+RESPONSE_TIMEOUT = 1.0  # segundos até desistir de um frame (o worker segue vivo)
+START_TIMEOUT = 60      # import do MediaPipe + carga do modelo
+
+
+def _worker(conn, max_num_hands):
+    """
+    Processo filho: anexa o anel, converte para RGB no próprio slot e
+    infere. Só o frame mais recente da fila é processado; a resposta dele
+    libera também os slots dos frames pulados.
+    """
+    from gesture_detector import MediaPipeHands
+    
+    hands = MediaPipeHands(max_num_hands)
+    conn.send(('ready',))
+    ring, slot_size = None, 0
+    try:
+        while True:
+            latest = None
+            messages = [conn.recv()]
+            while conn.poll():
+                messages.append(conn.recv())
+            for message in messages:
+                if message is None:
+                    return
+                if message[0] == 'ring':
+                    if ring is not None:
+                        ring.close()
+                    _, name, slot_size = message
+                    ring = shared_memory.SharedMemory(name=name)
+                    latest = None  # frames anteriores são do anel antigo
+                else:
+                    latest = message
+            if latest is None:
+                continue
+            
+            _, seq, slot, shape = latest
+            frame = np.ndarray(shape, dtype=np.uint8, buffer=ring.buf, offset=slot * slot_size)
+            points, handedness = hands.detect(frame, in_place=True)
+            del frame  # o buffer não pode ter views vivas no close()
+            conn.send((seq, points, handedness))
+    except (EOFError, KeyboardInterrupt):
+        pass
+    finally:
+        hands.close()
+        if ring is not None:
+            ring.close()
+
+
+class ProcessHands:
+    """
+    Mesma interface do MediaPipeHands (detect/close), com a inferência em
+    um processo filho alimentado pelo anel de frames.
+    
+    Um slot fica ocupado do envio do frame até a resposta dele (ou de um
+    frame mais novo, já que o worker pula os antigos). Se a resposta
+    demora mais que `timeout`, o frame é dado como sem mãos e a resposta
+    atrasada é descartada pelo número de sequência; o slot só é reusado
+    depois dela. Sem slot livre, o frame é descartado em vez de
+    sobrescrever um que o worker ainda pode estar lendo.
+    """
+    def __init__(self, max_num_hands=2, slots=RING_SLOTS, timeout=RESPONSE_TIMEOUT):
+        self.slots = slots
+        self.timeout = timeout
+        self.ring = None
+        self.slot_size = 0
+        self.in_flight = {}  # slot -> seq do frame que o worker ainda pode ler
+        self.seq = 0
+        
+        # spawn em todas as plataformas: fork com as threads do servidor
+        # e do Zeroconf rodando não é seguro
+        context = multiprocessing.get_context('spawn')
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(target=_worker, args=(child_conn, max_num_hands),
+                                       name='inference', daemon=True)
+        self.process.start()
+        child_conn.close()
+        
+        if not self.conn.poll(START_TIMEOUT):
+            self.close()
+            raise RuntimeError("Processo de inferência não iniciou")
+        try:
+            self.conn.recv()
+        except EOFError:
+            self.close()
+            raise RuntimeError("Processo de inferência encerrou ao carregar o MediaPipe")
+    
+    def _ensure_ring(self, nbytes):
+        """Aloca (ou aumenta) o anel na primeira vez que vê um frame deste tamanho"""
+        if self.ring is not None and nbytes <= self.slot_size:
+            return
+        old = self.ring
+        self.slot_size = nbytes
+        self.ring = shared_memory.SharedMemory(create=True, size=nbytes * self.slots)
+        self.conn.send(('ring', self.ring.name, self.slot_size))
+        self.in_flight.clear()  # o worker descarta os frames do anel antigo
+        if old is not None:
+            old.close()
+            old.unlink()
+    
+    def detect(self, frame, in_place=False):
+        """Landmarks do frame BGR (o frame não é alterado: o worker converte a cópia)"""
+        try:
+            self._ensure_ring(frame.nbytes)
+            self._collect(0)
+            slot = self._free_slot()
+            if slot is None:
+                # Worker atrasado: espera um slot liberar ou descarta o frame
+                self._collect(self.timeout)
+                slot = self._free_slot()
+            if slot is not None:
+                view = np.ndarray(frame.shape, dtype=np.uint8, buffer=self.ring.buf,
+                                  offset=slot * self.slot_size)
+                np.copyto(view, frame)
+                del view
+                
+                self.seq += 1
+                self.in_flight[slot] = self.seq
+                self.conn.send(('frame', self.seq, slot, frame.shape))
+                # Espera fora do GIL; respostas de frames abandonados são descartadas
+                result = self._collect(self.timeout, wanted=self.seq)
+                if result is not None:
+                    return result
+        except (EOFError, OSError):
+            raise RuntimeError("Processo de inferência encerrou")
+        if not self.process.is_alive():
+            raise RuntimeError("Processo de inferência encerrou")
+        return np.empty((0, 21, 3), dtype=np.float32), []
+    
+    def _free_slot(self):
+        return next((slot for slot in range(self.slots) if slot not in self.in_flight), None)
+    
+    def _collect(self, timeout, wanted=None):
+        """
+        Lê as respostas que chegarem em até `timeout` s, liberando os slots
+        respondidos; retorna (landmarks, lateralidade) ao receber `wanted`.
+        Sem `wanted`, volta assim que houver alguma resposta.
+        """
+        deadline = time.monotonic() + timeout
+        while self.conn.poll(max(0.0, deadline - time.monotonic())):
+            seq, points, handedness = self.conn.recv()
+            # O worker não volta a ler frames anteriores ao respondido
+            self.in_flight = {slot: s for slot, s in self.in_flight.items() if s > seq}
+            if seq == wanted:
+                return points, handedness
+            if wanted is None:
+                deadline = 0
+        return None
+    
+    def close(self):
+        try:
+            self.conn.send(None)
+        except OSError:
+            pass
+        self.process.join(timeout=2)
+        if self.process.is_alive():
+            self.process.terminate()
+        self.conn.close()
+        if self.ring is not None:
+            self.ring.close()
+            self.ring.unlink()
+            self.ring = None
@@ -0,0 +1,79 @@
+import cv2
+
+
+class InferenceScheduler:
+    """
+    Decide, frame a frame, se a inferência do MediaPipe deve rodar e em
+    qual escala.
+
+    - Modo ocioso (estado IDLE e nenhuma mão recente): inferência em taxa
+      reduzida sobre um frame reduzido, e só quando há movimento na cena.
+    - Modo ativo (mão visível ou estado fora de IDLE): todo frame, em
+      resolução total.
+    """
+    def __init__(self, idle_fps=5, idle_scale=0.5, motion_threshold=4.0,
+                 active_hold=1.5, refresh_interval=2.0, thumb_size=(64, 48)):
+        self.idle_interval = 1.0 / idle_fps if idle_fps > 0 else 0.0
+        self.idle_scale = idle_scale
+        self.motion_threshold = motion_threshold
+        self.active_hold = active_hold          # segundos ativo após perder a mão
+        self.refresh_interval = refresh_interval  # força inferência em cena estática
+        self.thumb_size = thumb_size
+
+        self.last_run = 0.0
+        self.last_hand_time = None
+        self.reference_thumb = None
+
+        self.frames_seen = 0
+        self.frames_inferred = 0
+
+    def is_active(self, idle, now):
+        """Ativo se fora de IDLE ou se uma mão foi vista há pouco"""
+        if not idle:
+            return True
+        return (self.last_hand_time is not None and
+                now - self.last_hand_time < self.active_hold)
+
+    def plan(self, frame, idle, now):
+        """
+        Retorna a escala em que o frame deve ser processado (1.0 = total),
+        ou None se a inferência deve ser pulada neste frame.
+        """
+        self.frames_seen += 1
+
+        if self.is_active(idle, now):
+            self.reference_thumb = None
+            return self._run(now, 1.0)
+
+        if now - self.last_run < self.idle_interval:
+            return None
+
+        # Gate de movimento barato sobre uma miniatura em tons de cinza
+        thumb = cv2.cvtColor(
+            cv2.resize(frame, self.thumb_size, interpolation=cv2.INTER_NEAREST),
+            cv2.COLOR_BGR2GRAY
+        )
+        reference, self.reference_thumb = self.reference_thumb, thumb
+
+        if (reference is not None and
+                now - self.last_run < self.refresh_interval and
+                cv2.absdiff(thumb, reference).mean() < self.motion_threshold):
+            return None
+
+        return self._run(now, self.idle_scale)
+
+    def _run(self, now, scale):
+        self.last_run = now
+        self.frames_inferred += 1
+        return scale
+
+    def observe(self, hand_found, now):
+        """Informa o resultado da inferência para ajustar o modo"""
+        if hand_found:
+            self.last_hand_time = now
+
+    def inference_ratio(self):
+        """Fração dos frames que passaram pela inferência"""
+        if not self.frames_seen:
+            return 0.0
+        return self.frames_inferred / self.frames_seen
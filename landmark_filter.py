@@ -0,0 +1,97 @@
+import math
+import numpy as np
+
+
+class OneEuroFilter:
+    """
+    Filtro One-Euro vetorizado sobre arrays de landmarks (ex.: (21, 3)).
+    Suaviza bastante com a mão parada e pouco com a mão em movimento,
+    mantendo a latência baixa.
+    """
+    def __init__(self, min_cutoff=1.0, beta=0.05, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+    
+    def reset(self):
+        self.x_prev = None
+        self.dx_prev = None
+        self.t_prev = None
+    
+    @staticmethod
+    def _alpha(dt, cutoff):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+    
+    def __call__(self, x, t):
+        if self.x_prev is None:
+            self.x_prev = np.array(x, dtype=np.float32)
+            self.dx_prev = np.zeros_like(self.x_prev)
+            self.t_prev = t
+            return self.x_prev.copy()
+        
+        dt = max(t - self.t_prev, 1e-6)
+        
+        a_d = self._alpha(dt, self.d_cutoff)
+        dx = (x - self.x_prev) / dt
+        dx_hat = a_d * dx + (1 - a_d) * self.dx_prev
+        
+        # Frequência de corte cresce com a velocidade
+        cutoff = self.min_cutoff + self.beta * np.abs(dx_hat)
+        tau = 1.0 / (2 * math.pi * cutoff)
+        a = 1.0 / (1.0 + tau / dt)
+        x_hat = a * x + (1 - a) * self.x_prev
+        
+        self.x_prev = x_hat.astype(np.float32, copy=False)
+        self.dx_prev = dx_hat
+        self.t_prev = t
+        return self.x_prev.copy()
+
+
+class NullFilter:
+    """Não filtra (landmarks crus do MediaPipe)"""
+    def reset(self):
+        pass
+    
+    def __call__(self, x, t):
+        return x
+
+
+FILTERS = {
+    'one_euro': OneEuroFilter,
+    'none': NullFilter,
+}
+
+
+def make_filter(name='one_euro', **kwargs):
+    """Cria um filtro pelo nome registrado em FILTERS"""
+    try:
+        return FILTERS[name](**kwargs)
+    except KeyError:
+        raise ValueError(f"Filtro de landmarks desconhecido: {name}")
+
+
+class Hysteresis:
+    """
+    Limiar com histerese: liga ao cruzar `on` e só desliga ao cruzar `off`.
+    Se on < off, liga quando o valor cai abaixo de `on` (ex.: mão fechada);
+    se on > off, liga quando o valor sobe acima de `on` (ex.: mão aberta).
+    """
+    def __init__(self, on, off):
+        self.on = on
+        self.off = off
+        self.active = False
+    
+    def update(self, value):
+        if self.on < self.off:
+            if self.active:
+                self.active = value < self.off
+            else:
+                self.active = value < self.on
+        else:
+            if self.active:
+                self.active = value > self.off
+            else:
+                self.active = value > self.on
+        return self.active
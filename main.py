@@ -1,36 +1,157 @@
-import cv2
-import time
+import sys
 import threading
-from gesture_detector import GestureDetector, GestureState
-from clipboard_manager import ClipboardManager
+import time
+from concurrent.futures import ThreadPoolExecutor
+from gesture_state import GestureState
 from device_discovery import DeviceDiscovery
 from file_transfer_server import FileTransferServer
-from file_transfer_client import FileTransferClient
+from transfer_queue import PRIORITY_SMALL, PRIORITY_BULK
+from transfer_scheduler import TransferScheduler
+import metrics
 import json
 from pathlib import Path
 
+GESTURES = metrics.counter(
+    'aiteleport_gesture_transitions_total', 'Mudanças de estado do gesto', ['from', 'to'])
+DELIVERY_SECONDS = metrics.histogram(
+    'aiteleport_release_to_delivery_seconds', 'Da mão aberta até o envio confirmado pelo receptor')
+
+# Opções aplicadas sem reiniciar quando o config.json muda
+LIVE_CONFIG_KEYS = ('rate_limit_mbps', 'peer_rate_limit_mbps', 'peer_rate_limits',
+                    'transfer_compression', 'broadcast_fanout')
+
 class AITeleportation:
-    def __init__(self, config_path='config.json'):
+    """
+    Aplicação completa (câmera, gestos e envio) ou, com receive_only,
+    só o receptor: servidor HTTP e anúncio na rede, sem importar OpenCV,
+    MediaPipe ou o cliente HTTP.
+    """
+    def __init__(self, config_path='config.json', receive_only=None):
+        self.config_path = Path(config_path)
         self.config = self.load_config(config_path)
+        if receive_only is not None:
+            self.config['receive_only'] = receive_only
+        self.receive_only = self.config['receive_only']
+        
+        # Banda compartilhada por envios e recepções (limites e prioridades)
+        self.scheduler = TransferScheduler(
+            rate_mbps=self.config['rate_limit_mbps'],
+            peer_rate_mbps=self.config['peer_rate_limit_mbps'],
+            peer_limits=self.config['peer_rate_limits'],
+            small_file_size=self.config['transfer_small_file_kb'] * 1024
+        )
+        self.config_watcher = None
         
         # Componentes
-        self.gesture_detector = GestureDetector()
-        self.clipboard_manager = ClipboardManager()
+        self.file_server = FileTransferServer(
+            port=self.config['port'],
+            upload_dir=self.config['upload_dir'],
+            backend=self.config['server_backend'],
+            workers=self.config['server_workers'],
+            read_timeout=self.config['server_read_timeout'],
+            pending_ttl=self.config['pending_ttl'],
+            scheduler=self.scheduler,
+            # Repasse em cadeia só para dispositivos descobertos
+            relay_peers=lambda: self.device_discovery.get_devices()
+        )
+        
+        # Envio: só no modo completo (o receptor não precisa do cliente HTTP)
+        self.file_client = None
+        self.clipboard_manager = None
+        self.transfers = None
+        self.speculation = None
+        if not self.receive_only:
+            self._create_sender()
+        
         self.device_discovery = DeviceDiscovery(
             device_name=self.config['device_name'],
-            port=self.config['port']
-        )
-        self.file_server = FileTransferServer(
             port=self.config['port'],
-            upload_dir=self.config['upload_dir']
+            directions=self.config['device_directions'],
+            regions=self.config['device_regions'],
+            edge_margin=self.config['device_edge_margin'],
+            groups=self.config['device_groups'],
+            client=self.file_client,
+            probe_interval=self.config['peer_probe_interval'],
+            max_probe_failures=self.config['peer_probe_failures']
         )
-        self.file_client = FileTransferClient()
+        
+        self.metrics_logger = None
+        if self.config['metrics_log_interval']:
+            # Snapshot periódico das métricas (também expostas em /metrics)
+            self.metrics_logger = metrics.MetricsLogger(
+                interval=self.config['metrics_log_interval'],
+                path=self.config['metrics_log']
+            )
+        
+        # Visão (OpenCV + MediaPipe): carregada em start(), em paralelo com
+        # o servidor e a câmera
+        self.gesture_detector = None
         
         # Estado
-        self.grabbed_file = None
+        # hand_id -> Future da captura daquela mão: (arquivo, envio antecipado)
+        self.grabs = {}
         self.running = False
+        self.stopped = threading.Event()
         self.camera = None
+        self.pipeline = None
+    
+    def _create_sender(self):
+        """Cliente, clipboard e filas de envio (importados só aqui, não no receptor)"""
+        from clipboard_manager import ClipboardManager
+        from file_transfer_client import FileTransferClient
+        from speculative_transfer import SpeculativeTransfer
+        from transfer_queue import TransferQueue
         
+        self.file_client = FileTransferClient(compression=self.config['transfer_compression'],
+                                              scheduler=self.scheduler)
+        self.clipboard_manager = ClipboardManager(
+            image_format=self.config['clipboard_image_format'],
+            png_level=self.config['clipboard_png_level']
+        )
+        self.transfers = TransferQueue(
+            self.transfer_file,
+            workers=self.config['transfer_workers'],
+            max_pending=self.config['transfer_queue_size'],
+            small_file_size=self.config['transfer_small_file_kb'] * 1024,
+            interactive_workers=self.config['transfer_interactive_workers']
+        )
+        if self.config['speculative_transfer']:
+            # Envia antes de a mão abrir; ao soltar só confirma o destino
+            self.speculation = SpeculativeTransfer(
+                self.file_client,
+                max_size=self.config['speculative_max_mb'] * 1024 * 1024,
+                peers=self.config['speculative_peers']
+            )
+    
+    def _create_gesture_detector(self):
+        """Importa e carrega o modelo do MediaPipe (a parte mais lenta do início)"""
+        from gesture_detector import GestureDetector
+        from gesture_replay import GestureRecorder
+        from inference_scheduler import InferenceScheduler
+        
+        hands = None
+        if self.config['inference_process']:
+            # MediaPipe em outro processo: não disputa o GIL com servidor e envios
+            from inference_process import ProcessHands
+            hands = ProcessHands(max_num_hands=self.config['max_hands'])
+        
+        gesture_detector = GestureDetector(
+            max_num_hands=self.config['max_hands'],
+            filter_name=self.config['landmark_filter'],
+            lost_grace_frames=self.config['hand_lost_grace_frames'],
+            lost_grace_ms=self.config['hand_lost_grace_ms'],
+            scheduler=InferenceScheduler(
+                idle_fps=self.config['idle_inference_fps'],
+                idle_scale=self.config['idle_inference_scale'],
+                motion_threshold=self.config['motion_threshold']
+            ),
+            hands=hands
+        )
+        if self.config['record_gestures']:
+            # Grava os landmarks para replay offline (gesture_replay.py)
+            gesture_detector.recorder = GestureRecorder(self.config['record_gestures'])
+        return gesture_detector
+    
     def load_config(self, config_path):
         """Carrega configuração ou cria padrão"""
         default_config = {
@@ -38,7 +159,46 @@ class AITeleportation:
             'port': 5000,
             'upload_dir': 'received_files',
             'camera_index': 0,
-            'show_preview': True
+            'show_preview': True,
+            'pipeline_queue_size': 2,
+            'pipeline_report_interval': 10,
+            'idle_inference_fps': 5,
+            'idle_inference_scale': 0.5,
+            'motion_threshold': 4.0,
+            'max_hands': 2,
+            'inference_process': False,
+            'landmark_filter': 'one_euro',
+            'hand_lost_grace_frames': 5,
+            'hand_lost_grace_ms': 300,
+            'record_gestures': None,
+            'server_backend': 'pooled',
+            'server_workers': 16,
+            'server_read_timeout': 30,
+            'transfer_workers': 2,
+            'transfer_queue_size': 32,
+            'transfer_small_file_kb': 256,
+            'transfer_compression': True,
+            'transfer_interactive_workers': 1,
+            'rate_limit_mbps': None,
+            'peer_rate_limit_mbps': None,
+            'peer_rate_limits': {},
+            'config_reload_interval': 2.0,
+            'device_directions': {},
+            'device_regions': {},
+            'device_edge_margin': 0.3,
+            'device_groups': {},
+            'broadcast_fanout': 1,
+            'peer_probe_interval': 2.0,
+            'peer_probe_failures': 2,
+            'speculative_transfer': True,
+            'speculative_max_mb': 8,
+            'speculative_peers': 2,
+            'pending_ttl': 120,
+            'clipboard_image_format': 'png',
+            'clipboard_png_level': 1,
+            'metrics_log_interval': 60,
+            'metrics_log': None,
+            'receive_only': False
         }
         
         config_file = Path(config_path)
@@ -57,20 +217,54 @@ class AITeleportation:
         """Inicia o sistema"""
         print("=== AI Teleportation Iniciando ===")
         
+        vision = None
+        if not self.receive_only:
+            # OpenCV/MediaPipe carregam enquanto o servidor e a rede sobem
+            loader = ThreadPoolExecutor(max_workers=1, thread_name_prefix='vision-load')
+            vision = loader.submit(self._create_gesture_detector)
+            loader.shutdown(wait=False)
+        
         # Inicia servidor HTTP
         self.file_server.start()
-        time.sleep(1)  # Aguarda servidor iniciar
+        if not self.file_server.wait_ready():
+            print("ERRO: Servidor HTTP não iniciou")
+            return
         
-        # Registra serviço na rede
-        self.device_discovery.register_service()
+        # Registra serviço na rede (a verificação do nome segue em segundo plano)
+        self.device_discovery.port = self.file_server.port
+        self.device_discovery.register_service(wait=False)
         
-        # Inicia descoberta de dispositivos
+        if self.metrics_logger:
+            self.metrics_logger.start()
+        
+        if self.config['config_reload_interval']:
+            self.config_watcher = threading.Thread(target=self._watch_config,
+                                                   name='config-watch', daemon=True)
+            self.config_watcher.start()
+        
+        # Inicia descoberta de dispositivos (também no modo somente recepção:
+        # o repasse em cadeia só vai para dispositivos descobertos)
         self.device_discovery.start_discovery()
         
+        if self.receive_only:
+            self.running = True
+            print("Sistema iniciado (somente recepção)")
+            print(f"Dispositivo: {self.config['device_name']}")
+            self.serve_forever()
+            return
+        
         # Inicia câmera
+        import cv2
         self.camera = cv2.VideoCapture(self.config['camera_index'])
         if not self.camera.isOpened():
             print("ERRO: Não foi possível abrir a câmera")
+            self.stop()
+            return
+        try:
+            self.gesture_detector = vision.result()
+        except Exception as e:
+            print(f"ERRO: Não foi possível carregar a detecção de gestos: {e}")
+            self.stop()
             return
         
         self.running = True
@@ -80,68 +274,149 @@ class AITeleportation:
         
         self.main_loop()
     
+    def _watch_config(self):
+        """Relê o config.json quando ele muda e aplica LIVE_CONFIG_KEYS"""
+        interval = self.config['config_reload_interval']
+        mtime = self._config_mtime()
+        while not self.stopped.wait(interval):
+            current = self._config_mtime()
+            if current == mtime:
+                continue
+            mtime = current
+            try:
+                with open(self.config_path, 'r') as f:
+                    config = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"⚠️  config.json inválido, mantendo a configuração atual: {e}")
+                continue
+            self.apply_config(config)
+    
+    def _config_mtime(self):
+        try:
+            return self.config_path.stat().st_mtime_ns
+        except OSError:
+            return None
+    
+    def apply_config(self, config):
+        """Aplica as opções que mudam em execução (as demais exigem reiniciar)"""
+        changed = [key for key in LIVE_CONFIG_KEYS
+                   if key in config and config[key] != self.config[key]]
+        if not changed:
+            return
+        for key in changed:
+            self.config[key] = config[key]
+        self.scheduler.configure(
+            rate_mbps=self.config['rate_limit_mbps'],
+            peer_rate_mbps=self.config['peer_rate_limit_mbps'],
+            peer_limits=self.config['peer_rate_limits']
+        )
+        if self.file_client:
+            self.file_client.compression = self.config['transfer_compression']
+        print(f"🔄 Configuração atualizada: {', '.join(changed)}")
+    
+    def serve_forever(self):
+        """Modo somente recepção: atende até stop() (ou Ctrl+C)"""
+        try:
+            # Espera com timeout para o Ctrl+C ser atendido também no Windows
+            while not self.stopped.wait(0.5):
+                pass
+        except KeyboardInterrupt:
+            print("\nEncerrando...")
+        finally:
+            self.stop()
+    
     def main_loop(self):
-        """Loop principal de processamento"""
-        last_state = GestureState.IDLE
+        """Loop principal: consome o pipeline, trata eventos e renderiza"""
+        import cv2
+        from frame_pipeline import FramePipeline
+        
+        self.pipeline = FramePipeline(
+            self.camera,
+            self.gesture_detector.process_frame,
+            result_queue_size=self.config['pipeline_queue_size']
+        )
+        self.pipeline.start()
+        report_interval = self.config['pipeline_report_interval']
+        last_report = time.time()
         
         try:
             while self.running:
-                ret, frame = self.camera.read()
-                if not ret:
-                    print("Erro ao ler frame da câmera")
+                # Mudanças de estado chegam em ordem, mesmo se frames forem descartados
+                for event in self.pipeline.drain_events():
+                    self.handle_state_change(*event)
+                
+                if not self.pipeline.is_alive():
+                    if self.pipeline.error:
+                        print(self.pipeline.error)
                     break
                 
-                # Processa frame e detecta gesto
-                annotated_frame, current_state, hand_position = \
-                    self.gesture_detector.process_frame(frame)
+                packet = self.pipeline.get_result(timeout=0.05)
+                if packet is None:
+                    continue
                 
-                # Transições de estado
-                if current_state != last_state:
-                    self.handle_state_change(last_state, current_state, hand_position, frame.shape)
-                    last_state = current_state
+                render_start = time.perf_counter()
                 
                 # Exibe preview se configurado
                 if self.config['show_preview']:
+                    annotated_frame = packet.annotated
+                    
                     # Adiciona informações na tela
                     devices = self.device_discovery.get_devices()
                     info_text = f"Dispositivos: {len(devices)}"
                     cv2.putText(annotated_frame, info_text, (10, 60),
                               cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 0), 2)
                     
-                    if self.grabbed_file:
-                        file_text = f"Arquivo: {Path(self.grabbed_file).name}"
-                        cv2.putText(annotated_frame, file_text, (10, 90),
+                    for i, (hand_id, grab) in enumerate(list(self.grabs.items())):
+                        grabbed_file = grab.result()[0] if grab.done() else None
+                        if grab.done() and not grabbed_file:
+                            continue
+                        name = self._describe(grabbed_file) if grabbed_file else "capturando..."
+                        file_text = f"#{hand_id} Arquivo: {name}"
+                        cv2.putText(annotated_frame, file_text, (10, 90 + 25 * i),
                                   cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 255), 2)
                     
+                    age_ms = (render_start - packet.captured_at) * 1000
+                    cv2.putText(annotated_frame, f"Latencia: {age_ms:.0f}ms",
+                              (10, annotated_frame.shape[0] - 15),
+                              cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200, 200, 200), 1)
+                    
                     cv2.imshow('AI Teleportation', annotated_frame)
                     
                     # ESC para sair
                     if cv2.waitKey(1) & 0xFF == 27:
                         break
                 
+                self.pipeline.record_render(packet, time.perf_counter() - render_start)
+                
+                if report_interval and time.time() - last_report >= report_interval:
+                    print(self.pipeline.report())
+                    last_report = time.time()
+        
         except KeyboardInterrupt:
             print("\nEncerrando...")
         finally:
             self.stop()
     
-    def handle_state_change(self, old_state, new_state, hand_position, frame_shape):
-        """Processa mudanças de estado do gesto"""
+    def handle_state_change(self, hand_id, old_state, new_state, hand_position, frame_shape):
+        """Processa mudanças de estado do gesto de uma mão"""
+        GESTURES.labels(old_state.value, new_state.value).inc()
         
         if new_state == GestureState.GRABBING:
-            print("🖐️  Detectando gesto de agarrar...")
+            print(f"🖐️  [#{hand_id}] Detectando gesto de agarrar...")
         
         elif new_state == GestureState.HOLDING:
-            # Captura conteúdo do clipboard
-            file_type, filepath = self.clipboard_manager.capture_clipboard()
-            
-            if filepath:
-                self.grabbed_file = filepath
-                print(f"✅ Arquivo capturado: {Path(filepath).name} ({file_type})")
-            else:
-                print("⚠️  Nenhum conteúdo no clipboard")
+            # Captura e codificação em segundo plano: não travam a câmera
+            self.grabs[hand_id] = self.clipboard_manager.capture_async(
+                lambda file_type, filepath: self._on_captured(hand_id, file_type, filepath))
         
         elif new_state == GestureState.RELEASING:
-            if self.grabbed_file and hand_position:
+            grab = self.grabs.pop(hand_id, None)
+            if grab is None:
+                return
+            
+            released_at = time.perf_counter()
+            target_device = None
+            if hand_position:
                 # Encontra dispositivo alvo
                 h, w, _ = frame_shape
                 x, y = hand_position
@@ -149,56 +424,180 @@ class AITeleportation:
                 target_device = self.device_discovery.find_device_by_position(
                     x, y, w, h
                 )
-                
-                if target_device:
-                    print(f"📤 Enviando para {target_device['name']}...")
-                    
-                    # Envia arquivo em thread separada
-                    transfer_thread = threading.Thread(
-                        target=self.transfer_file,
-                        args=(self.grabbed_file, target_device),
-                        daemon=True
-                    )
-                    transfer_thread.start()
-                else:
-                    devices = self.device_discovery.get_devices()
-                    if not devices:
-                        print("⚠️  Nenhum dispositivo disponível")
-                    else:
-                        print(f"⚠️  Mova a mão para a borda da tela")
             
-            # Reset
-            self.grabbed_file = None
+            # Se a captura ainda não terminou, o envio começa quando terminar
+            grab.add_done_callback(
+                lambda f: self._release(hand_id, f.result(), hand_position, target_device,
+                                        released_at))
+        
+        elif new_state == GestureState.IDLE:
+            # Mão perdida ou gesto cancelado
+            grab = self.grabs.pop(hand_id, None)
+            if grab is not None:
+                grab.add_done_callback(lambda f: self._drop_grab(*f.result()))
     
-    def transfer_file(self, filepath, target_device):
-        """Transfere arquivo para dispositivo alvo"""
-        success, message = self.file_client.send_file(
-            filepath,
-            target_device['ip'],
-            target_device['port']
-        )
+    def _on_captured(self, hand_id, file_type, filepath):
+        """No worker do clipboard: conteúdo capturado, começa o envio antecipado"""
+        if not filepath:
+            print("⚠️  Nenhum conteúdo no clipboard")
+            return None, None
+        
+        print(f"✅ [#{hand_id}] Arquivo capturado: {self._describe(filepath)} ({file_type})")
+        if file_type != 'bundle':
+            # Até o fim dos envios o cache do clipboard não apaga o arquivo
+            self.clipboard_manager.acquire(filepath)
+        prepared = None
+        # Pacotes (pastas/vários arquivos) vão em um único envio ao soltar
+        if self.speculation and file_type != 'bundle':
+            prepared = self.speculation.prepare(filepath, self.device_discovery.get_devices())
+        return filepath, prepared
+    
+    def _release(self, hand_id, grabbed, hand_position, target_device, released_at):
+        """Mão aberta e captura pronta: enfileira o envio para o alvo"""
+        grabbed_file, prepared = grabbed
+        if not grabbed_file:
+            return
+        
+        queued = False
+        if target_device:
+            print(f"📤 [#{hand_id}] Enviando para {target_device['name']}...")
+            
+            # Fila de envios: textos/arquivos pequenos (e confirmações
+            # de envios antecipados) passam na frente
+            priority = None
+            if prepared and prepared.staged_for(target_device):
+                priority = PRIORITY_SMALL
+            elif isinstance(grabbed_file, list) or target_device.get('members'):
+                priority = PRIORITY_BULK
+            future = self.transfers.submit(grabbed_file, target_device, prepared,
+                                           priority=priority)
+            queued = future is not None
+            if queued:
+                future.add_done_callback(lambda f: self._delivered(f, released_at))
+                future.add_done_callback(lambda f: self._release_file(grabbed_file, prepared))
+            else:
+                print(f"❌ [#{hand_id}] Fila de envios cheia, tente novamente")
+        elif hand_position:
+            devices = self.device_discovery.get_devices()
+            if not devices:
+                print("⚠️  Nenhum dispositivo disponível")
+            else:
+                print(f"⚠️  Mova a mão para a borda da tela")
+        
+        if not queued:
+            # Nada enviado: descarta os envios antecipados
+            self._drop_grab(grabbed_file, prepared)
+    
+    @staticmethod
+    def _delivered(future, released_at):
+        if not future.cancelled() and future.exception() is None and future.result()[0]:
+            DELIVERY_SECONDS.observe(time.perf_counter() - released_at)
+    
+    @staticmethod
+    def _describe(grabbed_file):
+        if isinstance(grabbed_file, list):
+            from bundle import describe
+            return describe(grabbed_file)
+        return Path(grabbed_file).name
+    
+    def _cancel_prepared(self, prepared):
+        if prepared is not None:
+            self.speculation.cancel(prepared)
+    
+    def _drop_grab(self, grabbed_file, prepared):
+        """Gesto sem envio: descarta os antecipados e libera o arquivo"""
+        self._cancel_prepared(prepared)
+        self._release_file(grabbed_file, prepared)
+    
+    def _release_file(self, grabbed_file, prepared):
+        """Devolve o arquivo capturado ao cache quando nenhum envio o lê mais"""
+        if not grabbed_file or isinstance(grabbed_file, list):
+            return
+        release = lambda: self.clipboard_manager.release(grabbed_file)
+        if prepared is None:
+            release()
+        else:
+            prepared.when_done(release)
+    
+    def transfer_file(self, filepath, target_device, prepared=None):
+        """Transfere arquivo para dispositivo (ou grupo) alvo"""
+        if target_device.get('members'):
+            return self._broadcast(filepath, target_device, prepared)
+        if prepared is not None:
+            success, message = self.speculation.commit(prepared, target_device)
+        elif isinstance(filepath, list):
+            # Pastas ou vários arquivos: um único envio em streaming
+            success, message = self.file_client.send_bundle(
+                filepath,
+                target_device['ip'],
+                target_device['port']
+            )
+        else:
+            success, message = self.file_client.send_file(
+                filepath,
+                target_device['ip'],
+                target_device['port']
+            )
         
         if success:
             print(f"✨ {message}")
         else:
             print(f"❌ {message}")
+        return success, message
+    
+    def _broadcast(self, filepath, group, prepared):
+        """Envio para todos os membros vivos do grupo, com o tempo de cada um"""
+        # Envios antecipados são por dispositivo; o grupo usa retransmissão
+        self._cancel_prepared(prepared)
+        success, message, results = self.file_client.send_broadcast(
+            filepath,
+            group['members'],
+            fanout=self.config['broadcast_fanout']
+        )
+        
+        print(f"{'✨' if success else '❌'} [{group['name']}] {message}")
+        for result in results:
+            if result['success']:
+                print(f"   ✅ {result['name']}: {result['seconds']:.2f}s")
+            else:
+                print(f"   ❌ {result['name']}: {result['message']}")
+        return success, message
     
     def stop(self):
         """Encerra o sistema"""
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
         self.running = False
         
+        if self.pipeline:
+            self.pipeline.stop()
+        
         if self.camera:
+            import cv2
             self.camera.release()
+            cv2.destroyAllWindows()
         
-        cv2.destroyAllWindows()
-        
-        self.gesture_detector.release()
+        if self.gesture_detector:
+            self.gesture_detector.release()
+            if self.gesture_detector.recorder:
+                self.gesture_detector.recorder.save()
+        if not self.receive_only:
+            self.clipboard_manager.stop()
+            self.transfers.stop()
+            self.file_client.close()
+        if self.speculation:
+            self.speculation.stop()
         self.device_discovery.close()
+        self.file_server.stop()
+        if self.metrics_logger:
+            self.metrics_logger.stop()
         
         print("Sistema encerrado")
 
 def main():
-    app = AITeleportation()
+    # --receive-only: só recebe arquivos (sem câmera), sobrepõe o config.json
+    app = AITeleportation(receive_only=True if '--receive-only' in sys.argv[1:] else None)
     app.start()
 
 if __name__ == '__main__':
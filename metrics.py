@@ -0,0 +1,312 @@
+"""
+Métricas internas (contadores, gauges e histogramas) sem dependências.
+
+Os módulos declaram suas métricas no import; o registro global é
+exposto no formato de texto do Prometheus (rota /metrics do servidor) e
+pode ser despejado periodicamente como JSON (MetricsLogger), para
+instalações sem câmera/console.
+
+Uso:
+    SENT = metrics.counter('aiteleport_bytes_sent_total', 'Bytes enviados', ['peer'])
+    SENT.labels('10.0.0.2:5000').inc(1024)
+"""
+
+import bisect
+import json
+import math
+import threading
+import time
+
+# Limites dos histogramas de latência (segundos)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class _Value:
+    """Série de um contador/gauge (uma combinação de labels)"""
+    __slots__ = ('value', 'lock')
+    
+    def __init__(self):
+        self.value = 0.0
+        self.lock = threading.Lock()
+    
+    def inc(self, amount=1):
+        with self.lock:
+            self.value += amount
+    
+    def dec(self, amount=1):
+        with self.lock:
+            self.value -= amount
+    
+    def set(self, value):
+        self.value = value
+
+
+class _HistogramValue:
+    """Série de um histograma: contagem por faixa, soma e total"""
+    __slots__ = ('buckets', 'counts', 'sum', 'count', 'lock')
+    
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.lock = threading.Lock()
+    
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            self.counts[index] += 1
+            self.sum += value
+            self.count += 1
+    
+    def time(self):
+        """Context manager que observa a duração do bloco"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ('target', 'start')
+    
+    def __init__(self, target):
+        self.target = target
+    
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+    
+    def __exit__(self, *exc):
+        self.target.observe(time.perf_counter() - self.start)
+
+
+class Metric:
+    """Métrica com labels opcionais; sem labels, a própria métrica é a série"""
+    kind = None
+    
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._series = {}
+        self._lock = threading.Lock()
+        self._function = None
+        if not self.labelnames:
+            self._default = self.labels()
+    
+    def _new_value(self):
+        return _Value()
+    
+    def labels(self, *values):
+        """Série para os valores de label (criada no primeiro uso)"""
+        series = self._series.get(values)
+        if series is None:
+            values = tuple(str(value) for value in values)
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name}: esperados labels {self.labelnames}")
+            with self._lock:
+                series = self._series.get(values)
+                if series is None:
+                    series = self._series[values] = self._new_value()
+        return series
+    
+    def remove(self, *values):
+        with self._lock:
+            self._series.pop(tuple(str(value) for value in values), None)
+    
+    def set_function(self, function):
+        """Valor lido só na coleta (ex.: tamanho de uma fila): sem custo no caminho quente"""
+        self._function = function
+    
+    def samples(self):
+        """[(sufixo, {label: valor}, valor)]"""
+        if self._function is not None:
+            try:
+                return [('', {}, float(self._function()))]
+            except Exception:
+                return []
+        with self._lock:
+            series = list(self._series.items())
+        return [('', dict(zip(self.labelnames, values)), value.value)
+                for values, value in series]
+
+
+class Counter(Metric):
+    kind = 'counter'
+    
+    def inc(self, amount=1):
+        self._default.inc(amount)
+
+
+class Gauge(Metric):
+    kind = 'gauge'
+    
+    def inc(self, amount=1):
+        self._default.inc(amount)
+    
+    def dec(self, amount=1):
+        self._default.dec(amount)
+    
+    def set(self, value):
+        self._default.set(value)
+
+
+class Histogram(Metric):
+    kind = 'histogram'
+    
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+    
+    def _new_value(self):
+        return _HistogramValue(self.buckets)
+    
+    def observe(self, value):
+        self._default.observe(value)
+    
+    def time(self):
+        return self._default.time()
+    
+    def samples(self):
+        with self._lock:
+            series = list(self._series.items())
+        result = []
+        for values, value in series:
+            labels = dict(zip(self.labelnames, values))
+            with value.lock:
+                counts, total, count = list(value.counts), value.sum, value.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == math.inf else repr(bound)
+                result.append(('_bucket', {**labels, 'le': le}, cumulative))
+            result.append(('_sum', labels, total))
+            result.append(('_count', labels, count))
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = {}
+        self.lock = threading.Lock()
+    
+    def register(self, cls, name, documentation, labelnames=(), **kwargs):
+        """Cria a métrica, ou retorna a existente com o mesmo nome"""
+        with self.lock:
+            metric = self.metrics.get(name)
+            if metric is None:
+                metric = self.metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"Métrica {name} já registrada com outro tipo/labels")
+            return metric
+    
+    def render(self):
+        """Formato de texto do Prometheus (0.0.4)"""
+        lines = []
+        with self.lock:
+            metrics = sorted(self.metrics.values(), key=lambda m: m.name)
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for suffix, labels, value in metric.samples():
+                lines.append(f"{metric.name}{suffix}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
+    
+    def snapshot(self):
+        """
+        Valores atuais para log estruturado: contadores/gauges por série e,
+        para histogramas, contagem, soma e média.
+        """
+        result = {}
+        with self.lock:
+            metrics = list(self.metrics.values())
+        for metric in metrics:
+            series = {}
+            for suffix, labels, value in metric.samples():
+                if suffix == '_bucket':
+                    continue
+                key = ','.join(f"{k}={v}" for k, v in labels.items())
+                if metric.kind == 'histogram':
+                    entry = series.setdefault(key, {})
+                    entry[suffix.lstrip('_')] = value
+                    if 'sum' in entry and 'count' in entry:
+                        entry['mean'] = entry['sum'] / entry['count'] if entry['count'] else 0.0
+                else:
+                    series[key] = value
+            if series:
+                result[metric.name] = series
+        return result
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels.items():
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+REGISTRY = Registry()
+
+
+def counter(name, documentation, labelnames=()):
+    return REGISTRY.register(Counter, name, documentation, labelnames)
+
+
+def gauge(name, documentation, labelnames=()):
+    return REGISTRY.register(Gauge, name, documentation, labelnames)
+
+
+def histogram(name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+    return REGISTRY.register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+
+class MetricsLogger:
+    """
+    Despeja o snapshot das métricas a cada `interval` segundos (e ao
+    encerrar) como uma linha JSON, em `path` (anexando) ou na saída padrão.
+    """
+    def __init__(self, interval=60, path=None, registry=REGISTRY):
+        self.interval = interval
+        self.path = path
+        self.registry = registry
+        self._stop = threading.Event()
+        self.thread = None
+    
+    def start(self):
+        self.thread = threading.Thread(target=self._run, name='metrics-log', daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        self._stop.set()
+        if self.thread:
+            self.thread.join(timeout=1)
+    
+    def dump(self):
+        line = json.dumps({'ts': time.time(), 'metrics': self.registry.snapshot()},
+                          ensure_ascii=False)
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+        else:
+            print(f"[metrics] {line}")
+    
+    def _run(self):
+        # Uma última linha ao encerrar, com os totais da sessão
+        while True:
+            stopping = self._stop.wait(self.interval)
+            try:
+                self.dump()
+            except OSError as e:
+                print(f"Erro ao gravar métricas: {e}")
+            if stopping:
+                return
@@ -0,0 +1,94 @@
+import os
+import threading
+import uuid
+from pathlib import Path
+
+
+class NameAllocator:
+    """
+    Nomes únicos em um diretório de destino, em tempo constante.
+    
+    Os nomes existentes são lidos uma única vez (no primeiro uso) e o
+    conjunto é mantido em memória; para cada nome base um contador guarda
+    o próximo sufixo livre, então `clipboard.png` com mil cópias não custa
+    mil stat(). Arquivos são gravados em um temporário em `staging_dir` e
+    só aparecem no destino com commit() atômico, sem sobrescrever nada.
+    """
+    def __init__(self, directory, staging_dir):
+        self.directory = Path(directory)
+        self.staging_dir = Path(staging_dir)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self.names = None     # nomes ocupados (lidos sob demanda)
+        self.pending = set()  # reservados por commits em andamento
+        self.counters = {}    # (nome, extensão) -> próximo sufixo a tentar
+        self.lock = threading.Lock()
+    
+    def _scan(self):
+        with os.scandir(self.directory) as entries:
+            self.names = {entry.name for entry in entries}
+    
+    def allocate(self, filename):
+        """Reserva e retorna um caminho livre para `filename` (nome_N.ext se ocupado)"""
+        with self.lock:
+            if self.names is None:
+                self._scan()
+            
+            name = filename
+            # Um único stat: o nome pedido pode ter sido apagado desde a leitura
+            if name in self.names and name not in self.pending \
+                    and not (self.directory / name).exists():
+                self.names.discard(name)
+            
+            if name in self.names:
+                stem, ext = os.path.splitext(filename)
+                counter = self.counters.get((stem, ext), 1)
+                while f"{stem}_{counter}{ext}" in self.names:
+                    counter += 1
+                name = f"{stem}_{counter}{ext}"
+                self.counters[(stem, ext)] = counter + 1
+            
+            self.names.add(name)
+            self.pending.add(name)
+            return self.directory / name
+    
+    def temp_path(self):
+        """Caminho temporário exclusivo no staging (mesmo sistema de arquivos)"""
+        return self.staging_dir / f"{uuid.uuid4().hex}.tmp"
+    
+    def commit(self, temp_path, filename):
+        """
+        Move o temporário para um nome livre do destino sem sobrescrever
+        nada. Se o nome foi ocupado por fora do servidor, tenta o próximo.
+        Retorna o caminho final.
+        """
+        while True:
+            filepath = self.allocate(filename)
+            try:
+                self._link(temp_path, filepath)
+                return filepath
+            except FileExistsError:
+                continue
+            finally:
+                with self.lock:
+                    self.pending.discard(filepath.name)
+    
+    @staticmethod
+    def _link(src, dst):
+        """Hardlink + unlink (falha se `dst` existir); sem suporte a links, O_EXCL + replace"""
+        if os.path.isdir(src):
+            # Pastas (pacotes recebidos) não têm link nem O_EXCL: a reserva
+            # em memória já evita colisões entre uploads simultâneos
+            if os.path.lexists(dst):
+                raise FileExistsError(dst)
+            os.rename(src, dst)
+            return
+        try:
+            os.link(src, dst)
+        except FileExistsError:
+            raise
+        except OSError:
+            # Ex.: FAT/exFAT: reserva o nome atomicamente e substitui o conteúdo
+            os.close(os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644))
+            os.replace(src, dst)
+            return
+        os.unlink(src)
@@ -0,0 +1,81 @@
+import re
+import threading
+import time
+from pathlib import Path
+
+TOKEN_PATTERN = re.compile(r'^[0-9a-f]{32}$')
+
+
+class PendingUpload:
+    """Arquivo recebido antecipadamente, aguardando o commit do emissor"""
+    def __init__(self, token, filename, path, size, sha256):
+        self.token = token
+        self.filename = filename
+        self.path = path
+        self.size = size
+        self.sha256 = sha256
+        self.created_at = time.time()
+
+
+class PendingStore:
+    """
+    Área de envios especulativos: o emissor manda o conteúdo enquanto a
+    mão ainda está fechada e, ao soltar, só confirma (commit) o envio
+    para o dispositivo escolhido. Envios não confirmados são descartados
+    pelo emissor (DELETE) ou expiram após `ttl` segundos.
+    """
+    def __init__(self, staging_dir, ttl=120):
+        self.staging_dir = Path(staging_dir)
+        self.staging_dir.mkdir(parents=True, exist_ok=True)
+        self.ttl = ttl
+        self.entries = {}  # token -> PendingUpload
+        self.lock = threading.Lock()
+        
+        # Sobras de uma execução anterior nunca serão confirmadas
+        for path in self.staging_dir.glob('*.pending'):
+            path.unlink(missing_ok=True)
+    
+    @staticmethod
+    def valid_token(token):
+        return bool(TOKEN_PATTERN.match(token))
+    
+    def path_for(self, token):
+        """Arquivo temporário do token (o nome do destino só é escolhido no commit)"""
+        return self.staging_dir / f"{token}.{time.monotonic_ns()}.pending"
+    
+    def add(self, token, filename, path, size, sha256):
+        self.cleanup()
+        entry = PendingUpload(token, filename, path, size, sha256)
+        with self.lock:
+            previous = self.entries.get(token)
+            self.entries[token] = entry
+        if previous is not None:
+            previous.path.unlink(missing_ok=True)
+        return entry
+    
+    def take(self, token):
+        """Remove e retorna o envio pendente (None se não existe ou expirou)"""
+        with self.lock:
+            entry = self.entries.pop(token, None)
+        if entry is not None and entry.created_at < time.time() - self.ttl:
+            entry.path.unlink(missing_ok=True)
+            return None
+        return entry
+    
+    def discard(self, token):
+        entry = self.take(token)
+        if entry is None:
+            return False
+        entry.path.unlink(missing_ok=True)
+        return True
+    
+    def cleanup(self):
+        """Remove envios especulativos que nunca foram confirmados"""
+        limit = time.time() - self.ttl
+        with self.lock:
+            expired = [entry for entry in self.entries.values() if entry.created_at < limit]
+            for entry in expired:
+                del self.entries[entry.token]
+        for entry in expired:
+            entry.path.unlink(missing_ok=True)
+        return len(expired)
@@ -0,0 +1,177 @@
+"""
+Envio de um arquivo para vários dispositivos com retransmissão em cadeia.
+
+O emissor manda uma única cópia para o primeiro dispositivo da cadeia,
+com o resto da cadeia no cabeçalho X-Relay. Cada dispositivo grava o
+arquivo e, enquanto ainda recebe, repassa os mesmos blocos ao próximo;
+a resposta só volta quando a cadeia inteira terminou, com o resultado
+de cada dispositivo. O uplink do emissor carrega o arquivo uma vez por
+cadeia, qualquer que seja o número de destinatários.
+
+A gravação local nunca espera pelo repasse além da fila de blocos: se o
+próximo dispositivo falha ou para de ler, o repasse é abandonado e os
+dispositivos seguintes são dados como falhos (o emissor os atende
+diretamente). Um dispositivo só repassa para os que ele mesmo descobriu
+na rede; outro endereço na cadeia é recusado (403).
+"""
+
+import json
+import queue
+import threading
+import time
+from urllib.parse import quote, unquote
+
+RELAY_HEADER = 'X-Relay'
+QUEUE_CHUNKS = 16     # blocos em trânsito entre a recepção e o repasse
+STALL_TIMEOUT = 30.0  # segundos sem o próximo dispositivo consumir nada
+
+
+def encode_chain(devices):
+    """Cadeia restante para o cabeçalho X-Relay"""
+    return quote(json.dumps([{'name': d['name'], 'ip': d['ip'], 'port': d['port']}
+                             for d in devices]))
+
+
+def decode_chain(value):
+    """Cadeia do cabeçalho X-Relay; ValueError se malformada"""
+    if not value:
+        return []
+    chain = json.loads(unquote(value))
+    if not isinstance(chain, list) or not all(
+            isinstance(d, dict) and isinstance(d.get('name'), str)
+            and isinstance(d.get('ip'), str) and isinstance(d.get('port'), int)
+            for d in chain):
+        raise ValueError("Cadeia de retransmissão inválida")
+    return chain
+
+
+def plan_chains(devices, fanout=1):
+    """
+    Divide os destinos em até `fanout` cadeias paralelas, os de menor RTT
+    no início de cada uma (o primeiro salto recebe direto do emissor).
+    """
+    ordered = sorted(devices, key=lambda d: d.get('rtt') if d.get('rtt') is not None else float('inf'))
+    fanout = max(1, min(fanout, len(ordered)))
+    return [ordered[i::fanout] for i in range(fanout) if ordered[i::fanout]]
+
+
+def failed_results(chain, message):
+    return [{'name': d['name'], 'success': False, 'message': message, 'seconds': None}
+            for d in chain]
+
+
+class RelayForwarder:
+    """
+    Repasse, em uma thread, dos blocos recebidos para o resto da cadeia.
+    
+    `forward(chunks, chain)` faz o envio ao próximo dispositivo e retorna
+    os resultados de cada um da cadeia (FileTransferClient.forward_relay).
+    """
+    _END = object()
+    
+    def __init__(self, forward, chain, max_chunks=QUEUE_CHUNKS, stall_timeout=STALL_TIMEOUT):
+        self.forward = forward
+        self.chain = chain
+        self.stall_timeout = stall_timeout
+        self.queue = queue.Queue(maxsize=max_chunks)
+        self.active = True
+        self.error = None
+        self.results = None
+        self.thread = threading.Thread(target=self._run, name='relay-forward', daemon=True)
+        self.thread.start()
+    
+    def tee(self, stream):
+        """Stream que entrega o corpo à gravação local e o copia para o repasse"""
+        return _TeeStream(stream, self)
+    
+    def push(self, data):
+        """Enfileira um bloco; abandona o repasse se o próximo parou de ler"""
+        deadline = time.monotonic() + self.stall_timeout
+        data = bytes(data)
+        while self.active:
+            try:
+                self.queue.put(data, timeout=0.5)
+                return
+            except queue.Full:
+                if time.monotonic() > deadline:
+                    self._abandon("Próximo dispositivo parou de receber")
+    
+    def finish(self, complete=True, timeout=None):
+        """
+        Fim do corpo (ou falha local, com complete=False: o corpo repassado
+        termina antes do tamanho anunciado e o próximo descarta o arquivo).
+        Espera o resto da cadeia e retorna os resultados de cada dispositivo.
+        """
+        if not complete:
+            self.error = self.error or "Recepção interrompida no dispositivo anterior"
+        self._put_end()
+        self.thread.join(timeout)
+        if self.results is None:
+            self._abandon("Tempo esgotado aguardando a cadeia")
+            return failed_results(self.chain, self.error)
+        return self.results
+    
+    def _put_end(self):
+        while self.active:
+            try:
+                self.queue.put(self._END, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+    
+    def _abandon(self, message):
+        self.error = self.error or message
+        self.active = False
+        # Libera quem espera na fila de qualquer lado
+        try:
+            while True:
+                self.queue.get_nowait()
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(self._END)
+        except queue.Full:
+            pass
+    
+    def _chunks(self):
+        while True:
+            data = self.queue.get()
+            if data is self._END or self.error:
+                return
+            yield data
+    
+    def _run(self):
+        try:
+            results = self.forward(self._chunks(), self.chain)
+        except Exception as e:
+            results = failed_results(self.chain, f"Erro no repasse: {e}")
+        if self.error:
+            results = [result if result['success'] else {**result, 'message': self.error}
+                       for result in results]
+        self.results = results
+        self.active = False
+
+
+class _TeeStream:
+    """Leitura do corpo da requisição que copia cada bloco para o repasse"""
+    def __init__(self, stream, forwarder):
+        self.stream = stream
+        self.forwarder = forwarder
+    
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        if data:
+            self.forwarder.push(data)
+        return data
+    
+    def readinto(self, buffer):
+        readinto = getattr(self.stream, 'readinto', None)
+        if readinto is not None:
+            n = readinto(buffer)
+        else:
+            data = self.stream.read(len(buffer))
+            n = len(data)
+            buffer[:n] = data
+        if n:
+            self.forwarder.push(memoryview(buffer)[:n])
+        return n
@@ -0,0 +1,457 @@
+import os
+import selectors
+import socket
+import socketserver
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import unquote, urlsplit
+
+from werkzeug.serving import DechunkedInput, make_server
+from werkzeug.wsgi import LimitedStream
+
+# Corpo restante de uma requisição que ainda vale descartar para manter
+# a conexão keep-alive; acima disso a conexão é fechada
+MAX_DRAIN_BYTES = 1024 * 1024
+
+
+class SendfileWrapper:
+    """
+    wsgi.file_wrapper: marca respostas cujo corpo é um intervalo de arquivo
+    (fileno/offset/length) para que o servidor use os.sendfile.
+    """
+    def __init__(self, body, block_size=None):
+        self.body = body
+    
+    def __iter__(self):
+        return iter(self.body)
+    
+    def close(self):
+        if hasattr(self.body, 'close'):
+            self.body.close()
+
+
+class PooledRequestHandler(BaseHTTPRequestHandler):
+    """Handler WSGI HTTP/1.1 com keep-alive e timeout de leitura por conexão"""
+    protocol_version = 'HTTP/1.1'
+    server_version = 'AITeleportation/1.0'
+    
+    def __init__(self, request, client_address, server):
+        # Sem o ciclo setup/handle/finish do socketserver: o servidor chama
+        # serve() cada vez que a conexão tem dados e finish() ao fechá-la
+        self.request = request
+        self.client_address = client_address
+        self.server = server
+        self.idle_since = time.monotonic()
+        self.setup()
+    
+    def setup(self):
+        self.timeout = self.server.read_timeout
+        super().setup()
+        # Cabeçalhos e corpo saem em escritas separadas: sem isso, em
+        # conexões reaproveitadas, Nagle + ACK atrasado somam ~40ms
+        self.connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    
+    def serve(self):
+        """
+        Atende as requisições que já chegaram na conexão. Retorna True se
+        ela deve voltar ociosa ao seletor do servidor, False para fechá-la.
+        """
+        try:
+            while True:
+                self.close_connection = True
+                self.handle_one_request()
+                if self.close_connection or self.server.stopping:
+                    return False
+                if not self._pending():
+                    return True
+        except (socket.timeout, ConnectionError):
+            return False
+    
+    def _pending(self):
+        """Já há outra requisição (pipeline) no buffer ou no socket?"""
+        self.connection.settimeout(0)
+        try:
+            return bool(self.rfile.peek(1))
+        except OSError:
+            return False
+        finally:
+            self.connection.settimeout(self.timeout)
+    
+    def handle_one_request(self):
+        self.raw_requestline = self.rfile.readline(65537)
+        self.server.track(self.connection, idle=False)
+        if not self.raw_requestline:
+            self.close_connection = True
+            return
+        if len(self.raw_requestline) > 65536:
+            self.send_error(414)
+            return
+        if not self.parse_request():
+            return
+        
+        self.run_wsgi()
+        
+        if self.server.stopping:
+            self.close_connection = True
+        self.server.track(self.connection, idle=True)
+    
+    def log_message(self, format, *args):
+        if self.server.log_requests:
+            super().log_message(format, *args)
+    
+    def make_environ(self):
+        url = urlsplit(self.path)
+        environ = {
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+            'wsgi.file_wrapper': SendfileWrapper,
+            'SERVER_SOFTWARE': self.server_version,
+            'REQUEST_METHOD': self.command,
+            'SCRIPT_NAME': '',
+            'PATH_INFO': unquote(url.path, 'latin1'),
+            'QUERY_STRING': url.query,
+            'REMOTE_ADDR': self.client_address[0],
+            'REMOTE_PORT': self.client_address[1],
+            'SERVER_NAME': self.server.server_address[0],
+            'SERVER_PORT': str(self.server.server_address[1]),
+            'SERVER_PROTOCOL': self.request_version,
+        }
+        
+        for key, value in self.headers.items():
+            key = key.upper().replace('-', '_')
+            if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+                key = f'HTTP_{key}'
+                if key in environ:
+                    value = f"{environ[key]},{value}"
+            environ[key] = value
+        
+        if environ.get('HTTP_TRANSFER_ENCODING', '').strip().lower() == 'chunked':
+            environ['wsgi.input'] = DechunkedInput(self.rfile)
+            environ['wsgi.input_terminated'] = True
+        else:
+            length = int(environ.get('CONTENT_LENGTH') or 0)
+            environ['wsgi.input'] = LimitedStream(self.rfile, length)
+        return environ
+    
+    def run_wsgi(self):
+        environ = self.make_environ()
+        state = {'status': None, 'headers': None, 'sent': False, 'chunked': False}
+        
+        def send_headers():
+            code, _, reason = state['status'].partition(' ')
+            self.send_response(int(code), reason)
+            keys = set()
+            for key, value in state['headers']:
+                self.send_header(key, value)
+                keys.add(key.lower())
+            if ('content-length' not in keys and self.command != 'HEAD'
+                    and int(code) not in (204, 304) and int(code) >= 200):
+                state['chunked'] = True
+                self.send_header('Transfer-Encoding', 'chunked')
+            if self.server.stopping:
+                self.close_connection = True
+            if self.close_connection:
+                self.send_header('Connection', 'close')
+            self.end_headers()
+            state['sent'] = True
+        
+        def write(data):
+            if not state['sent']:
+                send_headers()
+            if data and self.command != 'HEAD':
+                if state['chunked']:
+                    self.wfile.write(f"{len(data):x}\r\n".encode('ascii'))
+                    self.wfile.write(data)
+                    self.wfile.write(b"\r\n")
+                else:
+                    self.wfile.write(data)
+        
+        def start_response(status, headers, exc_info=None):
+            if exc_info and state['sent']:
+                raise exc_info[1].with_traceback(exc_info[2])
+            state['status'] = status
+            state['headers'] = headers
+            return write
+        
+        app_iter = self.server.app(environ, start_response)
+        try:
+            if isinstance(app_iter, SendfileWrapper) and self._sendfile(app_iter.body, write):
+                pass
+            else:
+                for data in app_iter:
+                    write(data)
+                if not state['sent']:
+                    write(b'')
+                if state['chunked']:
+                    self.wfile.write(b"0\r\n\r\n")
+        finally:
+            if hasattr(app_iter, 'close'):
+                app_iter.close()
+        
+        self._drain(environ['wsgi.input'])
+    
+    def _sendfile(self, body, write):
+        """Envia o corpo com os.sendfile (zero cópia) quando possível"""
+        if not hasattr(os, 'sendfile') or self.command == 'HEAD':
+            return False
+        try:
+            in_fd = body.fileno()
+            offset, remaining = body.offset, body.length
+        except (AttributeError, OSError):
+            return False
+        
+        write(b'')  # envia status e cabeçalhos (com Content-Length)
+        out_fd = self.connection.fileno()
+        selector = None
+        try:
+            while remaining > 0:
+                try:
+                    sent = os.sendfile(out_fd, in_fd, offset, remaining)
+                except BlockingIOError:
+                    # O socket com timeout é não bloqueante: espera poder
+                    # escrever, no máximo read_timeout (cliente que parou de ler)
+                    if selector is None:
+                        selector = selectors.DefaultSelector()
+                        selector.register(out_fd, selectors.EVENT_WRITE)
+                    if not selector.select(self.timeout):
+                        raise socket.timeout("Cliente parou de ler a resposta")
+                    continue
+                if sent == 0:
+                    break
+                offset += sent
+                remaining -= sent
+        finally:
+            if selector is not None:
+                selector.close()
+        return True
+    
+    def _drain(self, stream):
+        """Descarta o corpo não lido para reaproveitar a conexão"""
+        if isinstance(stream, DechunkedInput):
+            if not stream._done:
+                self.close_connection = True
+            return
+        remaining = stream.limit - stream._pos
+        if remaining > MAX_DRAIN_BYTES:
+            self.close_connection = True
+        elif remaining > 0:
+            stream.exhaust()
+
+
+class PooledWSGIServer(socketserver.TCPServer):
+    """
+    Servidor WSGI com pool fixo de threads.
+    
+    - `workers` requisições são atendidas em paralelo. Conexões keep-alive
+      ociosas não ocupam worker: ficam num seletor (thread http-idle) e só
+      voltam ao pool quando chega a próxima requisição.
+    - Até `max_connections` conexões abertas; acima disso as novas são
+      fechadas logo no accept, que nunca bloqueia.
+    - Conexões ociosas ou clientes lentos são derrubados após
+      `read_timeout` segundos sem dados.
+    - `shutdown_gracefully` para de aceitar, fecha conexões ociosas e
+      espera as requisições em andamento terminarem.
+    """
+    allow_reuse_address = True
+    daemon_threads = True
+    request_queue_size = 128
+    
+    def __init__(self, host, port, app, workers=16, max_connections=1024, read_timeout=30,
+                 log_requests=False):
+        self.app = app
+        self.workers = workers
+        self.read_timeout = read_timeout
+        self.log_requests = log_requests
+        self.stopping = False
+        self.executor = ThreadPoolExecutor(max_workers=workers,
+                                           thread_name_prefix='http-worker')
+        self.slots = threading.BoundedSemaphore(max_connections)
+        self._connections = {}  # socket -> ocioso?
+        self._conn_lock = threading.Lock()
+        # Conexões ociosas: entregues à thread http-idle por _parking
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = socket.socketpair()
+        self._wakeup_r.setblocking(False)
+        self._wakeup_w.setblocking(False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ)
+        self._parking = []
+        self._park_lock = threading.Lock()
+        self._closed = False
+        super().__init__((host, port), PooledRequestHandler)
+        self._idle_thread = threading.Thread(target=self._watch_idle, name='http-idle',
+                                             daemon=True)
+        self._idle_thread.start()
+    
+    def process_request(self, request, client_address):
+        if not self.slots.acquire(blocking=False):
+            # Limite de conexões abertas: recusa sem travar o accept
+            self.shutdown_request(request)
+            return
+        try:
+            handler = self.RequestHandlerClass(request, client_address, self)
+        except Exception:
+            self.slots.release()
+            raise
+        self.track(request, idle=True)
+        self._park(handler)
+    
+    def _park(self, handler):
+        """Deixa a conexão no seletor até chegar a próxima requisição"""
+        handler.idle_since = time.monotonic()
+        with self._park_lock:
+            if not self._closed:
+                self._parking.append(handler)
+                handler = None
+        if handler is not None:
+            self._close(handler)
+            return
+        self._wake()
+    
+    def _wake(self):
+        try:
+            self._wakeup_w.send(b'\0')
+        except OSError:
+            pass  # já há um aviso pendente
+    
+    def _watch_idle(self):
+        """Thread http-idle: despacha conexões com dados e expira as ociosas"""
+        while not self._closed:
+            for key, _ in self._selector.select(timeout=1.0):
+                if key.data is None:
+                    try:
+                        while self._wakeup_r.recv(4096):
+                            pass
+                    except OSError:
+                        pass
+                    continue
+                self._selector.unregister(key.fileobj)
+                self._dispatch(key.data)
+            
+            with self._park_lock:
+                parked, self._parking = self._parking, []
+            for handler in parked:
+                try:
+                    self._selector.register(handler.connection, selectors.EVENT_READ, handler)
+                except (ValueError, OSError):
+                    self._close(handler)
+            
+            now = time.monotonic()
+            for key in list(self._selector.get_map().values()):
+                handler = key.data
+                if handler is not None and (self.stopping or
+                                            now - handler.idle_since > self.read_timeout):
+                    self._selector.unregister(key.fileobj)
+                    self._close(handler)
+        
+        with self._park_lock:
+            parked, self._parking = self._parking, []
+        parked += [key.data for key in self._selector.get_map().values() if key.data is not None]
+        for handler in parked:
+            self._close(handler)
+        self._selector.close()
+        self._wakeup_r.close()
+        self._wakeup_w.close()
+    
+    def _dispatch(self, handler):
+        try:
+            self.executor.submit(self._process, handler)
+        except RuntimeError:
+            self._close(handler)
+    
+    def _process(self, handler):
+        try:
+            keep = handler.serve()
+        except Exception:
+            self.handle_error(handler.request, handler.client_address)
+            keep = False
+        if keep and not self.stopping:
+            self._park(handler)
+        else:
+            self._close(handler)
+    
+    def _close(self, handler):
+        try:
+            handler.finish()
+        except OSError:
+            pass
+        self.untrack(handler.connection)
+        self.shutdown_request(handler.request)
+        self.slots.release()
+    
+    def track(self, connection, idle):
+        with self._conn_lock:
+            self._connections[connection] = idle
+        if idle and self.stopping:
+            self._close_idle(connection)
+    
+    def untrack(self, connection):
+        with self._conn_lock:
+            self._connections.pop(connection, None)
+    
+    @staticmethod
+    def _close_idle(connection):
+        try:
+            connection.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+    
+    def active_requests(self):
+        with self._conn_lock:
+            return sum(1 for idle in self._connections.values() if not idle)
+    
+    def open_connections(self):
+        with self._conn_lock:
+            return len(self._connections)
+    
+    def shutdown_gracefully(self, timeout=10):
+        """Para o servidor esperando até `timeout` s pelas requisições ativas"""
+        self.stopping = True
+        self.shutdown()
+        self._wake()  # a thread http-idle fecha as conexões ociosas
+        
+        deadline = time.time() + timeout
+        while self.active_requests() and time.time() < deadline:
+            time.sleep(0.05)
+        
+        with self._park_lock:
+            self._closed = True
+        self._wake()
+        self._idle_thread.join(timeout=2)
+        self.executor.shutdown(wait=False, cancel_futures=True)
+        self.server_close()
+
+
+class WerkzeugServer:
+    """Servidor de desenvolvimento do Werkzeug (comportamento original)"""
+    def __init__(self, host, port, app, **kwargs):
+        self.server = make_server(host, port, app, threaded=True)
+        self.server_address = self.server.server_address
+    
+    def serve_forever(self):
+        self.server.serve_forever()
+    
+    def shutdown_gracefully(self, timeout=10):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+BACKENDS = {
+    'pooled': PooledWSGIServer,
+    'werkzeug': WerkzeugServer,
+}
+
+
+def create_server(backend, host, port, app, **kwargs):
+    """Cria (e já faz bind) o servidor do backend escolhido"""
+    try:
+        server_class = BACKENDS[backend]
+    except KeyError:
+        raise ValueError(f"Backend de servidor desconhecido: {backend}")
+    return server_class(host, port, app, **kwargs)
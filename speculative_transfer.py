@@ -0,0 +1,139 @@
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import metrics
+
+SPECULATIVE_MAX_SIZE = 8 * 1024 * 1024  # 8MB
+
+# hit: o alvo tinha o envio antecipado; miss: não tinha; discarded: antecipado sem uso
+OUTCOMES = metrics.counter(
+    'aiteleport_speculative_total', 'Resultado dos envios antecipados', ['outcome'])
+
+
+class PreparedTransfer:
+    """Conteúdo agarrado por uma mão e os envios antecipados dele, por dispositivo"""
+    def __init__(self, filepath):
+        self.filepath = Path(filepath)
+        self.token = uuid.uuid4().hex
+        self.staged = {}  # service_name -> (ip, porta, Future[bool])
+        self.futures = []  # tudo que lê o arquivo em segundo plano, mesmo se descartado
+    
+    def staged_for(self, device):
+        return device['service_name'] in self.staged
+    
+    def when_done(self, callback):
+        """Chama callback() quando nenhum envio antecipado ainda lê o arquivo"""
+        pending = [future for future in self.futures if not future.done()]
+        if not pending:
+            callback()
+            return
+        remaining = [len(pending)]
+        lock = threading.Lock()
+        
+        def done(_):
+            with lock:
+                remaining[0] -= 1
+                last = remaining[0] == 0
+            if last:
+                callback()
+        for future in pending:
+            future.add_done_callback(done)
+
+
+class SpeculativeTransfer:
+    """
+    Envio antecipado enquanto a mão está fechada.
+    
+    Ao capturar o conteúdo (HOLDING), arquivos até `max_size` já são
+    enviados para a área pendente dos `peers` dispositivos mais prováveis
+    (os últimos escolhidos, depois os de menor RTT); arquivos maiores só
+    têm o hash adiantado. Ao soltar (RELEASING) basta um commit pequeno
+    para o dispositivo escolhido, e os envios para os outros são
+    descartados. Se o alvo não foi antecipado, o envio segue normal.
+    """
+    def __init__(self, client, max_size=SPECULATIVE_MAX_SIZE, peers=2, workers=4):
+        self.client = client
+        self.max_size = max_size
+        self.peers = peers
+        self.recent = []  # service_names escolhidos, mais recente primeiro
+        self.lock = threading.Lock()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='speculative')
+    
+    def likely_targets(self, devices):
+        """Dispositivos mais prováveis: escolhidos recentemente, depois os mais rápidos"""
+        with self.lock:
+            rank = {name: i for i, name in enumerate(self.recent)}
+        ordered = sorted(devices, key=lambda d: (rank.get(d['service_name'], len(rank)),
+                                                 d.get('rtt') or float('inf')))
+        return ordered[:self.peers]
+    
+    def prepare(self, filepath, devices):
+        """Começa os envios antecipados de um conteúdo recém-capturado"""
+        prepared = PreparedTransfer(filepath)
+        try:
+            size = prepared.filepath.stat().st_size
+        except OSError:
+            return prepared
+        
+        if size > self.max_size:
+            # Grande demais para mandar a vários candidatos: só adianta o hash
+            prepared.futures.append(
+                self.pool.submit(self.client.precompute_hash, prepared.filepath))
+            return prepared
+        
+        for device in self.likely_targets(devices):
+            future = self.pool.submit(self.client.stage_file, prepared.filepath,
+                                      device['ip'], device['port'], prepared.token)
+            prepared.staged[device['service_name']] = (device['ip'], device['port'], future)
+            prepared.futures.append(future)
+        return prepared
+    
+    def commit(self, prepared, device):
+        """
+        Entrega o conteúdo ao dispositivo escolhido (na fila de envios).
+        Retorna (success, message).
+        """
+        self._remember(device)
+        staged = prepared.staged.pop(device['service_name'], None)
+        self.cancel(prepared)
+        
+        if staged is not None:
+            ip, port, future = staged
+            # Se o envio antecipado ainda está em andamento, espera por ele
+            if future.result():
+                result = self.client.commit_staged(prepared.token, prepared.filepath.name, ip, port)
+                if result is not None:
+                    OUTCOMES.labels('hit').inc()
+                    return result
+        OUTCOMES.labels('miss').inc()
+        return self.client.send_file(prepared.filepath, device['ip'], device['port'])
+    
+    def cancel(self, prepared):
+        """Gesto abandonado: cancela ou descarta todos os envios antecipados"""
+        staged, prepared.staged = prepared.staged, {}
+        for ip, port, future in staged.values():
+            OUTCOMES.labels('discarded').inc()
+            if not future.cancel():
+                future.add_done_callback(
+                    lambda f, ip=ip, port=port: self._discard(f, prepared.token, ip, port))
+    
+    def _discard(self, future, token, ip, port):
+        if future.cancelled() or future.exception() is not None or not future.result():
+            return
+        try:
+            self.pool.submit(self.client.discard_staged, token, ip, port)
+        except RuntimeError:
+            # Encerrando: o receptor expira o envio sozinho
+            pass
+    
+    def _remember(self, device):
+        with self.lock:
+            name = device['service_name']
+            if name in self.recent:
+                self.recent.remove(name)
+            self.recent.insert(0, name)
+            del self.recent[8:]
+    
+    def stop(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,87 @@
+import hashlib
+import os
+
+DEFAULT_BUFFER_SIZE = 1024 * 1024  # 1MB
+
+
+class UploadTooLarge(Exception):
+    """Corpo da requisição excedeu o limite configurado"""
+
+
+class IncompleteUpload(Exception):
+    """Conexão terminou antes do Content-Length anunciado"""
+
+
+def preallocate(fd, size):
+    """
+    Deixa o arquivo com `size` bytes, reservando o espaço de uma vez
+    (posix_fallocate); onde não há suporte, só ajusta o tamanho.
+    """
+    if hasattr(os, 'posix_fallocate') and size > 0:
+        try:
+            os.posix_fallocate(fd, 0, size)
+            return
+        except OSError:
+            pass
+    os.ftruncate(fd, size)
+
+
+def receive_stream(stream, filepath, max_length, content_length=None,
+                   buffer_size=DEFAULT_BUFFER_SIZE):
+    """
+    Copia o corpo da requisição direto para `filepath`, sem buffers
+    intermediários: lê em um bytearray reutilizado, calcula o SHA-256 em
+    linha e aplica o limite de tamanho a cada bloco lido.
+    
+    Retorna (bytes gravados, sha256 hex). Em caso de erro o arquivo
+    parcial é removido.
+    """
+    if content_length is not None and content_length > max_length:
+        raise UploadTooLarge(f"{content_length} bytes excede o limite de {max_length}")
+    
+    flags = os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, 'O_BINARY', 0)
+    fd = os.open(filepath, flags, 0o644)
+    try:
+        if content_length:
+            preallocate(fd, content_length)
+        
+        buffer = bytearray(buffer_size)
+        view = memoryview(buffer)
+        readinto = getattr(stream, 'readinto', None)
+        hasher = hashlib.sha256()
+        total = 0
+        
+        while True:
+            if readinto is not None:
+                n = readinto(view)
+                data = view[:n] if n else None
+            else:
+                data = stream.read(buffer_size)
+                n = len(data)
+            if not n:
+                break
+            
+            total += n
+            if total > max_length:
+                raise UploadTooLarge(f"Upload excede o limite de {max_length} bytes")
+            
+            hasher.update(data)
+            pending = memoryview(data)
+            while pending:
+                pending = pending[os.write(fd, pending):]
+        
+        if content_length is not None and total != content_length:
+            raise IncompleteUpload(f"Recebidos {total} de {content_length} bytes")
+        
+        os.close(fd)
+        fd = None
+        return total, hasher.hexdigest()
+    
+    except BaseException:
+        if fd is not None:
+            os.close(fd)
+        try:
+            os.unlink(filepath)
+        except OSError:
+            pass
+        raise
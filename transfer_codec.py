@@ -0,0 +1,125 @@
+import io
+import os
+import zlib
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Codecs em ordem de preferência (tokens de Content-Encoding)
+CODECS = (['zstd'] if zstandard is not None else []) + ['deflate']
+
+# Formatos que já são comprimidos: nem vale a pena sondar
+COMPRESSED_EXTENSIONS = {
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.heic', '.avif',
+    '.zip', '.gz', '.tgz', '.bz2', '.xz', '.7z', '.rar', '.zst',
+    '.mp4', '.mkv', '.mov', '.avi', '.webm', '.mp3', '.aac', '.ogg', '.flac', '.m4a',
+    '.docx', '.xlsx', '.pptx', '.odt', '.jar', '.apk', '.pdf',
+}
+
+MIN_COMPRESS_SIZE = 4 * 1024     # abaixo disso o ganho não paga o custo
+PROBE_SAMPLE_SIZE = 64 * 1024
+PROBE_MAX_RATIO = 0.9            # exige ao menos 10% de redução na amostra
+ENCODE_CHUNK_SIZE = 256 * 1024
+
+
+def probe_ratio(filepath, sample_size=PROBE_SAMPLE_SIZE, samples=3):
+    """
+    Razão de compressão estimada (comprimido / original) a partir de
+    amostras do início, meio e fim do arquivo, com zlib nível 1.
+    """
+    size = os.path.getsize(filepath)
+    if size <= sample_size * samples:
+        offsets = [0]
+        sample_size = size
+    else:
+        step = (size - sample_size) // (samples - 1)
+        offsets = [i * step for i in range(samples)]
+    
+    original = compressed = 0
+    with open(filepath, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            data = f.read(sample_size)
+            original += len(data)
+            compressed += len(zlib.compress(data, 1))
+    return compressed / original if original else 1.0
+
+
+def choose_codec(filepath, accepted, min_size=MIN_COMPRESS_SIZE, max_ratio=PROBE_MAX_RATIO):
+    """
+    Codec para o envio de `filepath`, ou None para enviar sem compressão.
+    `accepted` são os codecs anunciados pelo receptor.
+    """
+    codecs = [codec for codec in CODECS if codec in accepted]
+    if not codecs:
+        return None
+    if os.path.splitext(str(filepath))[1].lower() in COMPRESSED_EXTENSIONS:
+        return None
+    if os.path.getsize(filepath) < min_size:
+        return None
+    if probe_ratio(filepath) > max_ratio:
+        return None
+    return codecs[0]
+
+
+def _compressor(codec):
+    if codec == 'zstd' and zstandard is not None:
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if codec == 'deflate':
+        return zlib.compressobj(1)
+    raise ValueError(f"Codec não suportado: {codec}")
+
+
+def encode_file(filepath, codec, chunk_size=ENCODE_CHUNK_SIZE):
+    """Gera o conteúdo do arquivo comprimido em blocos (corpo em streaming)"""
+    with open(filepath, 'rb') as f:
+        yield from encode_chunks(iter(lambda: f.read(chunk_size), b''), codec)
+
+
+def encode_chunks(chunks, codec):
+    """Comprime um corpo gerado em blocos (ex.: pacote de arquivos)"""
+    compressor = _compressor(codec)
+    for data in chunks:
+        out = compressor.compress(data)
+        if out:
+            yield out
+    out = compressor.flush()
+    if out:
+        yield out
+
+
+class InflateReader(io.RawIOBase):
+    """Descomprime um stream deflate (zlib) sob demanda, sem ler tudo"""
+    def __init__(self, stream, chunk_size=64 * 1024):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.decompressor = zlib.decompressobj()
+        self.tail = b''
+    
+    def readable(self):
+        return True
+    
+    def readinto(self, buffer):
+        while True:
+            if self.decompressor.eof:
+                return 0
+            data = self.tail or self.stream.read(self.chunk_size)
+            if not data:
+                raise EOFError("Stream deflate truncado")
+            # max_length limita a saída ao buffer: o resto fica em unconsumed_tail
+            out = self.decompressor.decompress(data, len(buffer))
+            self.tail = self.decompressor.unconsumed_tail
+            if out:
+                buffer[:len(out)] = out
+                return len(out)
+
+
+def decoding_stream(stream, codec):
+    """Envolve o corpo da requisição com o decodificador do codec"""
+    if codec == 'zstd' and zstandard is not None:
+        return zstandard.ZstdDecompressor().stream_reader(stream)
+    if codec == 'deflate':
+        return InflateReader(stream)
+    raise ValueError(f"Codec não suportado: {codec}")
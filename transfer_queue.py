@@ -0,0 +1,119 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from concurrent.futures import Future
+import metrics
+
+# Classes de prioridade (menor valor sai primeiro da fila)
+PRIORITY_SMALL = 0   # textos e arquivos pequenos do clipboard
+PRIORITY_BULK = 1    # arquivos grandes
+
+SMALL_FILE_SIZE = 256 * 1024  # 256KB
+
+QUEUE_DEPTH = metrics.gauge('aiteleport_transfer_queue_depth', 'Envios aguardando um worker')
+QUEUE_WAIT_SECONDS = metrics.histogram(
+    'aiteleport_transfer_queue_wait_seconds', 'Espera na fila até o envio começar', ['priority'])
+
+
+def priority_for(filepath, small_file_size=SMALL_FILE_SIZE):
+    """Prioridade de um envio pelo tamanho do arquivo (ou soma, num pacote)"""
+    paths = filepath if isinstance(filepath, (list, tuple)) else [filepath]
+    try:
+        size = sum(os.path.getsize(path) for path in paths)
+    except (OSError, TypeError):
+        return PRIORITY_BULK
+    return PRIORITY_SMALL if size <= small_file_size else PRIORITY_BULK
+
+
+class TransferQueue:
+    """
+    Executor de transferências com número fixo de workers e fila limitada.
+    
+    Os envios são atendidos por prioridade e, dentro da mesma prioridade,
+    por ordem de chegada: um texto copiado passa na frente de um vídeo
+    que ainda aguarda na fila. Além dos `workers`, `interactive_workers`
+    só atendem PRIORITY_SMALL, então um texto não espera um worker ficar
+    livre enquanto envios grandes ocupam os demais. submit() retorna um
+    Future com o (success, message) da transferência.
+    """
+    def __init__(self, transfer_fn, workers=2, max_pending=32,
+                 small_file_size=SMALL_FILE_SIZE, interactive_workers=0):
+        self.transfer_fn = transfer_fn
+        self.small_file_size = small_file_size
+        self.max_pending = max_pending
+        self._heap = []  # (prioridade, seq, future, args, enfileirado_em)
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._stopped = False
+        self.workers = [
+            threading.Thread(target=self._worker, name=f'transfer-{i}', daemon=True)
+            for i in range(workers)
+        ] + [
+            threading.Thread(target=self._worker, args=(True,), name=f'transfer-interactive-{i}',
+                             daemon=True)
+            for i in range(interactive_workers)
+        ]
+        for worker in self.workers:
+            worker.start()
+        QUEUE_DEPTH.set_function(self.pending)
+    
+    def submit(self, filepath, *args, priority=None):
+        """
+        Enfileira um envio. Retorna o Future, ou None se a fila está cheia
+        (o chamador decide se avisa ou descarta).
+        """
+        if self._stopped:
+            return None
+        if priority is None:
+            priority = priority_for(filepath, self.small_file_size)
+        
+        future = Future()
+        with self._cond:
+            if len(self._heap) >= self.max_pending:
+                return None
+            heapq.heappush(self._heap, (priority, next(self._seq), future, (filepath,) + args,
+                                        time.perf_counter()))
+            self._cond.notify_all()
+        return future
+    
+    def pending(self):
+        return len(self._heap)
+    
+    def _next(self, interactive_only):
+        with self._cond:
+            # Workers interativos só pegam o topo se for pequeno (ou sentinela)
+            while not self._heap or (interactive_only and self._heap[0][0] != PRIORITY_SMALL
+                                     and self._heap[0][2] is not None):
+                self._cond.wait()
+            return heapq.heappop(self._heap)
+    
+    def _worker(self, interactive_only=False):
+        while True:
+            priority, _, future, args, queued_at = self._next(interactive_only)
+            if future is None:
+                return
+            if not future.set_running_or_notify_cancel():
+                continue
+            QUEUE_WAIT_SECONDS.labels(priority).observe(time.perf_counter() - queued_at)
+            try:
+                future.set_result(self.transfer_fn(*args))
+            except Exception as e:
+                future.set_exception(e)
+    
+    def stop(self, wait=False):
+        """Cancela os envios pendentes e encerra os workers"""
+        self._stopped = True
+        with self._cond:
+            pending, self._heap = self._heap, []
+            # Sentinelas depois de qualquer prioridade real
+            for _ in self.workers:
+                self._heap.append((float('inf'), next(self._seq), None, None, None))
+            self._cond.notify_all()
+        for _, _, future, _, _ in pending:
+            if future is not None:
+                future.cancel()
+        if wait:
+            for worker in self.workers:
+                worker.join()
@@ -0,0 +1,258 @@
+"""
+Agendador central de banda para envios e recepções.
+
+Todos os corpos enviados pelo cliente e lidos pelo servidor passam por
+acquire() em blocos de até CHUNK_SIZE. Com limites configurados, cada
+bloco consome fichas de um token bucket global (o link) e de um por
+dispositivo (IP); quando falta banda, quem espera é atendido por classe
+(interativo antes de bulk) e, dentro da classe, por fila justa entre
+dispositivos: cada um avança um relógio virtual com os bytes que já
+recebeu, e sai primeiro quem está mais atrás (start-time fair queuing).
+Um texto do clipboard espera no máximo um bloco de um vídeo em curso.
+
+Sem limites, throttle() e reader() devolvem o próprio corpo ou stream
+(leituras grandes, sem cópia) e acquire() retorna sem lock. Os limites
+podem ser trocados em execução (configure()), valendo já para o próximo
+bloco das transferências que começaram limitadas e para as seguintes.
+"""
+
+import io
+import os
+import threading
+import time
+
+import metrics
+from transfer_queue import PRIORITY_SMALL, PRIORITY_BULK, SMALL_FILE_SIZE
+
+CHUNK_SIZE = 256 * 1024
+BURST_SECONDS = 0.05  # rajada permitida acima da taxa (também o mínimo de um bloco)
+
+CLASS_NAMES = {PRIORITY_SMALL: 'interactive', PRIORITY_BULK: 'bulk'}
+
+WAIT_SECONDS = metrics.histogram(
+    'aiteleport_scheduler_wait_seconds', 'Espera por banda por bloco, por classe', ['class'])
+
+
+def mbps_to_rate(mbps):
+    """Mbps da configuração -> bytes/s (None/0 = sem limite)"""
+    return mbps * 1e6 / 8 if mbps else None
+
+
+class TokenBucket:
+    """Fichas em bytes, repostas a `rate` bytes/s até a capacidade"""
+    def __init__(self, rate=None):
+        self.rate = None
+        self.capacity = 0.0
+        self.tokens = 0.0
+        self.updated = time.monotonic()
+        self.set_rate(rate)
+    
+    def set_rate(self, rate):
+        self._refill(time.monotonic())
+        was_limited = bool(self.rate)
+        self.rate = rate
+        self.capacity = max(rate * BURST_SECONDS, CHUNK_SIZE) if rate else 0.0
+        # Balde novo começa cheio; trocar a taxa preserva o saldo (e a dívida)
+        self.tokens = min(self.tokens, self.capacity) if was_limited else self.capacity
+    
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def wait_time(self, n, now):
+        """Segundos até haver `n` fichas (0 se já há ou sem limite)"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        return max(0.0, (min(n, self.capacity) - self.tokens) / self.rate)
+    
+    def consume(self, n):
+        if self.rate:
+            self.tokens -= n
+
+
+class _Ticket:
+    __slots__ = ('priority', 'peer', 'size', 'tag', 'seq')
+    
+    def __init__(self, priority, peer, size, tag, seq):
+        self.priority = priority
+        self.peer = peer
+        self.size = size
+        self.tag = tag
+        self.seq = seq
+
+
+class TransferScheduler:
+    """
+    Limites global e por dispositivo (token buckets), classes de
+    prioridade e divisão justa da banda entre dispositivos.
+    
+    `rate_mbps` limita o total (envios e recepções); `peer_rate_mbps` é o
+    limite padrão de cada dispositivo e `peer_limits` ({ip: mbps}) o
+    sobrescreve por dispositivo. Tamanhos até `small_file_size` são da
+    classe interativa.
+    """
+    def __init__(self, rate_mbps=None, peer_rate_mbps=None, peer_limits=None,
+                 small_file_size=SMALL_FILE_SIZE):
+        self.small_file_size = small_file_size
+        self.cond = threading.Condition()
+        self.global_bucket = TokenBucket()
+        self.peer_buckets = {}  # ip -> TokenBucket
+        self.finish = {}        # ip -> relógio virtual (fim do último bloco agendado)
+        self.vtime = 0.0        # relógio virtual do último bloco liberado
+        self.waiting = []
+        self._seq = 0
+        self.limited = False
+        self.configure(rate_mbps, peer_rate_mbps, peer_limits)
+    
+    def configure(self, rate_mbps=None, peer_rate_mbps=None, peer_limits=None):
+        """Troca os limites em execução (releitura do config.json)"""
+        with self.cond:
+            self.rate_mbps = rate_mbps
+            self.peer_rate_mbps = peer_rate_mbps
+            self.peer_limits = dict(peer_limits or {})
+            self.global_bucket.set_rate(mbps_to_rate(rate_mbps))
+            for peer, bucket in self.peer_buckets.items():
+                bucket.set_rate(self._peer_rate(peer))
+            self.limited = bool(rate_mbps or peer_rate_mbps or any(self.peer_limits.values()))
+            self.cond.notify_all()
+    
+    def _peer_rate(self, peer):
+        return mbps_to_rate(self.peer_limits.get(peer, self.peer_rate_mbps))
+    
+    def priority_for_size(self, size):
+        """Classe de um corpo pelo tamanho total (None = desconhecido: bulk)"""
+        return PRIORITY_SMALL if size is not None and size <= self.small_file_size else PRIORITY_BULK
+    
+    def acquire(self, n, peer, priority=PRIORITY_BULK):
+        """Bloqueia até `n` bytes de/para `peer` poderem passar"""
+        if not self.limited:
+            return
+        
+        start = time.monotonic()
+        with self.cond:
+            bucket = self.peer_buckets.get(peer)
+            if bucket is None:
+                bucket = self.peer_buckets[peer] = TokenBucket(self._peer_rate(peer))
+            tag = max(self.vtime, self.finish.get(peer, 0.0))
+            self.finish[peer] = tag + n
+            self._seq += 1
+            ticket = _Ticket(priority, peer, n, tag, self._seq)
+            self.waiting.append(ticket)
+            try:
+                while self.limited:
+                    best, delay = self._select(time.monotonic())
+                    if best is ticket and delay <= 0:
+                        self.global_bucket.consume(n)
+                        bucket.consume(n)
+                        self.vtime = max(self.vtime, tag)
+                        break
+                    # Espera as fichas do primeiro da fila; liberado um bloco, todos reavaliam
+                    self.cond.wait(delay if delay > 0 else 0.01)
+            finally:
+                self.waiting.remove(ticket)
+                self.cond.notify_all()
+        WAIT_SECONDS.labels(CLASS_NAMES.get(priority, 'bulk')).observe(time.monotonic() - start)
+    
+    def _select(self, now):
+        """
+        Próximo bloco a liberar e quanto ele ainda espera. Entre os
+        dispositivos com fichas, vale (classe, relógio virtual); se nenhum
+        tem, o que fica pronto antes.
+        """
+        best, best_key = None, None
+        soonest, soonest_wait = None, None
+        for ticket in self.waiting:
+            peer_wait = self.peer_buckets[ticket.peer].wait_time(ticket.size, now)
+            if peer_wait > 0:
+                if soonest is None or peer_wait < soonest_wait:
+                    soonest, soonest_wait = ticket, peer_wait
+                continue
+            key = (ticket.priority, ticket.tag, ticket.seq)
+            if best is None or key < best_key:
+                best, best_key = ticket, key
+        if best is None:
+            return soonest, soonest_wait
+        return best, self.global_bucket.wait_time(best.size, now)
+    
+    def throttle(self, data, peer, size=None):
+        """
+        Corpo de requisição (bytes, arquivo aberto ou gerador de blocos)
+        liberado pelo agendador bloco a bloco. `size` é o tamanho total
+        da transferência (define a classe). Bytes e arquivos continuam
+        com tamanho conhecido (Content-Length). Sem limites, `data` volta
+        como está.
+        """
+        if data is None or not self.limited:
+            return data
+        if isinstance(data, (bytes, bytearray, memoryview)):
+            length = len(data)
+            priority = self.priority_for_size(length if size is None else size)
+            return _ThrottledBody(io.BytesIO(data), self, peer, priority, length)
+        priority = self.priority_for_size(size)
+        if hasattr(data, 'read'):
+            length = os.fstat(data.fileno()).st_size - data.tell()
+            return _ThrottledBody(data, self, peer, priority, length)
+        return self._throttle_chunks(data, peer, priority)
+    
+    def _throttle_chunks(self, chunks, peer, priority):
+        for chunk in chunks:
+            # Blocos grandes (ex.: partes do envio em partes) em pedaços
+            for offset in range(0, len(chunk), CHUNK_SIZE):
+                self.acquire(min(CHUNK_SIZE, len(chunk) - offset), peer, priority)
+            yield chunk
+    
+    def reader(self, stream, peer, size=None):
+        """Stream de entrada (corpo recebido) lido pelo agendador; sem limites, o próprio stream"""
+        if not self.limited:
+            return stream
+        return _ThrottledReader(stream, self, peer, self.priority_for_size(size))
+
+
+class _ThrottledReader:
+    """
+    Leitura do corpo da requisição em blocos liberados pelo agendador.
+    Se os limites forem retirados durante a transferência, as leituras
+    voltam ao tamanho pedido.
+    """
+    def __init__(self, stream, scheduler, peer, priority):
+        self.stream = stream
+        self.scheduler = scheduler
+        self.peer = peer
+        self.priority = priority
+    
+    def read(self, size=-1):
+        if not self.scheduler.limited:
+            return self.stream.read(size)
+        if size is None or size < 0:
+            return b''.join(iter(lambda: self.read(CHUNK_SIZE), b''))
+        data = self.stream.read(min(size, CHUNK_SIZE))
+        if data:
+            self.scheduler.acquire(len(data), self.peer, self.priority)
+        return data
+    
+    def readinto(self, buffer):
+        view = memoryview(buffer)
+        if self.scheduler.limited:
+            view = view[:CHUNK_SIZE]
+        readinto = getattr(self.stream, 'readinto', None)
+        if readinto is not None:
+            n = readinto(view)
+        else:
+            data = self.stream.read(len(view))
+            n = len(data)
+            view[:n] = data
+        if n:
+            self.scheduler.acquire(n, self.peer, self.priority)
+        return n
+
+
+class _ThrottledBody(_ThrottledReader):
+    """Corpo de envio com tamanho conhecido (o requests manda Content-Length)"""
+    def __init__(self, stream, scheduler, peer, priority, length):
+        super().__init__(stream, scheduler, peer, priority)
+        self.length = length
+    
+    def __len__(self):
+        return self.length